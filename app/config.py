@@ -7,7 +7,10 @@ class Settings(BaseSettings):
     PORT: int = 8050
     HOST: str = "0.0.0.0"
     WORKERS: int = 4
-    RELOAD: bool = True
+    RELOAD: bool = True  # development profile only
+    SERVER_PROFILE: str = "development"  # "production" runs gunicorn with WORKERS preloaded workers
+    GRACEFUL_TIMEOUT: int = 30  # seconds a stopping worker gets to finish in-flight requests
+    ENABLE_WARMUP: bool = True  # start extraction workers and load caches before accepting traffic
 
     # API Settings
     GROQ_API_KEY: str
@@ -17,9 +20,31 @@ class Settings(BaseSettings):
     MAX_CONCURRENT_REQUESTS: int = 50
 
     # Web Scraping Settings
-    REQUEST_TIMEOUT: int = 30
-    MAX_CONTENT_SIZE: int = 10
+    REQUEST_TIMEOUT: int = 30  # seconds
+    MAX_CONTENT_SIZE: int = 10  # megabytes
     USER_AGENT: str = "Compliance-Checker-Bot/1.0"
+    CRAWL_MAX_PAGES: int = 5000
+    CRAWL_PER_HOST_CONCURRENCY: int = 4
+    CRAWL_DELAY: float = 0.5  # seconds between requests to one host
+    EXTRACTION_POOL_SIZE: int = 2  # processes for HTML extraction; 0 extracts on the event loop
+    EXTRACTION_MAX_TASKS_PER_CHILD: int = 500  # recycle extraction processes (Python 3.11+)
+
+    # Model Settings
+    RULES_MODEL: str = "llama-3.3-70b-versatile"
+    ANALYSIS_MODEL: str = "llama-3.3-70b-versatile"
+    TRIAGE_MODEL: str = "llama-3.1-8b-instant"
+    ENABLE_TRIAGE: bool = True  # screen chunks with TRIAGE_MODEL, escalating only flagged ones
+    TRIAGE_MAX_TOKENS: int = 16
+    LLM_JSON_MODE: bool = True  # request the provider's JSON response format for non-streamed analysis calls
+    ENABLE_VIOLATION_REPAIR: bool = True  # re-ask only for violations lost to a cut-off or malformed analysis
+    VIOLATION_REPAIR_MAX_TOKENS: int = 2048
+
+    # Chunking Settings (estimated tokens)
+    CHUNK_MAX_TOKENS: int = 3000
+    POLICY_CHUNK_MAX_TOKENS: int = 6000
+    CHUNK_OVERLAP_TOKENS: int = 150
+    MAX_CONCURRENT_CHUNKS: int = 4
+    RULES_TOP_K: int = 12  # policy rules per analysis prompt, plus universal ones; 0 sends all
 
     # Compliance Settings
     MIN_COMPLIANCE_SCORE: int = 80
@@ -29,10 +54,40 @@ class Settings(BaseSettings):
     # Cache Settings
     ENABLE_CACHE: bool = True
     CACHE_TTL: int = 86400
+    CACHE_MAX_ENTRIES: int = 256
+    CACHE_DB_PATH: str = "data/rules_cache.db"  # empty disables the shared on-disk tier
+    CACHE_PRELOAD_ENTRIES: int = 64  # most recent on-disk entries loaded into memory at startup
+
+    # Job Queue Settings
+    JOB_DB_PATH: str = "data/jobs.db"
+    JOB_WORKERS: int = 4
+    JOB_QUEUE_MAX_SIZE: int = 1000
+    JOB_POLL_INTERVAL: float = 1.0  # seconds
+    JOB_LEASE_SECONDS: int = 60
+    JOB_MAX_ATTEMPTS: int = 3  # claims before a job whose worker keeps dying or hanging is failed
+
+    # Incremental Re-check Settings
+    ENABLE_INCREMENTAL_CHECKS: bool = True
+    SECTION_STORE_PATH: str = "data/sections.db"
+
+    # Scan History Settings
+    ENABLE_SCAN_HISTORY: bool = True
+    SCAN_HISTORY_PATH: str = "data/scans.db"
+    HISTORY_PAGE_SIZE: int = 50
+    HISTORY_MAX_PAGE_SIZE: int = 500
+
+    # Metrics Settings
+    METRICS_DB_PATH: str = "data/metrics.db"  # shared by worker processes; empty keeps metrics per process
+    METRICS_PUBLISH_INTERVAL: float = 5.0  # seconds between publications of a worker's metrics
 
     # Security Settings
     ENABLE_RATE_LIMIT: bool = True
-    RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_PER_MINUTE: int = 60  # LLM requests per minute, per process, across all models
+    TOKEN_LIMIT_PER_MINUTE: int = 60000  # estimated LLM tokens per minute, per process, across all models
+    COMPLETION_TOKEN_ESTIMATE: int = 1024  # completion tokens budgeted per call
+    LLM_MAX_RETRIES: int = 4
+    LLM_BACKOFF_BASE: float = 1.0  # seconds
+    LLM_BACKOFF_MAX: float = 30.0  # seconds
 
     # Development Settings
     DEBUG: bool = True
@@ -1,18 +1,79 @@
 # app/main.py
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request, Depends, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
-from app.models.schemas import ComplianceRequest, ComplianceResponse
+from app.models.schemas import (
+    ComplianceRequest, ComplianceResponse, BatchComplianceRequest, CrawlComplianceRequest, JobStatus,
+    ScanDetail, ScanPage, ScanSummary, ViolationPage, ViolationRecord
+)
 from app.services.compliance import ComplianceChecker
+from app.services.job_queue import JobQueue, JobWorkerPool, QueueFullError
+from app.services.metrics import publish_periodically, render_metrics
+from app.services.rate_governor import RateLimitExceeded
+from app.services.scan_history import ScanHistory
+from app.services.web_scraper import create_http_client
 from app.config import settings
-from datetime import datetime
+from app.utils.helper import content_hash
+from datetime import datetime, timezone
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Builds the per-process ComplianceChecker, with its pooled HTTP and LLM
+    clients, and shares it across all requests for the lifetime of the app.
+    Also starts the workers that drain the persistent job queue, and the
+    task that publishes this worker's metrics for the other workers' scrapes.
+    
+    Everything here runs in each worker after it starts (after the fork when
+    gunicorn preloads the app), so no client, pool or connection is shared
+    between processes. With ENABLE_WARMUP the checker is warmed up before the
+    worker accepts its first request.
+    """
+    app.state.ready = False
+    app.state.http_client = create_http_client()
+    app.state.checker = ComplianceChecker(http_client=app.state.http_client)
+    app.state.job_queue = JobQueue()
+    app.state.job_workers = JobWorkerPool(app.state.job_queue, app.state.checker.run_job)
+    if settings.ENABLE_WARMUP:
+        await app.state.checker.warm_up()
+    app.state.job_workers.start()
+    metrics_publisher = asyncio.create_task(publish_periodically())
+    app.state.ready = True
+    try:
+        yield
+    finally:
+        app.state.ready = False
+        await app.state.job_workers.stop()
+        metrics_publisher.cancel()
+        await asyncio.gather(metrics_publisher, return_exceptions=True)
+        await app.state.checker.aclose()
+        await app.state.http_client.aclose()
 
 app = FastAPI(
     title="Compliance Checker API",
     description="API for checking webpage content against compliance policies",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+def rate_limited(error: RateLimitExceeded) -> HTTPException:
+    """
+    Maps an exhausted LLM rate limit to 503, passing the provider's Retry-After on.
+    """
+    retry_after = str(int(error.retry_after) + 1) if error.retry_after is not None else "30"
+    return HTTPException(status_code=503, detail=str(error), headers={"Retry-After": retry_after})
+
+def get_checker(request: Request) -> ComplianceChecker:
+    """
+    Returns the process-wide ComplianceChecker created in the lifespan.
+    """
+    return request.app.state.checker
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -23,57 +84,335 @@ app.add_middleware(
 )
 
 @app.post("/check-compliance", response_model=ComplianceResponse)
-async def check_compliance(request: ComplianceRequest):
+async def check_compliance(request: ComplianceRequest, checker: ComplianceChecker = Depends(get_checker)):
     """
     Checks webpage content against a specified compliance policy URL.
     
-    This endpoint takes two URLs:
+    This endpoint takes:
     - webpage_url: The webpage to analyze
-    - policy_url: The compliance policy to check against
+    - policy_url and/or policy_urls: The compliance policies to check against
+    
+    With several policies the webpage is fetched and analyzed once against
+    their merged rules, and each violation names the policy_url it breaks.
+    
+    An optional mode selects the analysis: "llm" (default), "fast" for the
+    deterministic COMPLIANCE_RULES matcher only, or "hybrid" for both.
+    
+    With include_timings the response also reports the seconds spent in
+    each stage (fetch, extract, rules_extraction, analysis, parse, total).
     
     Returns a detailed compliance analysis including any violations found.
     """
     try:
-        checker = ComplianceChecker()
         result = await checker.check_compliance(
             webpage_url=str(request.webpage_url),
-            policy_url=str(request.policy_url)
+            policy_urls=request.all_policy_urls,
+            mode=request.mode,
+            include_timings=request.include_timings
         )
         return result
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/check-compliance/stream")
-async def check_compliance_stream(request: ComplianceRequest):
+async def check_compliance_stream(request: ComplianceRequest, checker: ComplianceChecker = Depends(get_checker)):
     """
     Streams compliance check results as they're generated.
     
-    This endpoint provides real-time analysis results by:
-    1. First extracting rules from the policy URL
-    2. Then checking the webpage content against these rules
-    3. Streaming violations as they're found
+    This endpoint provides real-time analysis results as Server-Sent Events:
+    1. Progress events while both URLs are fetched and the policy's rules are extracted
+    2. One "violation" event per violation, sent as soon as the model has written it
+    3. A final "done" event (or an "error" event if the check failed)
+    4. With include_timings, a "timings" event with the seconds spent per stage
+    """
+    return StreamingResponse(
+        checker.check_compliance_stream(
+            webpage_url=str(request.webpage_url),
+            policy_urls=request.all_policy_urls,
+            mode=request.mode,
+            include_timings=request.include_timings
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/check-compliance/batch")
+async def check_compliance_batch(request: BatchComplianceRequest, checker: ComplianceChecker = Depends(get_checker)):
+    """
+    Checks many webpages against a single compliance policy.
+    
+    The policy is fetched and its rules extracted once; the webpages are then
+    analyzed concurrently. Each page's result is streamed back as one NDJSON
+    line as soon as it finishes, and a failing page reports its error without
+    affecting the others.
     """
+    policy_url = str(request.policy_url)
+    extracted_rules = None
     try:
-        checker = ComplianceChecker()
-        
-        # First fetch both contents
-        webpage_content = await checker.web_scraper.fetch_content(str(request.webpage_url))
-        policy_content = await checker.web_scraper.fetch_content(str(request.policy_url))
-        
-        # Start streaming analysis
-        return StreamingResponse(
-            checker.text_analyzer.analyze_compliance_stream(
-                webpage_content=webpage_content,
-                policy_content=policy_content
-            ),
-            media_type="text/event-stream"
-        )
+        if request.mode != "fast":
+            extracted_rules = await checker.load_policy_rules(policy_url)
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def stream_results():
+        async for result in checker.check_pages(
+            webpage_urls=[str(url) for url in request.webpage_urls],
+            policy_url=policy_url,
+            extracted_rules=extracted_rules,
+            mode=request.mode
+        ):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/check-compliance/crawl")
+async def check_compliance_crawl(request: CrawlComplianceRequest, checker: ComplianceChecker = Depends(get_checker)):
+    """
+    Crawls a site from seed_url and checks every same-site page against one policy.
+    
+    Links are followed breadth-first up to max_pages, honoring robots.txt and
+    per-host politeness limits. Each page is analyzed as soon as it is found,
+    and its result is streamed back as one NDJSON line.
+    """
+    policy_url = str(request.policy_url)
+    extracted_rules = None
+    try:
+        if request.mode != "fast":
+            extracted_rules = await checker.load_policy_rules(policy_url)
+    except RateLimitExceeded as e:
+        raise rate_limited(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    async def stream_results():
+        async for result in checker.crawl_pages(
+            seed_url=str(request.seed_url),
+            policy_url=policy_url,
+            extracted_rules=extracted_rules,
+            max_pages=request.max_pages,
+            mode=request.mode
+        ):
+            yield result.model_dump_json() + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: ComplianceRequest, http_request: Request):
+    """
+    Queues a compliance check and returns its job id immediately.
+    
+    Poll GET /jobs/{job_id} for the status and, once completed, the result.
+    Returns 429 when the queue already holds JOB_QUEUE_MAX_SIZE pending jobs.
+    """
+    try:
+        job_id = await http_request.app.state.job_queue.submit(request.model_dump(mode="json"))
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)}, headers={"Retry-After": "30"})
+    http_request.app.state.job_workers.notify()
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, http_request: Request):
+    """
+    Returns a job's status, with its compliance result once it has completed.
+    """
+    job = await http_request.app.state.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    def timestamp(value):
+        return datetime.utcfromtimestamp(value).isoformat() if value else None
+
+    return JobStatus(
+        job_id=job["id"],
+        status=job["status"],
+        created_at=timestamp(job["created_at"]),
+        started_at=timestamp(job["started_at"]),
+        finished_at=timestamp(job["finished_at"]),
+        result=job["result"],
+        error=job["error"]
+    )
+
+def get_scan_history(checker: ComplianceChecker = Depends(get_checker)) -> ScanHistory:
+    if checker.scan_history is None:
+        raise HTTPException(status_code=404, detail="Scan history is disabled")
+    return checker.scan_history
+
+def history_timestamp(value: float) -> str:
+    return datetime.utcfromtimestamp(value).isoformat()
+
+def epoch(value: Optional[datetime]) -> Optional[float]:
+    """
+    Converts a query datetime to a Unix timestamp, reading naive values as UTC.
+    """
+    if value is None:
+        return None
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+def etag_matches(request: Request, etag: str) -> bool:
+    return etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+
+def cached_report(etag: str, report=None):
+    """
+    The JSON report with its ETag, or 304 Not Modified when report is None.
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if report is None:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=jsonable_encoder(report), headers=headers)
+
+async def history_etag(request: Request, history: ScanHistory) -> str:
+    # Scans are append-only, so a report can only change when a newer scan exists
+    return f'W/"{await history.version()}-{content_hash(request.url.path, str(request.url.query))[:16]}"'
+
+def scan_summary(scan: dict) -> ScanSummary:
+    return ScanSummary(
+        scan_id=scan["id"],
+        webpage_url=scan["webpage_url"],
+        policy_urls=scan["policy_urls"],
+        policy_hash=scan["policy_hash"],
+        mode=scan["mode"],
+        source=scan["source"],
+        violation_count=scan["violation_count"],
+        error=scan["error"],
+        scanned_at=history_timestamp(scan["scanned_at"])
+    )
+
+def stored_violation(violation: dict) -> dict:
+    # Models occasionally leave text fields empty
+    return {**violation, **{field: violation.get(field) or "" for field in ("type", "description", "context", "severity", "suggestion")}}
+
+@app.get("/scans", response_model=ScanPage)
+async def list_scans(
+    request: Request,
+    webpage_url: Optional[str] = None,
+    policy_url: Optional[str] = None,
+    policy_hash: Optional[str] = None,
+    has_violations: Optional[bool] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    history: ScanHistory = Depends(get_scan_history)
+):
+    """
+    Lists recorded scans, newest first, from the scan history only (no new checks are run).
+    
+    Pass next_cursor from a response as cursor to get the following page.
+    Responses carry an ETag; send it back in If-None-Match to get 304 while
+    no scan has been recorded since.
+    """
+    etag = await history_etag(request, history)
+    if etag_matches(request, etag):
+        return cached_report(etag)
+    scans, next_cursor = await history.list_scans(
+        webpage_url=webpage_url,
+        policy_url=policy_url,
+        policy_hash=policy_hash,
+        has_violations=has_violations,
+        since=epoch(since),
+        until=epoch(until),
+        cursor=cursor,
+        limit=limit
+    )
+    return cached_report(etag, ScanPage(scans=[scan_summary(scan) for scan in scans], next_cursor=next_cursor))
+
+@app.get("/scans/{scan_id}", response_model=ScanDetail)
+async def get_scan(scan_id: int, request: Request, history: ScanHistory = Depends(get_scan_history)):
+    """
+    Returns one recorded scan with its violations. Scans never change, so the ETag is fixed per scan.
+    """
+    etag = f'"scan-{scan_id}"'
+    # Ids are assigned in order and scans are never deleted, so every id up to the newest exists
+    if etag_matches(request, etag) and 0 < scan_id <= await history.version():
+        return cached_report(etag)
+    scan = await history.get_scan(scan_id)
+    if scan is None:
+        raise HTTPException(status_code=404, detail="Scan not found")
+    return cached_report(etag, ScanDetail(
+        **scan_summary(scan).model_dump(),
+        violations=[stored_violation(violation) for violation in scan["violations"]]
+    ))
+
+@app.get("/violations", response_model=ViolationPage)
+async def list_violations(
+    request: Request,
+    type: Optional[str] = None,
+    severity: Optional[str] = None,
+    rule_id: Optional[str] = None,
+    webpage_url: Optional[str] = None,
+    policy_url: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(settings.HISTORY_PAGE_SIZE, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    history: ScanHistory = Depends(get_scan_history)
+):
+    """
+    Lists recorded violations across scans, newest first, e.g. every
+    "disclosure" violation since last week. type and severity match
+    case-insensitively. Pagination and ETags work as for /scans.
+    """
+    etag = await history_etag(request, history)
+    if etag_matches(request, etag):
+        return cached_report(etag)
+    violations, next_cursor = await history.list_violations(
+        violation_type=type,
+        severity=severity,
+        rule_id=rule_id,
+        webpage_url=webpage_url,
+        policy_url=policy_url,
+        since=epoch(since),
+        until=epoch(until),
+        cursor=cursor,
+        limit=limit
+    )
+    return cached_report(etag, ViolationPage(
+        violations=[
+            ViolationRecord(**{
+                **stored_violation(violation),
+                "violation_id": violation["id"],
+                "scanned_at": history_timestamp(violation["scanned_at"])
+            })
+            for violation in violations
+        ],
+        next_cursor=next_cursor
+    ))
+
 @app.get("/health")
 async def health_check():
     """
     Health check endpoint to verify API availability
     """
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
\ No newline at end of file
+    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+
+@app.get("/ready")
+async def readiness_check(request: Request):
+    """
+    Readiness probe: 200 once this worker has finished starting up and its job
+    workers are running, 503 while starting, shutting down or degraded.
+    
+    Unlike /health, which only shows the process is alive, this tells a load
+    balancer whether to route traffic to the worker.
+    """
+    checks = {
+        "startup": getattr(request.app.state, "ready", False),
+        "job_workers": hasattr(request.app.state, "job_workers") and request.app.state.job_workers.running
+    }
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks, "timestamp": datetime.utcnow().isoformat()}
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Exposes stage latencies, LLM token usage and rules cache hits in the
+    Prometheus text format, summed over every worker process (METRICS_DB_PATH).
+    """
+    return PlainTextResponse(await asyncio.to_thread(render_metrics), media_type="text/plain; version=0.0.4")
@@ -1,10 +1,43 @@
 # app/models/schemas.py
-from pydantic import BaseModel, HttpUrl
-from typing import List, Dict, Optional
+from pydantic import BaseModel, HttpUrl, Field, model_validator
+from typing import List, Dict, Optional, Literal
+from app.config import settings
+
+# fast: deterministic COMPLIANCE_RULES matcher only; llm: policy analysis by the LLM; hybrid: both
+CheckMode = Literal["fast", "llm", "hybrid"]
 
 class ComplianceRequest(BaseModel):
     webpage_url: HttpUrl
+    # One policy, several, or both; the page is checked against all of them in one pass
+    policy_url: Optional[HttpUrl] = None
+    policy_urls: List[HttpUrl] = []
+    mode: CheckMode = "llm"
+    include_timings: bool = False
+
+    @model_validator(mode="after")
+    def require_policy(self):
+        if self.policy_url is None and not self.policy_urls:
+            raise ValueError("Provide policy_url or policy_urls")
+        return self
+
+    @property
+    def all_policy_urls(self) -> List[str]:
+        """
+        policy_url followed by policy_urls, without duplicates.
+        """
+        urls = ([self.policy_url] if self.policy_url is not None else []) + list(self.policy_urls)
+        return list(dict.fromkeys(str(url) for url in urls))
+
+class BatchComplianceRequest(BaseModel):
     policy_url: HttpUrl
+    webpage_urls: List[HttpUrl] = Field(..., min_length=1)
+    mode: CheckMode = "llm"
+
+class CrawlComplianceRequest(BaseModel):
+    seed_url: HttpUrl
+    policy_url: HttpUrl
+    max_pages: int = Field(100, ge=1, le=settings.CRAWL_MAX_PAGES)
+    mode: CheckMode = "llm"
 
 class ComplianceViolation(BaseModel):
     type: str
@@ -12,9 +45,63 @@ class ComplianceViolation(BaseModel):
     context: str
     severity: str
     suggestion: str
+    # Character offsets into the page's clean text, when known exactly
+    start: Optional[int] = None
+    end: Optional[int] = None
+    # The policy rule that was broken, for violations found by policy analysis
+    rule_id: Optional[str] = None
+    policy_url: Optional[str] = None
 
 class ComplianceResponse(BaseModel):
+    webpage_url: str
+    policy_url: str  # the first policy checked
+    policy_urls: List[str] = []
+    violations: List[ComplianceViolation]
+    scan_timestamp: str
+    timings: Optional[Dict[str, float]] = None
+    scan_id: Optional[int] = None  # id in the scan history, when recorded
+
+class BatchComplianceResult(BaseModel):
     webpage_url: str
     policy_url: str
+    violations: List[ComplianceViolation] = []
+    error: Optional[str] = None
+    scan_timestamp: str
+    scan_id: Optional[int] = None
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: Literal["queued", "running", "completed", "failed"]
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Optional[ComplianceResponse] = None
+    error: Optional[str] = None
+
+class ScanSummary(BaseModel):
+    scan_id: int
+    webpage_url: str
+    policy_urls: List[str]
+    policy_hash: Optional[str] = None
+    mode: str
+    source: str  # check, stream, batch or crawl
+    violation_count: int
+    error: Optional[str] = None
+    scanned_at: str
+
+class ScanDetail(ScanSummary):
     violations: List[ComplianceViolation]
-    scan_timestamp: str
\ No newline at end of file
+
+class ScanPage(BaseModel):
+    scans: List[ScanSummary]
+    next_cursor: Optional[int] = None
+
+class ViolationRecord(ComplianceViolation):
+    violation_id: int
+    scan_id: int
+    webpage_url: str
+    scanned_at: str
+
+class ViolationPage(BaseModel):
+    violations: List[ViolationRecord]
+    next_cursor: Optional[int] = None
@@ -1,33 +1,360 @@
-from typing import Dict, List
+import asyncio
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from datetime import datetime
-from app.models.schemas import ComplianceViolation, ComplianceResponse
+import httpx
+from app.models.schemas import ComplianceViolation, ComplianceRequest, ComplianceResponse, BatchComplianceResult, CheckMode
 from app.services.web_scraper import WebScraper
-from app.services.text_analyzer import TextAnalyzer
+from app.services.text_analyzer import ERROR_VIOLATION_TYPES, TextAnalyzer
+from app.services.rule_engine import RuleEngine
+from app.services.crawler import SiteCrawler
+from app.services.metrics import start_timings, track_stage
+from app.services.scan_history import ScanHistory
 from app.config import settings
+from app.utils.helper import format_sse
 from termcolor import colored
 
 class ComplianceChecker:
-    def __init__(self):
-        self.web_scraper = WebScraper()
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
+        self.web_scraper = WebScraper(client=http_client)
         self.text_analyzer = TextAnalyzer()
+        self.rule_engine = RuleEngine()
+        self.scan_history = ScanHistory() if settings.ENABLE_SCAN_HISTORY else None
 
-    async def check_compliance(self, webpage_url: str, policy_url: str) -> ComplianceResponse:
+    async def warm_up(self) -> None:
         """
-        Checks webpage compliance against a specified policy URL.
+        Prepares the checker before it takes traffic: starts the extraction
+        workers and loads cached rules. A failed step is logged, not raised,
+        since the first requests would do the same work anyway.
         """
-        # Fetch content from both URLs
-        webpage_content = await self.web_scraper.fetch_content(webpage_url)
-        policy_content = await self.web_scraper.fetch_content(policy_url)
+        results = await asyncio.gather(self.web_scraper.warm_up(), self.text_analyzer.warm_up(), return_exceptions=True)
+        for error in results:
+            if isinstance(error, Exception):
+                print(colored(f"Warm-up step failed: {str(error)}", "yellow"))
+
+    async def aclose(self) -> None:
+        """
+        Releases the network resources held by the checker.
+        """
+        await self.web_scraper.aclose()
+        await self.text_analyzer.aclose()
+
+    async def fetch_contents(self, webpage_url: str, policy_urls: List[str]) -> Tuple[Dict[str, str], Dict[str, Dict[str, str]]]:
+        """
+        Fetches the webpage and every policy concurrently.
         
-        # Analyze compliance
-        violations = await self.text_analyzer.analyze_compliance(
-            webpage_content=webpage_content,
-            policy_content=policy_content
+        Returns the webpage content and a dict of policy contents keyed by policy URL.
+        """
+        webpage_content, *policy_contents = await asyncio.gather(
+            self.web_scraper.fetch_content(webpage_url),
+            *(self.web_scraper.fetch_content(policy_url) for policy_url in policy_urls)
         )
+        return webpage_content, dict(zip(policy_urls, policy_contents))
 
-        return ComplianceResponse(
+    async def check_compliance(
+        self,
+        webpage_url: str,
+        policy_urls: List[str],
+        mode: CheckMode = "llm",
+        include_timings: bool = False
+    ) -> ComplianceResponse:
+        """
+        Checks webpage compliance against one or more policy URLs.
+        
+        The webpage is fetched once and analyzed once against the merged rules
+        of all policies; each violation's policy_url names the policy it breaks.
+        In "fast" mode only the deterministic rule engine runs and the policies
+        are not fetched. "hybrid" returns the rule engine's findings alongside the
+        LLM analysis. With include_timings the response carries the seconds
+        spent in each stage of this check.
+        """
+        timings = start_timings()
+        try:
+            with track_stage("total"):
+                violations, policy_hash = await self._run_check(webpage_url, policy_urls, mode)
+        except Exception as e:
+            await self._record_scan(webpage_url, policy_urls, None, mode, "check", [], str(e))
+            raise
+
+        response = ComplianceResponse(
             webpage_url=webpage_url,
-            policy_url=policy_url,
+            policy_url=policy_urls[0],
+            policy_urls=policy_urls,
             violations=violations,
-            scan_timestamp=datetime.utcnow().isoformat()
-        )
\ No newline at end of file
+            scan_timestamp=datetime.utcnow().isoformat(),
+            timings=timings if include_timings else None
+        )
+        response.scan_id = await self._record_scan(webpage_url, policy_urls, policy_hash, mode, "check", violations)
+        return response
+
+    async def _run_check(self, webpage_url: str, policy_urls: List[str], mode: CheckMode) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Returns the violations and the hash of the policies they were checked against (None in fast mode).
+        """
+        if mode == "fast":
+            webpage_content = await self.web_scraper.fetch_content(webpage_url)
+            return self._fast_violations(webpage_content), None
+        else:
+            # Fetch the webpage and every policy
+            webpage_content, policies = await self.fetch_contents(webpage_url, policy_urls)
+            
+            # Analyze compliance
+            violations = await self.text_analyzer.analyze_compliance(
+                webpage_content=webpage_content,
+                policies=policies,
+                webpage_url=webpage_url
+            )
+            if mode == "hybrid":
+                violations = self._fast_violations(webpage_content) + violations
+            return violations, self.text_analyzer.policies_hash(policies)
+
+    async def _record_scan(
+        self,
+        webpage_url: str,
+        policy_urls: List[str],
+        policy_hash: Optional[str],
+        mode: CheckMode,
+        source: str,
+        violations: List[Dict],
+        error: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        Saves a finished scan to the scan history and returns its id.
+        
+        The analyzer reports its own failures as pseudo-violations
+        (ERROR_VIOLATION_TYPES); they are recorded as the scan's error, not
+        as violations. History is best effort: a failure to record is logged,
+        never raised, so it cannot fail the check itself.
+        """
+        if self.scan_history is None:
+            return None
+        failures = [violation for violation in violations if violation.get('type') in ERROR_VIOLATION_TYPES]
+        if failures:
+            violations = [violation for violation in violations if violation.get('type') not in ERROR_VIOLATION_TYPES]
+            error = error or "; ".join(str(failure.get('description') or failure.get('type')) for failure in failures)
+        try:
+            return await self.scan_history.record(webpage_url, policy_urls, policy_hash, mode, source, violations, error)
+        except Exception as e:
+            print(colored(f"Failed to record scan of {webpage_url}: {str(e)}", "red"))
+            return None
+
+    async def run_job(self, request: Dict) -> Dict:
+        """
+        Job queue handler: runs a queued ComplianceRequest and returns the response as JSON data.
+        """
+        job_request = ComplianceRequest(**request)
+        result = await self.check_compliance(
+            webpage_url=str(job_request.webpage_url),
+            policy_urls=job_request.all_policy_urls,
+            mode=job_request.mode,
+            include_timings=job_request.include_timings
+        )
+        return result.model_dump()
+
+    def _fast_violations(self, webpage_content: Dict[str, str]) -> List[Dict]:
+        with track_stage("rule_engine"):
+            return [violation.model_dump() for violation in self.rule_engine.scan(webpage_content['clean_text'])]
+
+    async def check_compliance_stream(
+        self,
+        webpage_url: str,
+        policy_urls: List[str],
+        mode: CheckMode = "llm",
+        include_timings: bool = False
+    ) -> AsyncIterator[str]:
+        """
+        Streams a compliance check as Server-Sent Events.
+        
+        A progress event for the fetch stage comes first. Rule engine findings
+        (fast and hybrid modes) are sent immediately after the fetch, followed
+        by the analyzer's rules extraction progress and one event per LLM
+        violation. Failures are reported as an error event, since the response
+        status has already been sent. With include_timings a final "timings"
+        event carries the seconds spent in each stage.
+        """
+        timings = start_timings()
+        with track_stage("total"):
+            async for event in self._stream_check(webpage_url, policy_urls, mode):
+                yield event
+        if include_timings:
+            yield format_sse("timings", timings)
+
+    async def _stream_check(self, webpage_url: str, policy_urls: List[str], mode: CheckMode) -> AsyncIterator[str]:
+        violations: List[Dict] = []
+        policy_hash = None
+        try:
+            yield format_sse("progress", {"stage": "fetch", "status": "started"})
+            if mode == "fast":
+                webpage_content = await self.web_scraper.fetch_content(webpage_url)
+            else:
+                webpage_content, policies = await self.fetch_contents(webpage_url, policy_urls)
+            yield format_sse("progress", {"stage": "fetch", "status": "completed"})
+
+            if mode != "llm":
+                violations.extend(self._fast_violations(webpage_content))
+                for violation in violations:
+                    yield format_sse("violation", violation)
+                if mode == "fast":
+                    await self._record_scan(webpage_url, policy_urls, None, mode, "stream", violations)
+                    yield format_sse("done", {"violation_count": len(violations)})
+                    return
+
+            policy_hash = self.text_analyzer.policies_hash(policies)
+            async for event in self.text_analyzer.analyze_compliance_stream(
+                webpage_content=webpage_content,
+                policies=policies,
+                collected=violations
+            ):
+                if event.startswith("event: done"):
+                    await self._record_scan(webpage_url, policy_urls, policy_hash, mode, "stream", violations)
+                    # The analyzer counts only its own violations; in hybrid mode the rule engine's came first
+                    event = format_sse("done", {"violation_count": len(violations)})
+                yield event
+        except Exception as e:
+            await self._record_scan(webpage_url, policy_urls, policy_hash, mode, "stream", violations, str(e))
+            yield format_sse("error", {"detail": str(e)})
+
+    async def load_policy_rules(self, policy_url: str) -> List[Dict]:
+        """
+        Fetches a policy and extracts its rules once, for reuse across many pages.
+        """
+        policy_content = await self.web_scraper.fetch_content(policy_url)
+        return await self.text_analyzer.extract_policy_rules({policy_url: policy_content})
+
+    async def check_pages(
+        self,
+        webpage_urls: List[str],
+        policy_url: str,
+        extracted_rules: Optional[List[Dict]],
+        mode: CheckMode = "llm"
+    ) -> AsyncIterator[BatchComplianceResult]:
+        """
+        Checks many webpages against already extracted policy rules.
+        
+        extracted_rules may be None in "fast" mode, where only the rule engine runs.
+        
+        At most MAX_CONCURRENT_REQUESTS pages are in flight at once. Results are
+        yielded in completion order, and a failing page yields a result carrying
+        the error instead of aborting the batch.
+        """
+        semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_REQUESTS)
+
+        async def check_page(webpage_url: str) -> BatchComplianceResult:
+            async with semaphore:
+                return await self._page_result(webpage_url, policy_url, extracted_rules, mode, "batch")
+
+        tasks = [asyncio.create_task(check_page(url)) for url in webpage_urls]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # The client went away mid-stream: stop the remaining work
+            for task in tasks:
+                task.cancel()
+
+    async def crawl_pages(
+        self,
+        seed_url: str,
+        policy_url: str,
+        extracted_rules: Optional[List[Dict]],
+        max_pages: int,
+        mode: CheckMode = "llm"
+    ) -> AsyncIterator[BatchComplianceResult]:
+        """
+        Crawls a site from seed_url and checks every page it discovers.
+        
+        Each page is analyzed as soon as the crawler has fetched it, while the
+        crawl goes on, and results are yielded as each analysis finishes.
+        The crawler only gets to hand over its next page once one of the
+        MAX_CONCURRENT_REQUESTS analysis slots is free, and it stops fetching
+        while pages wait, so a long crawl holds a bounded number of pages in
+        memory however much faster fetching is than analysis.
+        """
+        crawler = SiteCrawler(self.web_scraper, max_pages=max_pages)
+        semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_REQUESTS)
+        results: asyncio.Queue = asyncio.Queue()
+        analyses: List[asyncio.Task] = []
+        finished = object()
+
+        async def analyze(webpage_url: str, webpage_content: Optional[Dict], error: Optional[str]) -> None:
+            # The slot was taken by crawl() before this page was accepted
+            try:
+                if webpage_content is None:
+                    await results.put(BatchComplianceResult(
+                        webpage_url=webpage_url,
+                        policy_url=policy_url,
+                        error=error,
+                        scan_timestamp=datetime.utcnow().isoformat(),
+                        scan_id=await self._record_scan(webpage_url, [policy_url], None, mode, "crawl", [], error)
+                    ))
+                    return
+                await results.put(await self._page_result(webpage_url, policy_url, extracted_rules, mode, "crawl", webpage_content))
+            finally:
+                semaphore.release()
+
+        async def crawl() -> None:
+            pages = crawler.crawl(seed_url)
+            try:
+                while True:
+                    await semaphore.acquire()
+                    try:
+                        webpage_url, webpage_content, error = await pages.__anext__()
+                    except StopAsyncIteration:
+                        semaphore.release()
+                        break
+                    analyses.append(asyncio.create_task(analyze(webpage_url, webpage_content, error)))
+                await asyncio.gather(*analyses)
+            finally:
+                await pages.aclose()
+                await results.put(finished)
+
+        crawl_task = asyncio.create_task(crawl())
+        try:
+            while True:
+                result = await results.get()
+                if result is finished:
+                    break
+                yield result
+            # Surface a crawler failure, if any
+            await crawl_task
+        finally:
+            crawl_task.cancel()
+            for task in analyses:
+                task.cancel()
+
+    async def _page_result(
+        self,
+        webpage_url: str,
+        policy_url: str,
+        extracted_rules: Optional[List[Dict]],
+        mode: CheckMode,
+        source: str,
+        webpage_content: Optional[Dict[str, str]] = None
+    ) -> BatchComplianceResult:
+        """
+        Checks one page (fetching it unless its content is given), records it in the scan history, and never raises.
+        """
+        policy_hash = self.text_analyzer.rules_policies_hash(extracted_rules) if extracted_rules else None
+        try:
+            if webpage_content is None:
+                webpage_content = await self.web_scraper.fetch_content(webpage_url)
+            violations = []
+            if mode != "llm":
+                violations += self._fast_violations(webpage_content)
+            if mode != "fast":
+                violations += await self.text_analyzer.analyze_against_rules(webpage_content, extracted_rules)
+            result = BatchComplianceResult(
+                webpage_url=webpage_url,
+                policy_url=policy_url,
+                violations=violations,
+                scan_timestamp=datetime.utcnow().isoformat()
+            )
+        except Exception as e:
+            result = BatchComplianceResult(
+                webpage_url=webpage_url,
+                policy_url=policy_url,
+                error=str(e),
+                scan_timestamp=datetime.utcnow().isoformat()
+            )
+            violations = []
+        result.scan_id = await self._record_scan(webpage_url, [policy_url], policy_hash, mode, source, violations, result.error)
+        return result
\ No newline at end of file
@@ -0,0 +1,159 @@
+# app/services/crawler.py
+import asyncio
+import time
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+from app.config import settings
+from app.services.web_scraper import WebScraper
+
+# Links to these resources are never pages worth checking
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js",
+    ".zip", ".gz", ".mp3", ".mp4", ".mov", ".woff", ".woff2", ".xml", ".json"
+)
+
+# (url, content, error): content is None when the page could not be fetched
+CrawledPage = Tuple[str, Optional[Dict], Optional[str]]
+
+
+def _site_host(url: str) -> str:
+    host = urlsplit(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+class SiteCrawler:
+    """
+    Breadth-first crawler that discovers same-site pages from a seed URL.
+
+    Pages are fetched through the shared WebScraper, so links come from the
+    same parsed tree used for text extraction. robots.txt is honored, at most
+    CRAWL_PER_HOST_CONCURRENCY requests run per host, and requests to a host
+    are spaced by the larger of CRAWL_DELAY and the robots.txt Crawl-delay.
+    """
+
+    def __init__(
+        self,
+        web_scraper: WebScraper,
+        max_pages: int = settings.CRAWL_MAX_PAGES,
+        per_host_concurrency: int = settings.CRAWL_PER_HOST_CONCURRENCY,
+        delay: float = settings.CRAWL_DELAY
+    ):
+        self.web_scraper = web_scraper
+        self.max_pages = max_pages
+        self.per_host_concurrency = per_host_concurrency
+        self.delay = delay
+        self._robots: Dict[str, RobotFileParser] = {}
+        self._robots_locks: Dict[str, asyncio.Lock] = {}
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._next_request_at: Dict[str, float] = {}
+
+    async def crawl(self, seed_url: str) -> AsyncIterator[CrawledPage]:
+        """
+        Yields each page as soon as it is fetched, while the crawl continues.
+        
+        At most CRAWL_PER_HOST_CONCURRENCY fetched pages wait for the consumer;
+        beyond that the workers pause until it takes the next page.
+        """
+        site = _site_host(seed_url)
+        frontier: asyncio.Queue = asyncio.Queue()
+        # Bounded, so workers stop fetching while the consumer is not taking pages
+        pages: asyncio.Queue = asyncio.Queue(maxsize=max(self.per_host_concurrency, 1))
+        seen: Set[str] = {seed_url}
+        frontier.put_nowait(seed_url)
+
+        async def worker() -> None:
+            while True:
+                url = await frontier.get()
+                try:
+                    page = await self._visit(url)
+                    if page is None:
+                        continue
+                    await pages.put(page)
+                    for link in (page[1] or {}).get("links", []):
+                        if len(seen) >= self.max_pages:
+                            break
+                        if link not in seen and _site_host(link) == site and not urlsplit(link).path.lower().endswith(SKIPPED_EXTENSIONS):
+                            seen.add(link)
+                            frontier.put_nowait(link)
+                finally:
+                    frontier.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(self.per_host_concurrency, 1))]
+        drained = asyncio.create_task(frontier.join())
+        try:
+            while True:
+                next_page = asyncio.create_task(pages.get())
+                await asyncio.wait({next_page, drained}, return_when=asyncio.FIRST_COMPLETED)
+                if next_page.done():
+                    yield next_page.result()
+                    continue
+                next_page.cancel()
+                # Frontier is empty and every worker is idle: flush what is left
+                while not pages.empty():
+                    yield pages.get_nowait()
+                return
+        finally:
+            drained.cancel()
+            for task in workers:
+                task.cancel()
+
+    async def _visit(self, url: str) -> Optional[CrawledPage]:
+        """
+        Fetches one page politely. Returns None if robots.txt disallows it.
+        """
+        if not await self._allowed(url):
+            return None
+        host = urlsplit(url).netloc.lower()
+        async with self._host_slots.setdefault(host, asyncio.Semaphore(max(self.per_host_concurrency, 1))):
+            await self._wait_turn(host, url)
+            try:
+                return url, await self.web_scraper.fetch_content(url, include_links=True), None
+            except Exception as e:
+                return url, None, str(e)
+
+    async def _wait_turn(self, host: str, url: str) -> None:
+        """
+        Spaces consecutive requests to the same host by the politeness delay.
+        """
+        robots = self._robots.get(self._robots_url(url))
+        crawl_delay = robots.crawl_delay(settings.USER_AGENT) if robots is not None else None
+        delay = max(self.delay, float(crawl_delay or 0))
+        async with self._host_locks.setdefault(host, asyncio.Lock()):
+            wait = self._next_request_at.get(host, 0.0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_request_at[host] = time.monotonic() + delay
+
+    @staticmethod
+    def _robots_url(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}/robots.txt"
+
+    async def _allowed(self, url: str) -> bool:
+        """
+        Checks url against its host's robots.txt, fetching and caching it on first use.
+        """
+        robots_url = self._robots_url(url)
+        async with self._robots_locks.setdefault(robots_url, asyncio.Lock()):
+            if robots_url not in self._robots:
+                self._robots[robots_url] = await self._load_robots(robots_url)
+        return self._robots[robots_url].can_fetch(settings.USER_AGENT, url)
+
+    async def _load_robots(self, robots_url: str) -> RobotFileParser:
+        robots = RobotFileParser(robots_url)
+        try:
+            response = await self.web_scraper.client.get(robots_url, headers=self.web_scraper.headers)
+        except Exception:
+            # Unreachable robots.txt: treat the site as open, like a missing file
+            robots.parse([])
+            return robots
+        if response.status_code >= 500:
+            # Server errors mean the rules are unknown, so stay off the site
+            robots.disallow_all = True
+        elif response.status_code >= 400:
+            robots.allow_all = True
+        else:
+            robots.parse(response.text.splitlines())
+        return robots
@@ -0,0 +1,273 @@
+# app/services/job_queue.py
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from app.config import settings
+from termcolor import colored
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a job is submitted while JOB_QUEUE_MAX_SIZE jobs are already pending.
+    """
+
+
+class JobQueue:
+    """
+    Persistent FIFO of compliance jobs stored in SQLite (JOB_DB_PATH).
+
+    A worker claims a job by taking a lease on it and renews the lease while
+    the job runs. Jobs whose lease ran out, for example because the process
+    died or restarted, become claimable again. So queued work survives
+    restarts, and several worker processes can share one queue file.
+
+    Every claim gets a new lease token, and only the holder of the current
+    lease can renew, complete or fail the job, so a worker that lost its
+    lease cannot overwrite the outcome of the worker that re-claimed it. A
+    job whose lease runs out after JOB_MAX_ATTEMPTS claims is failed instead
+    of being claimed again.
+    """
+
+    def __init__(
+        self,
+        db_path: str = settings.JOB_DB_PATH,
+        max_size: int = settings.JOB_QUEUE_MAX_SIZE,
+        lease_seconds: int = settings.JOB_LEASE_SECONDS,
+        max_attempts: int = settings.JOB_MAX_ATTEMPTS
+    ):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._init_db()
+
+    async def submit(self, request: Dict[str, Any]) -> str:
+        """
+        Enqueues a job and returns its id. Raises QueueFullError when the queue is full.
+        """
+        return await asyncio.to_thread(self._db_submit, request)
+
+    async def claim(self) -> Optional[Tuple[str, Dict[str, Any], str]]:
+        """
+        Leases the oldest runnable job, returning (job_id, request, lease), or None if there is none.
+        """
+        return await asyncio.to_thread(self._db_claim)
+
+    async def renew(self, job_id: str, lease: str) -> bool:
+        """
+        Extends the lease. Returns False if it was lost to another worker.
+        """
+        return await asyncio.to_thread(self._db_update, "SET lease_expires_at = ?", (time.time() + self.lease_seconds,), job_id, lease)
+
+    async def complete(self, job_id: str, lease: str, result: Dict[str, Any]) -> bool:
+        """
+        Records the result. Returns False, writing nothing, if the lease was lost.
+        """
+        return await asyncio.to_thread(self._db_update, "SET status = 'completed', result = ?, finished_at = ?", (json.dumps(result), time.time()), job_id, lease)
+
+    async def fail(self, job_id: str, lease: str, error: str) -> bool:
+        """
+        Records the error. Returns False, writing nothing, if the lease was lost.
+        """
+        return await asyncio.to_thread(self._db_update, "SET status = 'failed', error = ?, finished_at = ?", (error, time.time()), job_id, lease)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the job record, with its result decoded, or None for an unknown id.
+        """
+        return await asyncio.to_thread(self._db_get, job_id)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode, so BEGIN IMMEDIATE below controls the write lock explicitly
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL, "
+                "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, started_at REAL, finished_at REAL, lease_expires_at REAL, lease TEXT)"
+            )
+            # Queue files created before leases had tokens
+            if "lease" not in [column[1] for column in conn.execute("PRAGMA table_info(jobs)")]:
+                conn.execute("ALTER TABLE jobs ADD COLUMN lease TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+        finally:
+            conn.close()
+
+    def _db_update(self, assignments: str, params: tuple, job_id: str, lease: str) -> bool:
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"UPDATE jobs {assignments} WHERE id = ? AND lease = ? AND status = 'running'",
+                (*params, job_id, lease)
+            )
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def _db_submit(self, request: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            (pending,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()
+            if pending >= self.max_size:
+                conn.execute("ROLLBACK")
+                raise QueueFullError(f"Job queue is full ({pending} pending jobs)")
+            conn.execute(
+                "INSERT INTO jobs (id, status, request, created_at) VALUES (?, 'queued', ?, ?)",
+                (job_id, json.dumps(request), time.time())
+            )
+            conn.execute("COMMIT")
+            return job_id
+        finally:
+            conn.close()
+
+    def _db_claim(self) -> Optional[Tuple[str, Dict[str, Any], str]]:
+        now = time.time()
+        lease = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # A job whose every claim so far ended with an expired lease is not tried again
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease = NULL "
+                "WHERE status = 'running' AND lease_expires_at < ? AND attempts >= ?",
+                (f"Abandoned after {self.max_attempts} attempts: the worker stopped or timed out each time", now, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT id, request FROM jobs "
+                "WHERE status = 'queued' OR (status = 'running' AND lease_expires_at < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, lease_expires_at = ?, lease = ?, attempts = attempts + 1 WHERE id = ?",
+                (now, now + self.lease_seconds, lease, row[0])
+            )
+            conn.execute("COMMIT")
+            return row[0], json.loads(row[1]), lease
+        finally:
+            conn.close()
+
+    def _db_get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        conn.row_factory = sqlite3.Row
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+class JobWorkerPool:
+    """
+    In-process workers (JOB_WORKERS of them) that drain a JobQueue.
+
+    Each worker claims a job, keeps its lease alive while the handler runs,
+    and records the result or error. Idle workers poll every JOB_POLL_INTERVAL
+    seconds and are woken at once by jobs submitted in this process.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        workers: int = settings.JOB_WORKERS,
+        poll_interval: float = settings.JOB_POLL_INTERVAL
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Cancels the workers. Jobs they were running are picked up again once their lease expires.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def running(self) -> bool:
+        """
+        True while every worker task is still alive.
+        """
+        return len(self._tasks) == self.workers and not any(task.done() for task in self._tasks)
+
+    def notify(self) -> None:
+        """
+        Wakes idle workers after a submission.
+        """
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.queue.claim()
+            except Exception as e:
+                print(colored(f"Job queue unavailable: {str(e)}", "red"))
+                claimed = None
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._process(*claimed)
+            except Exception as e:
+                # The job stays leased and is retried once the lease expires; this worker carries on
+                print(colored(f"Job {claimed[0]} could not be recorded: {str(e)}", "red"))
+
+    async def _process(self, job_id: str, request: Dict[str, Any], lease: str) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, lease))
+        try:
+            result = await self.handler(request)
+        except Exception as e:
+            recorded = await self.queue.fail(job_id, lease, str(e))
+        else:
+            recorded = await self.queue.complete(job_id, lease, result)
+        finally:
+            heartbeat.cancel()
+        if not recorded:
+            print(colored(f"Job {job_id} lost its lease; its outcome was not recorded", "yellow"))
+
+    async def _heartbeat(self, job_id: str, lease: str) -> None:
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                renewed = await self.queue.renew(job_id, lease)
+            except Exception as e:
+                # A busy database must not stop the heartbeat; try again on the next beat
+                print(colored(f"Job {job_id} lease renewal failed: {str(e)}", "red"))
+                continue
+            if not renewed:
+                return
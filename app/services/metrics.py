@@ -0,0 +1,355 @@
+# app/services/metrics.py
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from termcolor import colored
+from app.config import settings
+
+# Seconds; spans cover sub-millisecond cache hits up to multi-minute chunked analyses
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonic counter with labels, exported in Prometheus text format.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(name, "")) for name in self.labelnames), 0)
+
+    def snapshot(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self, values: Optional[Dict[LabelValues, float]] = None) -> List[str]:
+        """
+        Renders this process's values, or the given ones (e.g. summed across processes).
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted((self.snapshot() if values is None else values).items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with labels, exported in Prometheus text format.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., +Inf count, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[LabelValues, List[float]]:
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    def render(self, values: Optional[Dict[LabelValues, List[float]]] = None) -> List[str]:
+        """
+        Renders this process's series, or the given ones (e.g. summed across processes).
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted((self.snapshot() if values is None else values).items()):
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', f'{bound:g}'))} {count:g}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {series[-2]:g}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-2]:g}")
+        return lines
+
+
+class MetricsStore:
+    """
+    Shares metric values between worker processes through a SQLite file (METRICS_DB_PATH).
+
+    Each process publishes a snapshot of its own values into its own row, and
+    a scrape of any worker adds up the rows of every process. Rows of workers
+    that have exited are kept, so counters do not go backwards when gunicorn
+    replaces a worker; run.py clears the file when the server starts.
+    
+    Methods block on SQLite; call them from a thread.
+    """
+
+    def __init__(self, db_path: str = settings.METRICS_DB_PATH):
+        self.db_path = db_path
+        self._init_db()
+
+    def publish(self, process: str, snapshot: Dict[str, Dict[LabelValues, Any]]) -> None:
+        """
+        Replaces a process's published values with its current snapshot.
+        """
+        payload = {name: [[list(key), value] for key, value in values.items()] for name, values in snapshot.items()}
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO process_metrics (process, snapshot, published_at) VALUES (?, ?, ?)",
+                    (process, json.dumps(payload), time.time())
+                )
+        finally:
+            conn.close()
+
+    def collect(self) -> Dict[str, Dict[LabelValues, Any]]:
+        """
+        Sums the published values of every process: counters add up, histogram series add up bucket by bucket.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT snapshot FROM process_metrics").fetchall()
+        finally:
+            conn.close()
+        totals: Dict[str, Dict[LabelValues, Any]] = {}
+        for (payload,) in rows:
+            for name, series in json.loads(payload).items():
+                values = totals.setdefault(name, {})
+                for key, value in series:
+                    key = tuple(key)
+                    current = values.get(key)
+                    if current is None:
+                        values[key] = value
+                    elif isinstance(value, list):
+                        values[key] = [total + added for total, added in zip(current, value)]
+                    else:
+                        values[key] = current + value
+        return totals
+
+    def clear(self) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM process_metrics")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS process_metrics ("
+                    "process TEXT PRIMARY KEY, snapshot TEXT NOT NULL, published_at REAL NOT NULL)"
+                )
+        finally:
+            conn.close()
+
+
+STAGE_SECONDS = Histogram(
+    "compliance_stage_duration_seconds",
+    "Wall time spent in each stage of a compliance check.",
+    ("stage",)
+)
+LLM_TOKENS = Counter(
+    "compliance_llm_tokens_total",
+    "Tokens reported by the LLM provider's usage fields.",
+    ("model", "kind")
+)
+LLM_CALLS = Counter(
+    "compliance_llm_calls_total",
+    "Completed LLM calls.",
+    ("model", "streamed")
+)
+RULES_CACHE = Counter(
+    "compliance_rules_cache_requests_total",
+    "Rules cache lookups by result.",
+    ("result",)
+)
+TRIAGE_DECISIONS = Counter(
+    "compliance_triage_decisions_total",
+    "Page chunks screened by the triage model, by outcome (escalated, cleared, failed). "
+    "Failed screenings are escalated too.",
+    ("outcome",)
+)
+VIOLATION_REPAIRS = Counter(
+    "compliance_violation_repairs_total",
+    "Analysis responses that were cut off or malformed, by outcome of the repair call "
+    "(repaired, failed, skipped when ENABLE_VIOLATION_REPAIR is off).",
+    ("outcome",)
+)
+
+REGISTRY = [STAGE_SECONDS, LLM_TOKENS, LLM_CALLS, RULES_CACHE, TRIAGE_DECISIONS, VIOLATION_REPAIRS]
+
+# (pid, row name) of this process in the metrics store; renewed after a fork
+_process: Tuple[int, str] = (0, "")
+_store: Optional[MetricsStore] = None
+
+# Per-check timings block, shared by the tasks a check spawns
+_current_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("compliance_timings", default=None)
+
+
+def start_timings() -> Dict[str, float]:
+    """
+    Starts collecting stage timings for the current check and returns the dict they go into.
+
+    Call it at the top of a check, before any task is spawned, so child tasks share it.
+    """
+    timings: Dict[str, float] = {}
+    _current_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """
+    Times a block as one span of the given stage.
+
+    Every span is observed in the stage histogram. If the current check is
+    collecting timings, its block also gets the stage's duration in seconds.
+    Spans of the same stage often run concurrently (two fetches, parallel
+    chunk analyses), so the block keeps the longest span, which is close to
+    the stage's wall time.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
+
+
+def observe_stage(stage: str, elapsed: float) -> None:
+    """
+    Records a stage duration measured by the caller; see track_stage.
+    """
+    STAGE_SECONDS.observe(elapsed, stage=stage)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings[stage] = round(max(timings.get(stage, 0.0), elapsed), 6)
+
+
+def record_llm_usage(model: str, usage: Any, streamed: bool = False) -> None:
+    """
+    Counts a finished LLM call and the prompt and completion tokens in its usage block.
+    """
+    LLM_CALLS.inc(model=model, streamed=str(streamed).lower())
+    if usage is None:
+        return
+    LLM_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+    LLM_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+
+
+def _shared_store() -> Optional[MetricsStore]:
+    global _store
+    if not settings.METRICS_DB_PATH:
+        return None
+    if _store is None or _store.db_path != settings.METRICS_DB_PATH:
+        _store = MetricsStore(settings.METRICS_DB_PATH)
+    return _store
+
+
+def _process_name() -> str:
+    """
+    This process's row in the metrics store. A reused pid gets a fresh row, so a dead worker's counts are kept.
+    """
+    global _process
+    if _process[0] != os.getpid():
+        _process = (os.getpid(), f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+    return _process[1]
+
+
+def publish_metrics() -> None:
+    """
+    Publishes this process's values to the shared metrics store, if METRICS_DB_PATH is set. Blocks on SQLite.
+    """
+    store = _shared_store()
+    if store is not None:
+        store.publish(_process_name(), {metric.name: metric.snapshot() for metric in REGISTRY})
+
+
+async def publish_periodically(interval: float = settings.METRICS_PUBLISH_INTERVAL) -> None:
+    """
+    Publishes this process's metrics every interval seconds until cancelled,
+    so a scrape served by another worker sees them, and once more on the way
+    out so the worker's final values stay in the totals after it exits.
+    """
+    async def publish() -> None:
+        try:
+            await asyncio.to_thread(publish_metrics)
+        except Exception as e:
+            print(colored(f"Failed to publish metrics: {str(e)}", "yellow"))
+
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            await publish()
+    finally:
+        await publish()
+
+
+def clear_shared_metrics() -> None:
+    """
+    Drops every process's published values; called once when the server starts.
+    """
+    store = _shared_store()
+    if store is not None:
+        store.clear()
+
+
+def render_metrics() -> str:
+    """
+    Renders every metric in the Prometheus text exposition format.
+
+    With METRICS_DB_PATH set, this process publishes its values first and the
+    output is the sum over all worker processes; other workers' values are at
+    most METRICS_PUBLISH_INTERVAL seconds old. Blocks on SQLite in that case.
+    """
+    store = _shared_store()
+    totals = None
+    if store is not None:
+        publish_metrics()
+        totals = store.collect()
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(None if totals is None else totals.get(metric.name, {})))
+    return "\n".join(lines) + "\n"
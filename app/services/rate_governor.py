@@ -0,0 +1,128 @@
+# app/services/rate_governor.py
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Deque, List, Optional, TypeVar
+from app.config import settings
+
+T = TypeVar("T")
+
+WINDOW_SECONDS = 60.0
+
+# Provider responses that mean "slow down and try again"
+RETRYABLE_STATUS_CODES = {429, 503}
+
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when the LLM provider keeps rate limiting after every retry.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """
+    Reads the provider's Retry-After (seconds or HTTP date) from an API error, if present.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+
+class RateGovernor:
+    """
+    Process-wide throttle around every LLM call.
+
+    Calls are admitted under two sliding one-minute budgets: requests
+    (RATE_LIMIT_PER_MINUTE) and estimated tokens (TOKEN_LIMIT_PER_MINUTE).
+    When the provider still answers 429/503, the call is retried up to
+    LLM_MAX_RETRIES times. Each retry waits for the provider's Retry-After,
+    or for jittered exponential backoff. During that wait all other calls
+    pause too, instead of piling onto a provider that is already refusing
+    requests.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = settings.RATE_LIMIT_PER_MINUTE,
+        tokens_per_minute: int = settings.TOKEN_LIMIT_PER_MINUTE,
+        max_retries: int = settings.LLM_MAX_RETRIES,
+        enabled: bool = settings.ENABLE_RATE_LIMIT
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.enabled = enabled
+        self._window: Deque[List[float]] = deque()  # [admitted_at, estimated_tokens]
+        self._window_tokens = 0.0
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def call(self, request: Callable[[], Awaitable[T]], estimated_tokens: int) -> T:
+        """
+        Runs request() once budget allows, retrying it on provider rate limits.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(estimated_tokens)
+            try:
+                return await request()
+            except Exception as e:
+                if getattr(e, "status_code", None) not in RETRYABLE_STATUS_CODES:
+                    raise
+                retry_after = _retry_after(e)
+                if attempt >= self.max_retries:
+                    raise RateLimitExceeded(f"LLM provider rate limit persisted after {attempt + 1} attempts: {str(e)}", retry_after) from e
+                if retry_after is not None:
+                    # Up to 20% extra so callers told the same Retry-After do not return in lockstep
+                    delay = retry_after * random.uniform(1.0, 1.2)
+                else:
+                    # Full jitter keeps retrying workers from synchronizing
+                    delay = random.uniform(0, min(settings.LLM_BACKOFF_MAX, settings.LLM_BACKOFF_BASE * 2 ** attempt))
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                attempt += 1
+
+    async def acquire(self, estimated_tokens: int) -> None:
+        """
+        Waits until a call of estimated_tokens fits in both per-minute budgets, then reserves it.
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                # Backoff after a provider rate limit applies even with budgets disabled
+                if self._paused_until > now:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if not self.enabled:
+                    return
+
+                while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+                    self._window_tokens -= self._window.popleft()[1]
+
+                # An oversized call is admitted alone rather than never
+                fits_tokens = not self._window or self._window_tokens + estimated_tokens <= self.tokens_per_minute
+                if len(self._window) < self.requests_per_minute and fits_tokens:
+                    self._window.append([now, float(estimated_tokens)])
+                    self._window_tokens += estimated_tokens
+                    return
+
+                await asyncio.sleep(WINDOW_SECONDS - (now - self._window[0][0]))
@@ -0,0 +1,103 @@
+# app/services/rule_engine.py
+import re
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.models.schemas import ComplianceViolation
+
+# How far to look around a match, at most, when quoting its sentence as context
+CONTEXT_WINDOW = 120
+
+
+class RuleEngine:
+    """
+    Deterministic fast path over settings.COMPLIANCE_RULES.
+
+    All prohibited phrases, treasury terms and the required disclaimer are
+    compiled into a single case-insensitive alternation with word boundaries.
+    Each named group identifies one rule, so a single linear scan of the text
+    finds every occurrence and its exact offsets, with no LLM call.
+    """
+
+    def __init__(self, rules: Optional[Dict] = None):
+        rules = rules if rules is not None else settings.COMPLIANCE_RULES
+        self.disclaimer_required = bool(rules.get("disclaimer_required")) and bool(rules.get("disclaimer_text"))
+        self.disclaimer_text = rules.get("disclaimer_text", "")
+
+        # group name -> (kind, phrase as configured)
+        self._groups: Dict[str, Tuple[str, str]] = {}
+        terms: List[Tuple[str, str]] = (
+            [("prohibited_phrase", phrase) for phrase in rules.get("prohibited_phrases", [])]
+            + [("treasury_term", term) for term in rules.get("treasury_terms", [])]
+        )
+        if self.disclaimer_required:
+            terms.append(("disclaimer", self.disclaimer_text))
+
+        # Longest phrases first so "deposit account" wins over any shorter overlapping term
+        alternatives = []
+        for index, (kind, phrase) in enumerate(sorted(terms, key=lambda term: -len(term[1]))):
+            group = f"r{index}"
+            self._groups[group] = (kind, phrase)
+            words = r"\s+".join(re.escape(word) for word in phrase.split())
+            alternatives.append(f"(?P<{group}>{words})")
+
+        self._pattern = re.compile(r"\b(?:" + "|".join(alternatives) + r")\b", re.IGNORECASE) if alternatives else None
+
+    def scan(self, text: str) -> List[ComplianceViolation]:
+        """
+        Scans text once and returns the rule violations it contains, with offsets.
+        """
+        text = text or ""
+        violations: List[ComplianceViolation] = []
+        treasury_matches: List[Tuple[str, re.Match]] = []
+        disclaimer_found = False
+
+        for match in (self._pattern.finditer(text) if self._pattern else ()):
+            kind, phrase = self._groups[match.lastgroup]
+            if kind == "disclaimer":
+                disclaimer_found = True
+            elif kind == "treasury_term":
+                treasury_matches.append((phrase, match))
+            else:
+                violations.append(ComplianceViolation(
+                    type="prohibited_phrase",
+                    description=f'The phrase "{match.group(0)}" is prohibited by the compliance rules.',
+                    context=self._context(text, match.start(), match.end()),
+                    severity="high",
+                    suggestion=f'Remove or rephrase "{match.group(0)}" using approved terminology.',
+                    start=match.start(),
+                    end=match.end()
+                ))
+
+        if self.disclaimer_required and not disclaimer_found:
+            # Treasury terms are only acceptable when the partner disclaimer is present
+            for phrase, match in treasury_matches:
+                violations.append(ComplianceViolation(
+                    type="treasury_term",
+                    description=f'"{match.group(0)}" is used without the required disclaimer attributing it to bank partners.',
+                    context=self._context(text, match.start(), match.end()),
+                    severity="medium",
+                    suggestion=f'Add the disclaimer "{self.disclaimer_text}" near this term.',
+                    start=match.start(),
+                    end=match.end()
+                ))
+            violations.append(ComplianceViolation(
+                type="missing_disclaimer",
+                description=f'The required disclaimer "{self.disclaimer_text}" was not found on the page.',
+                context="",
+                severity="high",
+                suggestion=f'Add the disclaimer "{self.disclaimer_text}".'
+            ))
+
+        violations.sort(key=lambda violation: violation.start if violation.start is not None else len(text))
+        return violations
+
+    @staticmethod
+    def _context(text: str, start: int, end: int) -> str:
+        """
+        Returns the sentence around a match, bounded by CONTEXT_WINDOW on each side.
+        """
+        left = max(text.rfind(".", max(0, start - CONTEXT_WINDOW), start), text.rfind("\n", max(0, start - CONTEXT_WINDOW), start))
+        left = left + 1 if left >= 0 else max(0, start - CONTEXT_WINDOW)
+        right_candidates = [index for index in (text.find(".", end, end + CONTEXT_WINDOW), text.find("\n", end, end + CONTEXT_WINDOW)) if index >= 0]
+        right = min(right_candidates) + 1 if right_candidates else min(len(text), end + CONTEXT_WINDOW)
+        return text[left:right].strip()
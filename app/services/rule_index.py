@@ -0,0 +1,139 @@
+# app/services/rule_index.py
+import math
+import re
+from collections import Counter
+from typing import Dict, List
+from app.config import settings
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a an and are as at be been but by can could do does for from has have if in into is it its may
+must no not of on or our should such that the their them then there these they this those to
+was we were which while who will with would you your any all other than also only
+""".split())
+
+
+def _stem(token: str) -> str:
+    # Crude suffix stripping, enough to match "guarantees" and "guaranteed" to "guarantee"
+    for suffix in ("ing", "ed", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            token = token[:-len(suffix)]
+            break
+    stripped = token.rstrip("e")
+    return stripped if len(stripped) >= 4 else token
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Stemmed words and adjacent-word pairs, so phrases like "bank account" weigh more than their words.
+    """
+    words = [_stem(word) for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOP_WORDS and len(word) > 1]
+    return words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+
+
+def _rule_text(rule: Dict) -> str:
+    return " ".join([
+        rule.get('category', ''),
+        rule.get('requirement', ''),
+        " ".join(rule.get('keywords', [])),
+        rule.get('examples', '')
+    ])
+
+
+def format_rules(rules: List[Dict]) -> str:
+    """
+    Renders rules for a prompt, one line per rule, prefixed with its id.
+    """
+    lines = []
+    for rule in rules:
+        line = f"[{rule['id']}] ({rule.get('category', 'general')}) {rule['requirement']}"
+        if rule.get('examples'):
+            line += f" Examples: {rule['examples']}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+class RuleIndex:
+    """
+    TF-IDF index over the rules extracted from one or more policies.
+
+    For a piece of webpage text it selects the rules most likely to apply, so
+    an analysis prompt carries RULES_TOP_K rules per policy however long the
+    policies are. Rules marked universal (such as a disclaimer every page must
+    carry) are always selected, since a page that omits them gives them
+    nothing to match.
+    """
+
+    def __init__(self, rules: List[Dict]):
+        self.rules = rules
+        self._by_id = {str(rule.get('id')): rule for rule in rules}
+        self._policy_urls = list(dict.fromkeys(rule['policy_url'] for rule in rules if rule.get('policy_url')))
+        documents = [Counter(tokenize(_rule_text(rule))) for rule in rules]
+        document_frequency = Counter(term for document in documents for term in document)
+        count = len(documents)
+        self._idf = {term: math.log((1 + count) / (1 + frequency)) + 1 for term, frequency in document_frequency.items()}
+        self._vectors = [self._vector(document) for document in documents]
+        self._keyword_terms = [
+            [terms for terms in (set(tokenize(str(keyword))) for keyword in rule.get('keywords', [])) if terms]
+            for rule in rules
+        ]
+
+    def _vector(self, term_counts: Counter) -> Dict[str, float]:
+        weights = {
+            term: (1 + math.log(occurrences)) * self._idf[term]
+            for term, occurrences in term_counts.items() if term in self._idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        return {term: weight / norm for term, weight in weights.items()}
+
+    def select(self, text: str, top_k: int = settings.RULES_TOP_K) -> List[Dict]:
+        """
+        Returns the universal rules plus, for each policy, the top_k others most similar to text, in policy order.
+        """
+        contextual: Dict[str, List[int]] = {}
+        for index, rule in enumerate(self.rules):
+            if not rule.get('universal'):
+                contextual.setdefault(rule.get('policy_url') or "", []).append(index)
+        if top_k <= 0 or all(len(indexes) <= top_k for indexes in contextual.values()):
+            return list(self.rules)
+
+        query = self._vector(Counter(tokenize(text)))
+        chosen = set()
+        for indexes in contextual.values():
+            scores = {
+                index: sum(weight * self._vectors[index].get(term, 0.0) for term, weight in query.items())
+                for index in indexes
+            }
+            # Ties, including rules with no overlap at all, keep policy order
+            chosen.update(sorted(indexes, key=lambda index: (-scores[index], index))[:top_k])
+        return [rule for index, rule in enumerate(self.rules) if rule.get('universal') or index in chosen]
+
+    def mentioned(self, text: str) -> List[str]:
+        """
+        Ids of the rules text mentions one of the keywords of, plus every rule without keywords.
+        
+        A keyword is mentioned when all of its stemmed words and word pairs
+        occur in text, so "partner bank" needs the phrase, not just "bank".
+        """
+        terms = set(tokenize(text))
+        return [
+            str(rule.get('id')) for rule, keywords in zip(self.rules, self._keyword_terms)
+            if not keywords or any(keyword <= terms for keyword in keywords)
+        ]
+
+    def attribute(self, violation: Dict) -> Dict:
+        """
+        Returns the violation with rule_id checked against the index and policy_url filled in.
+        
+        The policy comes from the cited rule. A violation that cites no known
+        rule is attributed only when all the rules come from a single policy.
+        """
+        if not isinstance(violation, dict):
+            return violation
+        rule = self._by_id.get(str(violation.get('rule_id') or '').strip().strip("[]"))
+        if rule is not None:
+            policy_url = rule.get('policy_url')
+        else:
+            policy_url = self._policy_urls[0] if len(self._policy_urls) == 1 else None
+        return {**violation, 'rule_id': rule['id'] if rule is not None else None, 'policy_url': policy_url}
@@ -0,0 +1,139 @@
+# app/services/rules_cache.py
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+from app.config import settings
+
+
+class RulesCache:
+    """
+    Two-tier cache for rules extracted from policy documents.
+
+    The in-memory tier is an LRU bounded by CACHE_MAX_ENTRIES. The optional
+    on-disk tier is a SQLite file (CACHE_DB_PATH) so extracted rules survive
+    restarts and are shared by every worker process. Entries in both tiers
+    expire after CACHE_TTL seconds.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = settings.CACHE_MAX_ENTRIES,
+        ttl: int = settings.CACHE_TTL,
+        db_path: Optional[str] = settings.CACHE_DB_PATH
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path or None
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        if self.db_path:
+            self._init_db()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Returns the cached value for key, or None when missing or expired.
+        """
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            created_at, value = entry
+            if now - created_at < self.ttl:
+                self._memory.move_to_end(key)
+                return value
+            del self._memory[key]
+
+        if not self.db_path:
+            return None
+
+        row = await asyncio.to_thread(self._db_get, key, now)
+        if row is None:
+            return None
+
+        created_at, value = row
+        self._remember(key, created_at, value)
+        return value
+
+    async def set(self, key: str, value: Any) -> None:
+        """
+        Stores value under key in both tiers.
+        """
+        now = time.time()
+        self._remember(key, now, value)
+        if self.db_path:
+            await asyncio.to_thread(self._db_set, key, now, value)
+
+    async def preload(self, limit: int = settings.CACHE_PRELOAD_ENTRIES) -> int:
+        """
+        Loads the most recently stored unexpired entries from disk into memory, returning how many.
+        """
+        if not self.db_path or limit <= 0:
+            return 0
+        rows = await asyncio.to_thread(self._db_recent, time.time(), min(limit, self.max_entries))
+        # Oldest first, so the newest entries end up most recently used
+        for key, created_at, value in reversed(rows):
+            self._remember(key, created_at, value)
+        return len(rows)
+
+    def _remember(self, key: str, created_at: float, value: Any) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        # A short-lived connection per call keeps this safe across threads and processes
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rules_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("DELETE FROM rules_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        conn.close()
+
+    def _db_get(self, key: str, now: float) -> Optional[Tuple[float, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT created_at, value FROM rules_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[0] >= self.ttl:
+                with conn:
+                    conn.execute("DELETE FROM rules_cache WHERE key = ?", (key,))
+                return None
+            return row[0], json.loads(row[1])
+        finally:
+            conn.close()
+
+    def _db_recent(self, now: float, limit: int) -> List[Tuple[str, float, Any]]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT key, created_at, value FROM rules_cache WHERE created_at > ? ORDER BY created_at DESC LIMIT ?",
+                (now - self.ttl, limit)
+            ).fetchall()
+            return [(key, created_at, json.loads(value)) for key, created_at, value in rows]
+        finally:
+            conn.close()
+
+    def _db_set(self, key: str, created_at: float, value: Any) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO rules_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), created_at)
+                )
+        finally:
+            conn.close()
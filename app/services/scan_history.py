@@ -0,0 +1,259 @@
+# app/services/scan_history.py
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+
+# Violation fields stored in their own columns; anything else the model adds is dropped
+VIOLATION_COLUMNS = ("type", "severity", "rule_id", "policy_url", "description", "context", "suggestion", "start", "end")
+
+
+class ScanHistory:
+    """
+    Append-only record of every scan and its violations, in a SQLite file (SCAN_HISTORY_PATH).
+
+    Scans and violations are separate tables. The scans table is indexed by
+    webpage, policy hash and time, the violations table by type, severity
+    and rule, and a scan_policies table maps each scan to its policy URLs.
+    Reports read only these tables, so they never cost an LLM call. Rows are
+    never updated, so the highest scan id is a version number for every
+    report: until it changes, no result can have changed.
+    """
+
+    def __init__(self, db_path: str = settings.SCAN_HISTORY_PATH):
+        self.db_path = db_path
+        self._init_db()
+
+    async def record(
+        self,
+        webpage_url: str,
+        policy_urls: List[str],
+        policy_hash: Optional[str],
+        mode: str,
+        source: str,
+        violations: List[Dict],
+        error: Optional[str] = None
+    ) -> int:
+        """
+        Stores one finished scan and returns its id.
+        """
+        return await asyncio.to_thread(self._db_record, webpage_url, policy_urls, policy_hash, mode, source, violations, error)
+
+    async def version(self) -> int:
+        """
+        The id of the newest scan, or 0 when there is none.
+        """
+        return await asyncio.to_thread(self._db_version)
+
+    async def get_scan(self, scan_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Returns one scan with its violations, or None for an unknown id.
+        """
+        return await asyncio.to_thread(self._db_get_scan, scan_id)
+
+    async def list_scans(
+        self,
+        webpage_url: Optional[str] = None,
+        policy_url: Optional[str] = None,
+        policy_hash: Optional[str] = None,
+        has_violations: Optional[bool] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        cursor: Optional[int] = None,
+        limit: int = settings.HISTORY_PAGE_SIZE
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Returns a page of scans, newest first, and the cursor of the next page (None on the last page).
+        """
+        conditions, params = self._time_conditions("s", since, until, cursor)
+        if webpage_url:
+            conditions.append("s.webpage_url = ?")
+            params.append(webpage_url)
+        if policy_url:
+            conditions.append("s.id IN (SELECT scan_id FROM scan_policies WHERE policy_url = ?)")
+            params.append(policy_url)
+        if policy_hash:
+            conditions.append("s.policy_hash = ?")
+            params.append(policy_hash)
+        if has_violations is not None:
+            conditions.append("s.violation_count > 0" if has_violations else "s.violation_count = 0")
+        return await asyncio.to_thread(self._db_list_scans, conditions, params, limit)
+
+    async def list_violations(
+        self,
+        violation_type: Optional[str] = None,
+        severity: Optional[str] = None,
+        rule_id: Optional[str] = None,
+        webpage_url: Optional[str] = None,
+        policy_url: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        cursor: Optional[int] = None,
+        limit: int = settings.HISTORY_PAGE_SIZE
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Returns a page of violations across scans, newest first, each with its scan's webpage and time.
+        """
+        conditions, params = self._time_conditions("s", since, until)
+        if cursor is not None:
+            conditions.append("v.id < ?")
+            params.append(cursor)
+        for column, value in (("v.type", violation_type), ("v.severity", severity), ("v.rule_id", rule_id), ("v.policy_url", policy_url), ("s.webpage_url", webpage_url)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        return await asyncio.to_thread(self._db_list_violations, conditions, params, limit)
+
+    @staticmethod
+    def _time_conditions(alias: str, since: Optional[float], until: Optional[float], cursor: Optional[int] = None) -> Tuple[List[str], List[Any]]:
+        conditions: List[str] = []
+        params: List[Any] = []
+        if since is not None:
+            conditions.append(f"{alias}.scanned_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append(f"{alias}.scanned_at < ?")
+            params.append(until)
+        if cursor is not None:
+            conditions.append(f"{alias}.id < ?")
+            params.append(cursor)
+        return conditions, params
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS scans ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, webpage_url TEXT NOT NULL, policy_hash TEXT, "
+                    "mode TEXT NOT NULL, source TEXT NOT NULL, violation_count INTEGER NOT NULL, "
+                    "error TEXT, scanned_at REAL NOT NULL)"
+                )
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS scan_policies ("
+                    "scan_id INTEGER NOT NULL REFERENCES scans (id), position INTEGER NOT NULL, policy_url TEXT NOT NULL, "
+                    "PRIMARY KEY (scan_id, position))"
+                )
+                # Types and severities come from the model, so match them case-insensitively
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS violations ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, scan_id INTEGER NOT NULL REFERENCES scans (id), "
+                    "type TEXT COLLATE NOCASE, severity TEXT COLLATE NOCASE, rule_id TEXT, policy_url TEXT, "
+                    "description TEXT, context TEXT, suggestion TEXT, start INTEGER, \"end\" INTEGER)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_scans_webpage ON scans (webpage_url, scanned_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_scans_policy_hash ON scans (policy_hash, scanned_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_scans_scanned_at ON scans (scanned_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_scan_policies_url ON scan_policies (policy_url, scan_id)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_scan ON violations (scan_id)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_type ON violations (type, severity)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_severity ON violations (severity)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_rule ON violations (rule_id)")
+        finally:
+            conn.close()
+
+    def _db_record(
+        self,
+        webpage_url: str,
+        policy_urls: List[str],
+        policy_hash: Optional[str],
+        mode: str,
+        source: str,
+        violations: List[Dict],
+        error: Optional[str]
+    ) -> int:
+        violations = [violation for violation in violations if isinstance(violation, dict)]
+        conn = self._connect()
+        try:
+            with conn:
+                scan_id = conn.execute(
+                    "INSERT INTO scans (webpage_url, policy_hash, mode, source, violation_count, error, scanned_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (webpage_url, policy_hash, mode, source, len(violations), error, time.time())
+                ).lastrowid
+                conn.executemany(
+                    "INSERT INTO scan_policies (scan_id, position, policy_url) VALUES (?, ?, ?)",
+                    [(scan_id, position, policy_url) for position, policy_url in enumerate(policy_urls)]
+                )
+                conn.executemany(
+                    "INSERT INTO violations (scan_id, type, severity, rule_id, policy_url, description, context, suggestion, start, \"end\") "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(scan_id, *(violation.get(column) for column in VIOLATION_COLUMNS)) for violation in violations]
+                )
+            return scan_id
+        finally:
+            conn.close()
+
+    def _db_version(self) -> int:
+        conn = self._connect()
+        try:
+            (version,) = conn.execute("SELECT COALESCE(MAX(id), 0) FROM scans").fetchone()
+            return version
+        finally:
+            conn.close()
+
+    def _policy_urls(self, conn: sqlite3.Connection, scan_ids: List[int]) -> Dict[int, List[str]]:
+        policy_urls: Dict[int, List[str]] = {scan_id: [] for scan_id in scan_ids}
+        if scan_ids:
+            rows = conn.execute(
+                f"SELECT scan_id, policy_url FROM scan_policies WHERE scan_id IN ({','.join('?' * len(scan_ids))}) ORDER BY scan_id, position",
+                scan_ids
+            )
+            for scan_id, policy_url in rows:
+                policy_urls[scan_id].append(policy_url)
+        return policy_urls
+
+    def _db_get_scan(self, scan_id: int) -> Optional[Dict[str, Any]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM scans WHERE id = ?", (scan_id,)).fetchone()
+            if row is None:
+                return None
+            scan = dict(row)
+            scan["policy_urls"] = self._policy_urls(conn, [scan_id])[scan_id]
+            scan["violations"] = [
+                {column: violation[column] for column in VIOLATION_COLUMNS}
+                for violation in conn.execute("SELECT * FROM violations WHERE scan_id = ? ORDER BY id", (scan_id,))
+            ]
+            return scan
+        finally:
+            conn.close()
+
+    def _db_list_scans(self, conditions: List[str], params: List[Any], limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = self._connect()
+        try:
+            # One extra row tells whether another page follows
+            rows = conn.execute(f"SELECT s.* FROM scans s {where} ORDER BY s.id DESC LIMIT ?", (*params, limit + 1)).fetchall()
+            scans = [dict(row) for row in rows[:limit]]
+            policy_urls = self._policy_urls(conn, [scan["id"] for scan in scans])
+        finally:
+            conn.close()
+        for scan in scans:
+            scan["policy_urls"] = policy_urls[scan["id"]]
+        return scans, scans[-1]["id"] if len(rows) > limit else None
+
+    def _db_list_violations(self, conditions: List[str], params: List[Any], limit: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                f"SELECT v.*, s.webpage_url, s.scanned_at FROM violations v JOIN scans s ON s.id = v.scan_id {where} "
+                "ORDER BY v.id DESC LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+        finally:
+            conn.close()
+        violations = [dict(row) for row in rows[:limit]]
+        return violations, violations[-1]["id"] if len(rows) > limit else None
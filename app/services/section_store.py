@@ -0,0 +1,94 @@
+# app/services/section_store.py
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+from app.config import settings
+
+
+class SectionStore:
+    """
+    Remembers, per webpage and policy, the hash of every section of the page,
+    the violations found in it, and the ids of the page-wide rules whose
+    evidence it holds.
+
+    Backed by a SQLite file (SECTION_STORE_PATH) so re-checks across restarts
+    and worker processes can reuse earlier analyses of unchanged sections.
+    """
+
+    def __init__(self, db_path: str = settings.SECTION_STORE_PATH):
+        self.db_path = db_path
+        self._init_db()
+
+    async def load(self, webpage_url: str, policy_hash: str) -> Optional[Dict[str, Dict[str, List]]]:
+        """
+        Returns {section_hash: {"violations": [...], "evidence": [rule ids]}} from the last check, or None if the page was never checked.
+        """
+        return await asyncio.to_thread(self._db_load, webpage_url, policy_hash)
+
+    async def save(self, webpage_url: str, policy_hash: str, sections: Dict[str, Dict[str, List]]) -> None:
+        """
+        Replaces the stored sections of a page with those from the latest check.
+        """
+        await asyncio.to_thread(self._db_save, webpage_url, policy_hash, sections)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS page_sections ("
+                    "webpage_url TEXT NOT NULL, policy_hash TEXT NOT NULL, section_hash TEXT NOT NULL, "
+                    "violations TEXT NOT NULL, evidence TEXT NOT NULL DEFAULT '[]', checked_at REAL NOT NULL, "
+                    "PRIMARY KEY (webpage_url, policy_hash, section_hash))"
+                )
+                # Store files created before sections recorded evidence
+                if "evidence" not in [column[1] for column in conn.execute("PRAGMA table_info(page_sections)")]:
+                    conn.execute("ALTER TABLE page_sections ADD COLUMN evidence TEXT NOT NULL DEFAULT '[]'")
+        finally:
+            conn.close()
+
+    def _db_load(self, webpage_url: str, policy_hash: str) -> Optional[Dict[str, Dict[str, List]]]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT section_hash, violations, evidence FROM page_sections WHERE webpage_url = ? AND policy_hash = ?",
+                (webpage_url, policy_hash)
+            ).fetchall()
+        finally:
+            conn.close()
+        if not rows:
+            return None
+        return {
+            section_hash: {"violations": json.loads(violations), "evidence": json.loads(evidence)}
+            for section_hash, violations, evidence in rows
+        }
+
+    def _db_save(self, webpage_url: str, policy_hash: str, sections: Dict[str, Dict[str, List]]) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "DELETE FROM page_sections WHERE webpage_url = ? AND policy_hash = ?",
+                    (webpage_url, policy_hash)
+                )
+                conn.executemany(
+                    "INSERT INTO page_sections (webpage_url, policy_hash, section_hash, violations, evidence, checked_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (webpage_url, policy_hash, section_hash, json.dumps(section["violations"]), json.dumps(section.get("evidence", [])), now)
+                        for section_hash, section in sections.items()
+                    ]
+                )
+        finally:
+            conn.close()
@@ -1,142 +1,766 @@
 # app/services/text_analyzer.py
-from groq import Groq
-from typing import List, Dict
-import json
+from pydantic import ValidationError
+from typing import Any, AsyncIterator, List, Dict, Optional, Tuple
+import asyncio
 import re
+import time
 from app.config import settings
+from app.models.schemas import ComplianceViolation
+from app.services.rules_cache import RulesCache
+from app.services.section_store import SectionStore
+from app.services.rate_governor import RateGovernor, RateLimitExceeded
+from app.services.metrics import RULES_CACHE, TRIAGE_DECISIONS, VIOLATION_REPAIRS, observe_stage, record_llm_usage, track_stage
+from app.services.rule_index import RuleIndex, format_rules
+from app.utils.chunking import chunk_overlaps, chunk_text, split_paragraphs, estimate_tokens
+from app.utils.helper import content_hash, format_sse, gather_bounded, merge_violations, ViolationMerger, SingleFlight
+from app.utils.json_stream import JSONObjectStream
 from termcolor import colored
 
+# Bump whenever the rules extraction prompt changes so stale cached rules are not reused
+RULES_PROMPT_VERSION = "2"
+
+RULES_SYSTEM_PROMPT = "You are a compliance expert specializing in regulatory and policy analysis. Your task is to meticulously extract and list all compliance rules, requirements, and obligations from policy documents. Ensure clarity, precision, and completeness in your extraction, maintaining the original intent and legal accuracy of the document. Focus on regulatory obligations, procedural mandates, and key compliance measures, presenting them in a structured and easily understandable format. If necessary, categorize the extracted requirements based on themes such as governance, risk management, reporting, marketing and operational controls."
+
+# Pseudo-violations produced when the analysis itself failed, rather than the page
+ERROR_VIOLATION_TYPES = {'analysis_error', 'parsing_error', 'json_parsing_error', 'unexpected_error'}
+
+# Section store entry holding the whole-page (universal rule) violations of a page
+PAGE_SECTION = "page"
+
+# Added to the analysis prompt when only the changed sections of a page are sent
+EXCERPT_NOTE = """
+        The content below is an excerpt of a longer page. Report only violations in the excerpt itself;
+        do not report content the page must carry as missing, since it may appear elsewhere on the page."""
+
+# Bump whenever what the section store keeps per section changes, so older entries are not reused
+SECTION_STORE_VERSION = "2"
+
+# Violation fields a model may leave out or null without making the finding unusable
+VIOLATION_TEXT_FIELDS = ('type', 'description', 'context', 'severity', 'suggestion')
+
+ANALYSIS_SYSTEM_PROMPT = "You are a compliance checker specializing in identifying policy and regulatory violations. Your task is to analyze webpage content against a set of provided rules and detect any non-compliance issues. Ensure accuracy, consistency, and relevance in your findings. Return the identified violations in a structured JSON format, including details such as the violated rule, the specific content triggering the violation, and a brief explanation. If applicable, categorize the violations based on severity or type (e.g., legal, security, accessibility, data privacy)."
+
+TRIAGE_SYSTEM_PROMPT = "You are a fast compliance screener. Decide whether webpage content plausibly violates any of the given compliance rules, including by omitting a required disclosure. Favor recall: when in doubt, flag the content. Answer with JSON only."
+
 class TextAnalyzer:
-    def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
-        self.model = "llama-3.3-70b-versatile"
+    def __init__(
+        self,
+        rules_cache: Optional[RulesCache] = None,
+        section_store: Optional[SectionStore] = None,
+        governor: Optional[RateGovernor] = None
+    ):
+        # Imported here so processes that never call the LLM (extraction workers, tooling) skip the SDK
+        from groq import AsyncGroq
+
+        # One async client per analyzer so completions share a connection pool.
+        # Retries are left to the governor, which shares backoff across all calls.
+        self.client = AsyncGroq(api_key=settings.GROQ_API_KEY, max_retries=0)
+        self.rules_model = settings.RULES_MODEL
+        self.analysis_model = settings.ANALYSIS_MODEL
+        self.triage_model = settings.TRIAGE_MODEL if settings.ENABLE_TRIAGE else None
+        self.rules_cache = rules_cache if rules_cache is not None else (RulesCache() if settings.ENABLE_CACHE else None)
+        self.section_store = section_store if section_store is not None else (SectionStore() if settings.ENABLE_INCREMENTAL_CHECKS else None)
+        # One budget for every model's calls, so the per-process limits hold however the stages are split
+        self.governor = governor or RateGovernor()
+        self._inflight = SingleFlight()
 
-    async def analyze_compliance(self, webpage_content: Dict[str, str], policy_content: Dict[str, str]) -> List[Dict]:
+    async def analyze_compliance(
+        self,
+        webpage_content: Dict[str, str],
+        policies: Dict[str, Dict[str, str]],
+        webpage_url: Optional[str] = None
+    ) -> List[Dict]:
         """
         This method performs a two-step analysis:
-        1. First, it processes the policy document to understand the compliance rules
+        1. First, it processes the policy documents to understand the compliance rules
         2. Then, it checks the webpage content against these extracted rules
+        
+        policies maps each policy URL to its fetched content. The rules of all
+        policies are merged into one rule set, so the page is analyzed once,
+        and each violation records the policy_url of the rule it breaks.
+        
+        When webpage_url is given and incremental checks are enabled, only the
+        sections that changed since the last check of this page are analyzed.
+        Identical concurrent checks (same page content and policy) share one
+        in-flight analysis. Provider rate limits that outlast every retry are
+        raised as RateLimitExceeded rather than reported as a violation.
         """
+        incremental = bool(webpage_url) and self.section_store is not None
+        key = (
+            "analysis",
+            content_hash(webpage_content['clean_text'] or ""),
+            self.policies_hash(policies),
+            webpage_url if incremental else None
+        )
+
+        async def analyze() -> List[Dict]:
+            if incremental:
+                return await self._analyze_incremental(webpage_url, webpage_content, policies)
+
+            # Step 1: Extract rules from the policy documents (served from cache for known policies)
+            extracted_rules = await self.extract_policy_rules(policies)
+            
+            # Step 2: Analyze webpage against extracted rules
+            return await self.analyze_against_rules(webpage_content, extracted_rules)
+
         try:
-            # Step 1: Extract rules from policy document
-            rules_prompt = self._create_rules_extraction_prompt(policy_content['clean_text'])
-            rules_completion = self.client.chat.completions.create(
+            return await self._inflight.do(key, analyze)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            return [{
+                'type': 'analysis_error',
+                'description': f'Error during analysis: {str(e)}',
+                'context': 'System error during compliance check',
+                'severity': 'high',
+                'suggestion': 'Please try again or contact support'
+            }]
+
+    async def _analyze_incremental(
+        self,
+        webpage_url: str,
+        webpage_content: Dict[str, str],
+        policies: Dict[str, Dict[str, str]]
+    ) -> List[Dict]:
+        """
+        Re-checks a page by analyzing only the sections that changed.
+        
+        The page's paragraphs are hashed and stored with the violations found
+        in them, for this page, set of policies and analysis settings. The
+        first check is a single analysis of the whole page against all rules.
+        Violations of universal rules (such as a required disclaimer) are
+        stored for the page as a whole, the rest with the section they quote.
+        
+        On a re-check, only new sections are analyzed, against all rules, and
+        violations of unchanged sections are carried over. A universal rule
+        is re-checked against the whole page only when a section holding its
+        evidence (its keywords or a quoted violation) was removed or edited,
+        when it had a violation before and a new section mentions it, or when
+        the new sections alone suggest a violation that none of them quotes.
+        An unchanged page returns straight from the store without any LLM call.
+        """
+        store_key = self._section_store_key(policies)
+        sections = split_paragraphs(webpage_content['clean_text'])
+        section_hashes = [content_hash(section) for section in sections]
+        stored = await self.section_store.load(webpage_url, store_key)
+
+        if stored is None or PAGE_SECTION not in stored:
+            extracted_rules = await self.extract_policy_rules(policies)
+            violations = await self.analyze_against_rules(webpage_content, extracted_rules)
+            section_violations, page_violations = self._place_violations(violations, extracted_rules, list(zip(section_hashes, sections)))
+            current = {section_hash: [] for section_hash in section_hashes}
+            for section_hash, placed in section_violations.items():
+                current[section_hash] += placed
+        else:
+            changed = [
+                (section_hash, section)
+                for section_hash, section in zip(section_hashes, sections)
+                if section_hash not in stored
+            ]
+            removed = set(stored) - {PAGE_SECTION} - set(section_hashes)
+            current = {section_hash: stored[section_hash]["violations"] for section_hash in section_hashes if section_hash in stored}
+            page_violations = stored[PAGE_SECTION]["violations"]
+            if not changed and not removed:
+                return self._stored_result(section_hashes, current, page_violations)
+
+            extracted_rules = await self.extract_policy_rules(policies)
+            universal_ids = [rule['id'] for rule in extracted_rules if rule.get('universal')]
+            universal_index = RuleIndex([rule for rule in extracted_rules if rule.get('universal')])
+            # A violated rule is only affected by new text that mentions it, e.g. an added disclaimer
+            violated = {violation.get('rule_id') for violation in page_violations}
+            page_checks = {
+                rule_id for _, section in changed for rule_id in universal_index.mentioned(section)
+                if rule_id in violated
+            }
+            page_checks.update(rule_id for section_hash in removed for rule_id in stored[section_hash]["evidence"])
+            page_checks.intersection_update(universal_ids)
+
+            section_violations: Dict[str, List[Dict]] = {}
+            new_page_violations: List[Dict] = []
+            section_rules = [rule for rule in extracted_rules if rule['id'] not in page_checks]
+            if changed and section_rules:
+                found = await self.analyze_against_rules(
+                    {'clean_text': "\n".join(section for _, section in changed)},
+                    section_rules,
+                    excerpt=True
+                )
+                section_violations, new_page_violations = self._place_violations(found, extracted_rules, changed)
+                # A universal rule the new sections seem to break without quoting them needs the whole page
+                unquoted = {
+                    violation.get('rule_id') for violation in new_page_violations
+                    if self._locate(violation, changed) is None
+                }
+                page_checks.update(unquoted)
+                new_page_violations = [violation for violation in new_page_violations if violation.get('rule_id') not in unquoted]
+            if page_checks:
+                rechecked = await self.analyze_against_rules(
+                    webpage_content,
+                    [rule for rule in extracted_rules if rule['id'] in page_checks]
+                )
+                # Anything else the model reports here belongs to sections, which were checked separately
+                new_page_violations += [
+                    violation for violation in rechecked
+                    if violation.get('rule_id') in page_checks or violation.get('type') in ERROR_VIOLATION_TYPES
+                ]
+            for section_hash, _ in changed:
+                current[section_hash] = section_violations.get(section_hash, [])
+            page_violations = [
+                violation for violation in page_violations if violation.get('rule_id') not in page_checks
+            ] + new_page_violations
+
+        new_violations = [violation for placed in current.values() for violation in placed] + page_violations
+        # A failed analysis must be retried next time, not carried over
+        if not any(violation.get('type') in ERROR_VIOLATION_TYPES for violation in new_violations):
+            universal_index = RuleIndex([rule for rule in extracted_rules if rule.get('universal')])
+            # A section is evidence for the universal rules it mentions and for those whose violations it quotes
+            quoted: Dict[str, List[str]] = {}
+            for violation in page_violations:
+                section_hash = self._locate(violation, list(zip(section_hashes, sections)))
+                if section_hash and violation.get('rule_id'):
+                    quoted.setdefault(section_hash, []).append(violation['rule_id'])
+            entries = {
+                section_hash: {
+                    "violations": current[section_hash],
+                    "evidence": list(dict.fromkeys(universal_index.mentioned(section) + quoted.get(section_hash, [])))
+                }
+                for section_hash, section in zip(section_hashes, sections)
+            }
+            entries[PAGE_SECTION] = {"violations": page_violations, "evidence": []}
+            await self.section_store.save(webpage_url, store_key, entries)
+        return self._stored_result(section_hashes, current, page_violations)
+
+    @staticmethod
+    def _stored_result(section_hashes: List[str], current: Dict[str, List[Dict]], page_violations: List[Dict]) -> List[Dict]:
+        # Sections are separate passages, so only duplicates within one section are merged
+        return merge_violations([*(current[section_hash] for section_hash in dict.fromkeys(section_hashes)), page_violations])
+
+    @staticmethod
+    def _locate(violation: Dict, sections: List[Tuple[str, str]]) -> Optional[str]:
+        """
+        Hash of the first section that contains the violation's context, if any.
+        """
+        context = " ".join(str(violation.get('context') or '').split()).lower()
+        return next(
+            (section_hash for section_hash, section in sections if context and context in " ".join(section.split()).lower()),
+            None
+        )
+
+    def _place_violations(
+        self,
+        violations: List[Dict],
+        rules: List[Dict],
+        sections: List[Tuple[str, str]]
+    ) -> Tuple[Dict[str, List[Dict]], List[Dict]]:
+        """
+        Splits violations into those kept per section and those kept for the whole page.
+        
+        Violations of universal rules belong to the page. The others belong to
+        the section that contains their context, or the first of sections
+        when none does.
+        """
+        universal_ids = {rule['id'] for rule in rules if rule.get('universal')}
+        section_violations: Dict[str, List[Dict]] = {}
+        page_violations: List[Dict] = []
+        for violation in violations:
+            owner = self._locate(violation, sections) or (sections[0][0] if sections else None)
+            if violation.get('rule_id') in universal_ids or owner is None:
+                page_violations.append(violation)
+            else:
+                section_violations.setdefault(owner, []).append(violation)
+        return section_violations, page_violations
+
+    def _section_store_key(self, policies: Dict[str, Dict[str, str]]) -> str:
+        """
+        Section store key: the policies plus every setting that changes what the analysis finds.
+        """
+        return content_hash(
+            SECTION_STORE_VERSION,
+            self.policies_hash(policies),
+            self.analysis_model,
+            self.triage_model or "no-triage",
+            str(settings.RULES_TOP_K),
+            str(settings.CHUNK_MAX_TOKENS)
+        )
+
+    async def analyze_against_rules(self, webpage_content: Dict[str, str], extracted_rules: List[Dict], excerpt: bool = False) -> List[Dict]:
+        """
+        Checks webpage content against rules that were already extracted from a policy.
+        
+        Long pages are split into paragraph-aligned chunks that are analyzed in
+        parallel (at most MAX_CONCURRENT_CHUNKS at once), so latency follows the
+        slowest chunk rather than the page length. Each chunk's prompt carries
+        only the RULES_TOP_K rules most relevant to it. Violations are
+        attributed to the policy of the rule they cite, and those reported
+        twice by overlapping chunks are merged. With excerpt, the model is told
+        the content is only part of a page. Unlike analyze_compliance, errors
+        are raised to the caller.
+        """
+        chunks = self._chunk_webpage(webpage_content)
+        rule_index = RuleIndex(extracted_rules)
+        chunk_violations = await gather_bounded(
+            (self._analyze_chunk(chunk, rule_index, excerpt) for chunk in chunks),
+            settings.MAX_CONCURRENT_CHUNKS
+        )
+        return merge_violations(chunk_violations, chunk_overlaps(chunks))
+
+    async def _analyze_chunk(self, webpage_text: str, rule_index: RuleIndex, excerpt: bool = False) -> List[Dict]:
+        rules_text = format_rules(rule_index.select(webpage_text))
+        if not await self._triage(webpage_text, rules_text):
+            return []
+        analysis_prompt = self._create_analysis_prompt(webpage_text, rules_text, excerpt)
+        with track_stage("analysis"):
+            analysis_response = await self._complete(ANALYSIS_SYSTEM_PROMPT, analysis_prompt, self.analysis_model, json_mode=True)
+        with track_stage("parse"):
+            violations, incomplete = self._parse_violations(analysis_response)
+        if incomplete:
+            violations = merge_violations([violations + await self._recover_violations(webpage_text, rules_text, violations)])
+        return [rule_index.attribute(violation) for violation in violations]
+
+    async def _recover_violations(self, webpage_text: str, rules_text: str, found: List[Dict]) -> List[Dict]:
+        """
+        Returns the violations a cut-off or malformed analysis response lost.
+        
+        ANALYSIS_MODEL is asked again for only the violations missing from
+        found, with the answer capped at VIOLATION_REPAIR_MAX_TOKENS, so the
+        retry costs a fraction of a full analysis. If repair is disabled or
+        fails, a parsing_error marks the result as incomplete instead (which
+        also keeps it out of the section store).
+        """
+        if settings.ENABLE_VIOLATION_REPAIR:
+            try:
+                with track_stage("repair"):
+                    response = await self._complete(
+                        ANALYSIS_SYSTEM_PROMPT,
+                        self._create_repair_prompt(webpage_text, rules_text, found),
+                        self.analysis_model,
+                        max_tokens=settings.VIOLATION_REPAIR_MAX_TOKENS,
+                        json_mode=True
+                    )
+                repaired, _ = self._parse_violations(response)
+                if any(violation.get('type') in ERROR_VIOLATION_TYPES for violation in repaired):
+                    raise ValueError("the repair response held no JSON")
+                VIOLATION_REPAIRS.inc(outcome="repaired")
+                return repaired
+            except Exception as e:
+                print(colored(f"Violation repair failed: {str(e)}", "yellow"))
+                VIOLATION_REPAIRS.inc(outcome="failed")
+        else:
+            VIOLATION_REPAIRS.inc(outcome="skipped")
+        return [{
+            'type': 'parsing_error',
+            'description': 'The analysis response was cut off or malformed, so some violations may be missing',
+            'context': webpage_text[:100] + '...' if len(webpage_text) > 100 else webpage_text,
+            'severity': 'high',
+            'suggestion': 'Run the check again'
+        }]
+
+    async def _triage(self, webpage_text: str, rules_text: str) -> bool:
+        """
+        Asks the small TRIAGE_MODEL whether a chunk likely violates its rules.
+        
+        Returns True when the chunk should be escalated to ANALYSIS_MODEL for
+        the detailed analysis. Triage fails open: a disabled triage, an
+        unreadable answer or a failed call all escalate, so the cascade can
+        only save work, never drop a chunk unchecked.
+        """
+        if self.triage_model is None:
+            return True
+        try:
+            with track_stage("triage"):
+                response = await self._complete(
+                    TRIAGE_SYSTEM_PROMPT,
+                    self._create_triage_prompt(webpage_text, rules_text),
+                    self.triage_model,
+                    max_tokens=settings.TRIAGE_MAX_TOKENS
+                )
+        except Exception as e:
+            print(colored(f"Triage failed, escalating: {str(e)}", "yellow"))
+            TRIAGE_DECISIONS.inc(outcome="failed")
+            return True
+
+        verdict = re.search(r'"?likely_violation"?\s*:\s*(true|false)', response, re.IGNORECASE)
+        if verdict is None:
+            TRIAGE_DECISIONS.inc(outcome="failed")
+            return True
+        escalate = verdict.group(1).lower() == "true"
+        TRIAGE_DECISIONS.inc(outcome="escalated" if escalate else "cleared")
+        return escalate
+
+    def _chunk_webpage(self, webpage_content: Dict[str, str]) -> List[str]:
+        return chunk_text(
+            webpage_content['clean_text'],
+            max_tokens=settings.CHUNK_MAX_TOKENS,
+            overlap_tokens=settings.CHUNK_OVERLAP_TOKENS
+        )
+
+    async def analyze_compliance_stream(
+        self,
+        webpage_content: Dict[str, str],
+        policies: Dict[str, Dict[str, str]],
+        collected: Optional[List[Dict]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Streaming counterpart of analyze_compliance that yields SSE messages.
+        
+        Progress events are sent around rules extraction. The analysis completion
+        of every chunk is then streamed token by token through an incremental
+        JSON scanner, and each violation is emitted as soon as its object closes,
+        without waiting for the rest of the completion. Emitted violations are
+        also appended to collected, when given.
+        """
+        yield format_sse("progress", {"stage": "rules_extraction", "status": "started"})
+        extracted_rules = await self.extract_policy_rules(policies)
+        yield format_sse("progress", {"stage": "rules_extraction", "status": "completed", "rules": len(extracted_rules)})
+
+        chunks = self._chunk_webpage(webpage_content)
+        yield format_sse("progress", {"stage": "analysis", "status": "started", "chunks": len(chunks)})
+        merger = ViolationMerger(chunk_overlaps(chunks))
+        started = time.perf_counter()
+        with track_stage("analysis"):
+            async for chunk, violation in self._stream_chunk_violations(chunks, RuleIndex(extracted_rules)):
+                if merger.add(violation, chunk):
+                    if len(merger.violations) == 1:
+                        observe_stage("first_violation", time.perf_counter() - started)
+                    if collected is not None:
+                        collected.append(violation)
+                    yield format_sse("violation", violation)
+
+        yield format_sse("done", {"violation_count": len(merger.violations)})
+
+    async def _stream_chunk_violations(self, chunks: List[str], rule_index: RuleIndex) -> AsyncIterator[Tuple[int, Dict]]:
+        """
+        Streams the analyses of all chunks concurrently, yielding (chunk index, violation) in arrival order.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_CHUNKS)
+        finished = object()
+
+        async def stream_chunk(index: int, chunk: str) -> None:
+            try:
+                async with semaphore:
+                    rules_text = format_rules(rule_index.select(chunk))
+                    if not await self._triage(chunk, rules_text):
+                        return
+                    scanner = JSONObjectStream()
+                    found: List[Dict] = []
+                    invalid = 0
+                    # Enough of the response to report it if it holds no JSON
+                    head = ""
+                    analysis_prompt = self._create_analysis_prompt(chunk, rules_text)
+                    async for token in self._complete_stream(ANALYSIS_SYSTEM_PROMPT, analysis_prompt, self.analysis_model):
+                        if len(head) <= 100:
+                            head += token
+                        violations, rejected = self._validate_violations(scanner.feed(token))
+                        invalid += rejected
+                        for violation in violations:
+                            found.append(violation)
+                            await queue.put((index, rule_index.attribute(violation)))
+                    if not scanner.started:
+                        await queue.put((index, rule_index.attribute(self._parsing_error(head))))
+                    elif scanner.unfinished or scanner.malformed or invalid:
+                        # Violations already emitted are dropped again by the consumer's merger
+                        for violation in await self._recover_violations(chunk, rules_text, found):
+                            await queue.put((index, rule_index.attribute(violation)))
+            except Exception as e:
+                await queue.put(e)
+            finally:
+                await queue.put(finished)
+
+        tasks = [asyncio.create_task(stream_chunk(index, chunk)) for index, chunk in enumerate(chunks)]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                item = await queue.get()
+                if item is finished:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def warm_up(self) -> None:
+        """
+        Loads recently extracted rules from the on-disk cache into memory.
+        """
+        if self.rules_cache is not None:
+            await self.rules_cache.preload()
+
+    async def aclose(self) -> None:
+        """
+        Closes the LLM client's connection pool.
+        """
+        await self.client.close()
+
+    def _estimate_call_tokens(self, system_prompt: str, user_prompt: str, max_tokens: Optional[int] = None) -> int:
+        return estimate_tokens(system_prompt) + estimate_tokens(user_prompt) + (max_tokens or settings.COMPLETION_TOKEN_ESTIMATE)
+
+    async def _complete(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        model: str,
+        max_tokens: Optional[int] = None,
+        json_mode: bool = False
+    ) -> str:
+        """
+        Runs a single chat completion, through the rate governor, without blocking the event loop.
+        
+        With json_mode (and LLM_JSON_MODE on), the provider is asked for a JSON
+        object response. If it rejects the output as invalid JSON, the text it
+        generated is returned anyway so the caller can salvage it.
+        """
+        options: Dict[str, Any] = {"max_tokens": max_tokens} if max_tokens else {}
+        if json_mode and settings.LLM_JSON_MODE:
+            options["response_format"] = {"type": "json_object"}
+        try:
+            completion = await self._call_completion(system_prompt, user_prompt, model, max_tokens, options)
+        except Exception as e:
+            failed_generation = self._failed_generation(e) if "response_format" in options else None
+            if failed_generation is None:
+                raise
+            print(colored(f"{model} returned invalid JSON, salvaging it: {str(e)[:200]}", "yellow"))
+            return failed_generation
+        record_llm_usage(model, getattr(completion, "usage", None))
+        return completion.choices[0].message.content
+
+    async def _call_completion(self, system_prompt: str, user_prompt: str, model: str, max_tokens: Optional[int], options: Dict[str, Any]):
+        return await self.governor.call(
+            lambda: self.client.chat.completions.create(
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a compliance expert specializing in regulatory and policy analysis. Your task is to meticulously extract and list all compliance rules, requirements, and obligations from policy documents. Ensure clarity, precision, and completeness in your extraction, maintaining the original intent and legal accuracy of the document. Focus on regulatory obligations, procedural mandates, and key compliance measures, presenting them in a structured and easily understandable format. If necessary, categorize the extracted requirements based on themes such as governance, risk management, reporting, marketing and operational controls."
+                        "content": system_prompt
                     },
                     {
                         "role": "user",
-                        "content": rules_prompt
+                        "content": user_prompt
                     }
                 ],
-                model=self.model,
-                temperature=0.1
-            )
-            
-            extracted_rules = rules_completion.choices[0].message.content
-            
-            # Step 2: Analyze webpage against extracted rules
-            analysis_prompt = self._create_analysis_prompt(
-                webpage_content['clean_text'],
-                extracted_rules
-            )
-            
-            analysis_completion = self.client.chat.completions.create(
+                model=model,
+                temperature=0.1,
+                **options
+            ),
+            self._estimate_call_tokens(system_prompt, user_prompt, max_tokens)
+        )
+
+    @staticmethod
+    def _failed_generation(error: Exception) -> Optional[str]:
+        """
+        The output Groq's JSON mode rejected (a 400 json_validate_failed error carries it), if any.
+        """
+        body = getattr(error, "body", None)
+        if isinstance(body, dict) and isinstance(body.get("error"), dict):
+            body = body["error"]
+        failed_generation = body.get("failed_generation") if isinstance(body, dict) else None
+        return failed_generation if isinstance(failed_generation, str) else None
+
+    async def _complete_stream(self, system_prompt: str, user_prompt: str, model: str) -> AsyncIterator[str]:
+        """
+        Runs a chat completion with stream=True and yields content tokens as they arrive.
+        """
+        stream = await self.governor.call(
+            lambda: self.client.chat.completions.create(
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a compliance checker specializing in identifying policy and regulatory violations. Your task is to analyze webpage content against a set of provided rules and detect any non-compliance issues. Ensure accuracy, consistency, and relevance in your findings. Return the identified violations in a structured JSON format, including details such as the violated rule, the specific content triggering the violation, and a brief explanation. If applicable, categorize the violations based on severity or type (e.g., legal, security, accessibility, data privacy)."
+                        "content": system_prompt
                     },
                     {
                         "role": "user",
-                        "content": analysis_prompt
+                        "content": user_prompt
                     }
                 ],
-                model=self.model,
-                temperature=0.1
+                model=model,
+                temperature=0.1,
+                stream=True
+            ),
+            self._estimate_call_tokens(system_prompt, user_prompt)
+        )
+        usage = None
+        async for chunk in stream:
+            # Groq reports usage on the final chunk, under x_groq
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None) or getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+        record_llm_usage(model, usage, streamed=True)
+
+    def policy_hash(self, policy_content: Dict[str, str]) -> str:
+        """
+        Content address of a policy: its clean text plus the model and prompt that read it.
+        """
+        return content_hash(policy_content['clean_text'] or "", self.rules_model, RULES_PROMPT_VERSION)
+
+    def policies_hash(self, policies: Dict[str, Dict[str, str]]) -> str:
+        """
+        Content address of a set of policies, including their URLs, which violations record.
+        """
+        return content_hash(*(part for policy_url, policy_content in policies.items() for part in (policy_url, self.policy_hash(policy_content))))
+
+    async def extract_policy_rules(self, policies: Dict[str, Dict[str, str]]) -> List[Dict]:
+        """
+        Extracts the rules of several policies concurrently and merges them into one rule set.
+        
+        Every rule is tagged with its policy_url. With more than one policy, rule
+        ids are prefixed with the policy's position (P1-R3, P2-R1, ...) so they
+        stay unique in the merged set.
+        """
+        rule_lists = await asyncio.gather(*(self.extract_rules(policy_content) for policy_content in policies.values()))
+        merged_rules = []
+        for number, ((policy_url, policy_content), rules) in enumerate(zip(policies.items(), rule_lists), 1):
+            prefix = f"P{number}-" if len(policies) > 1 else ""
+            policy_hash = self.policy_hash(policy_content)
+            merged_rules.extend(
+                {**rule, 'id': f"{prefix}{rule['id']}", 'policy_url': policy_url, 'policy_hash': policy_hash}
+                for rule in rules
             )
-            
-            violations = analysis_completion.choices[0].message.content
-            parsed_violations = self._parse_violations(analysis_completion.choices[0].message.content)
-            
-            return parsed_violations
+        return merged_rules
 
-        except Exception as e:
-            return [{
-                'type': 'analysis_error',
-                'description': f'Error during analysis: {str(e)}',
-                'context': 'System error during compliance check',
-                'severity': 'high',
-                'suggestion': 'Please try again or contact support'
-            }]
+    def rules_policies_hash(self, rules: List[Dict]) -> Optional[str]:
+        """
+        policies_hash of the policies a merged rule set came from, or None if it has no rules.
+        """
+        policy_hashes = dict.fromkeys((rule['policy_url'], rule['policy_hash']) for rule in rules if rule.get('policy_hash'))
+        return content_hash(*(part for pair in policy_hashes for part in pair)) if policy_hashes else None
+
+    async def extract_rules(self, policy_content: Dict[str, str]) -> List[Dict]:
+        """
+        Extracts the compliance rules from a policy document.
+        
+        Each rule is a dict with an id (R1, R2, ...), category, requirement,
+        keywords, examples and a universal flag for rules every page must meet.
+        Rules are cached by policy hash, so a policy that has been seen before
+        skips the extraction completion entirely, and concurrent requests for
+        the same uncached policy share a single extraction.
+        """
+        cache_key = self.policy_hash(policy_content)
+        return await self._inflight.do(("rules", cache_key), lambda: self._extract_rules(policy_content, cache_key))
+
+    async def _extract_rules(self, policy_content: Dict[str, str], cache_key: str) -> List[Dict]:
+        if self.rules_cache is not None:
+            cached_rules = await self.rules_cache.get(cache_key)
+            if cached_rules is not None:
+                RULES_CACHE.inc(result="hit")
+                return cached_rules
+            RULES_CACHE.inc(result="miss")
 
+        # Policies longer than one prompt are read chunk by chunk, in parallel
+        policy_chunks = chunk_text(
+            policy_content['clean_text'],
+            max_tokens=settings.POLICY_CHUNK_MAX_TOKENS
+        ) or [policy_content['clean_text'] or ""]
+        with track_stage("rules_extraction"):
+            chunk_rules = await gather_bounded(
+                (
+                    self._complete(RULES_SYSTEM_PROMPT, self._create_rules_extraction_prompt(chunk), self.rules_model, json_mode=True)
+                    for chunk in policy_chunks
+                ),
+                settings.MAX_CONCURRENT_CHUNKS
+            )
+        parsed = [self._parse_rules(response) for response in chunk_rules]
+        extracted_rules = [
+            {'id': f"R{number}", **rule}
+            for number, rule in enumerate((rule for rules, _ in parsed for rule in rules), 1)
+        ]
+        # Rules read from prose or a cut-off response are used once but not cached, so the next check retries
+        if self.rules_cache is not None and all(complete for _, complete in parsed):
+            await self.rules_cache.set(cache_key, extracted_rules)
+        return extracted_rules
 
-    def _parse_violations(self, response: str) -> List[Dict]:
+    def _parse_rules(self, response: str) -> Tuple[List[Dict], bool]:
         """
-        Extracts and parses JSON content from the LLM's response using regex.
+        Reads a rules extraction response into rule dicts (without ids).
         
-        This function looks for JSON content within the response text, even if it's surrounded
-        by other explanatory text. It focuses on finding content within curly braces and
-        parsing it as JSON.
+        The response should be the JSON format requested by the extraction
+        prompt; its rule objects are read with JSONObjectStream, so prose
+        around the JSON is ignored. If the model answered in prose instead,
+        every list item or sentence-length line becomes a rule of category
+        "general", so the policy is still enforced.
         
-        Args:
-            response: The raw response string from the LLM
-            
-        Returns:
-            List of violation dictionaries extracted from the JSON content
+        Returns the rules and whether they are complete enough to cache: not
+        from the prose fallback, and not from a cut-off or malformed response.
         """
-        try:
-            # This regex pattern looks for content between outermost curly braces,
-            # including nested braces. The (?s) flag allows . to match newlines
-            json_pattern = r'(?s)\{.*\}'
-            json_match = re.search(json_pattern, response)
-            
-            if json_match:
-                # Extract the matched JSON string
-                json_str = json_match.group(0)
-                
-                # Parse the extracted JSON
-                data = json.loads(json_str)
-                
-                # If we have a violations key, return its contents
-                if isinstance(data, dict) and 'violations' in data:
-                    return data['violations']
-                
-                # If the JSON is already a list, return it directly
-                if isinstance(data, list):
-                    return data
-            
-            # If no valid JSON was found or parsed, return a parsing error
-            return [{
-                'type': 'parsing_error',
-                'description': 'Could not find valid JSON in the response',
-                'context': response[:100] + '...' if len(response) > 100 else response,
-                'severity': 'high',
-                'suggestion': 'Check LLM output formatting'
-            }]
-                
-        except json.JSONDecodeError as e:
-            # Handle JSON parsing errors specifically
-            return [{
-                'type': 'json_parsing_error',
-                'description': f'Failed to parse JSON: {str(e)}',
-                'context': response[:100] + '...' if len(response) > 100 else response,
-                'severity': 'high',
-                'suggestion': 'Verify JSON structure in LLM response'
-            }]
-        except Exception as e:
-            # Handle any other unexpected errors
-            return [{
-                'type': 'unexpected_error',
-                'description': f'Unexpected error during parsing: {str(e)}',
-                'context': response[:100] + '...' if len(response) > 100 else response,
-                'severity': 'high',
-                'suggestion': 'Check system logs for details'
-            }]
-    
+        scanner = JSONObjectStream()
+        items: List[Any] = scanner.feed(response)
+        complete = scanner.started and not scanner.unfinished and not scanner.malformed
+        if not scanner.started:
+            lines = (line.strip().lstrip("-*•#0123456789.) ").strip() for line in response.splitlines())
+            items = [line for line in lines if len(line) >= 20 and not line.endswith(":")]
+
+        rules = []
+        for item in items:
+            if isinstance(item, str):
+                item = {'requirement': item}
+            if not isinstance(item, dict) or not str(item.get('requirement') or '').strip():
+                continue
+            keywords = item.get('keywords')
+            examples = item.get('examples')
+            rules.append({
+                'category': str(item.get('category') or 'general'),
+                'requirement': " ".join(str(item['requirement']).split()),
+                'keywords': [str(keyword) for keyword in keywords] if isinstance(keywords, list) else [],
+                'examples': "; ".join(map(str, examples)) if isinstance(examples, list) else str(examples or ''),
+                'universal': item.get('universal') is True
+            })
+        return rules, complete
+
+    def _parse_violations(self, response: str) -> Tuple[List[Dict], bool]:
+        """
+        Salvages every complete violation from an analysis response in a single pass.
         
+        JSONObjectStream scans the text once, so prose around the JSON is
+        ignored and a response cut off part-way still yields every violation
+        that closed before the cut. Each violation is validated against
+        ComplianceViolation.
+        
+        Returns the violations and whether some may be missing: the response
+        was cut off, or an object in it was malformed or invalid. A response
+        with no JSON at all gives a single parsing_error violation.
+        """
+        scanner = JSONObjectStream()
+        violations, invalid = self._validate_violations(scanner.feed(response))
+        if not scanner.started:
+            return [self._parsing_error(response)], False
+        return violations, bool(scanner.unfinished or scanner.malformed or invalid)
+
+    def _parsing_error(self, response: str) -> Dict:
+        """
+        The violation reported in place of a response that held no JSON at all.
+        """
+        return {
+            'type': 'parsing_error',
+            'description': 'Could not find valid JSON in the response',
+            'context': response[:100] + '...' if len(response) > 100 else response,
+            'severity': 'high',
+            'suggestion': 'Check LLM output formatting'
+        }
+
+    def _validate_violations(self, objects: List[Dict]) -> Tuple[List[Dict], int]:
+        """
+        Keeps the objects that are valid ComplianceViolations, and counts the rest.
+        """
+        violations = []
+        invalid = 0
+        for obj in objects:
+            # A missing or numeric field alone should not discard the finding
+            candidate = {
+                **obj,
+                **{field: "" if obj.get(field) is None else obj[field] for field in VIOLATION_TEXT_FIELDS},
+                **{field: str(obj[field]) for field in (*VIOLATION_TEXT_FIELDS, 'rule_id') if isinstance(obj.get(field), (int, float))}
+            }
+            try:
+                violation = ComplianceViolation.model_validate(candidate)
+            except ValidationError:
+                invalid += 1
+                continue
+            if not (violation.description or violation.context):
+                invalid += 1
+                continue
+            violations.append(violation.model_dump(exclude_none=True))
+        return violations, invalid
+
     def _create_rules_extraction_prompt(self, policy_text: str) -> str:
         """
         Creates a prompt to analyze the compliance policy document and extract clear, actionable rules.
@@ -191,26 +815,54 @@ class TextAnalyzer:
         - Corrective actions or remediation procedures
 
         **Response Format:**
-        - Provide a structured list of rules under each category.
-        - Each rule should include:
-            - **The specific requirement**
-            - **Why it’s important (legal, ethical, reputational risks)**
-            - **Examples of compliance vs. non-compliance, if available**
-        - If applicable, highlight any ambiguities or areas where clarification may be needed.
+        Return only JSON in this format, with one entry per individual rule:
+        {{
+            "rules": [
+                {{
+                    "category": "required_terminology, prohibited_language, mandatory_disclosure, marketing_guideline, compliance_requirement or enforcement",
+                    "requirement": "The specific requirement, stated so that it can be checked on its own",
+                    "keywords": ["Words and phrases, with common synonyms, that show a page is subject to this rule"],
+                    "examples": "Compliant vs. non-compliant wording, if the policy gives any",
+                    "universal": true if every marketing page must satisfy the rule whatever its topic (e.g. a required disclaimer), otherwise false
+                }}
+            ]
+        }}
+        - Split compound requirements into separate rules.
+        - Keep each requirement self-contained; it will be shown without the rest of the policy.
+        """
+
+    def _create_triage_prompt(self, webpage_text: str, extracted_rules: str) -> str:
+        """
+        Creates the short yes/no screening prompt for the triage model.
+        """
+        return f"""
+        Could this webpage content violate any of the following compliance rules?
+        A required disclosure that is missing from the content counts as a possible violation.
+        If you are unsure, answer true.
+
+        COMPLIANCE RULES:
+        {extracted_rules}
 
-        The output should be well-organized and formatted for easy compliance checking.
+        WEBPAGE CONTENT TO SCREEN:
+        {webpage_text}
+
+        Answer with only this JSON: {{"likely_violation": true}} or {{"likely_violation": false}}
         """
 
-    def _create_analysis_prompt(self, webpage_text: str, extracted_rules: str) -> str:
+    def _create_analysis_prompt(self, webpage_text: str, extracted_rules: str, excerpt: bool = False) -> str:
         """
         Creates a prompt to analyze webpage content against the extracted compliance rules.
         
+        extracted_rules is the formatted text of the rules selected for this content.
+        With excerpt, the content is only the changed part of a page, so
+        content the page must carry is not reported as missing from it.
+        
         This method carefully structures the comparison between the webpage content
         and the previously extracted rules to ensure thorough compliance checking.
         """
         return f"""
         Compare this webpage content against the following compliance rules.
-        Identify any violations accurately and comprehensively.
+        Identify any violations accurately and comprehensively.{EXCERPT_NOTE if excerpt else ""}
 
         EXTRACTED COMPLIANCE RULES:
         {extracted_rules}
@@ -219,7 +871,7 @@ class TextAnalyzer:
         {webpage_text}
 
         For each violation found, provide:
-        1. Specific rule being violated
+        1. Specific rule being violated, by its id in square brackets
         2. Exact content that violates the rule
         3. Why it's a violation
         4. How to fix it
@@ -228,6 +880,7 @@ class TextAnalyzer:
         {{
             "violations": [
                 {{
+                    "rule_id": "Id of the violated rule, e.g. R3",
                     "type": "Type of violation (e.g., terminology, disclosure, marketing)",
                     "description": "A very detailed clear explanation of how content violates the rule. The detailed explanation should include the legal, ethical, or compliance implications of the violation. The description should be above 500 tokens.
                     "context": "The specific text or content that violates the rule",
@@ -239,4 +892,43 @@ class TextAnalyzer:
 
         If no violations are found, return an empty violations array.
         Focus on accuracy and providing actionable insights for fixing any violations.
-        """
\ No newline at end of file
+        """
+
+    def _create_repair_prompt(self, webpage_text: str, extracted_rules: str, found: List[Dict]) -> str:
+        """
+        Creates a prompt asking only for the violations a cut-off or malformed analysis response lost.
+        
+        The violations already found are listed by rule and context, so the
+        model does not spend output tokens repeating them.
+        """
+        reported = "\n".join(
+            f"- [{violation.get('rule_id') or 'no rule'}] {str(violation.get('context', ''))[:200]}"
+            for violation in found
+        ) or "- none"
+        return f"""
+        An earlier comparison of this webpage content against the following compliance rules
+        was cut off before it finished. These violations were already reported:
+        {reported}
+
+        EXTRACTED COMPLIANCE RULES:
+        {extracted_rules}
+
+        WEBPAGE CONTENT TO ANALYZE:
+        {webpage_text}
+
+        Report only violations that are not already listed above, in this JSON format:
+        {{
+            "violations": [
+                {{
+                    "rule_id": "Id of the violated rule, e.g. R3",
+                    "type": "Type of violation (e.g., terminology, disclosure, marketing)",
+                    "description": "A clear explanation of how the content violates the rule, in under 150 words",
+                    "context": "The specific text or content that violates the rule",
+                    "severity": "high/medium/low based on compliance impact",
+                    "suggestion": "A specific recommendation to achieve compliance"
+                }}
+            ]
+        }}
+
+        If nothing is missing, return an empty violations array.
+        """
@@ -1,46 +1,200 @@
-import trafilatura
-from bs4 import BeautifulSoup
-import requests
-from typing import Dict, List, Tuple
+import asyncio
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import httpx
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import urldefrag, urljoin
+from app.config import settings
+from app.services.metrics import track_stage
 from termcolor import colored
 
+if TYPE_CHECKING:
+    from lxml.html import HtmlElement
+
+# Smallest document that runs the whole extraction path, used to warm up extraction
+WARMUP_DOCUMENT = b"<html><head><title>warm-up</title></head><body><article><p>Warm-up.</p></article></body></html>"
+
 class WebScraper:
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.headers = {
-            "User-Agent": "Compliance-Checker-Bot/1.0"
+            "User-Agent": settings.USER_AGENT
         }
+        self.max_content_bytes = settings.MAX_CONTENT_SIZE * 1024 * 1024
+        # Reuse the application-wide pooled client when one is provided,
+        # otherwise own a private one that is closed in aclose()
+        self._owns_client = client is None
+        self.client = client or create_http_client()
+        self.extraction_pool = create_extraction_pool()
+
+    async def aclose(self) -> None:
+        """
+        Closes the HTTP client if this scraper created it and stops the extraction pool.
+        """
+        if self._owns_client:
+            await self.client.aclose()
+        if self.extraction_pool is not None:
+            self.extraction_pool.shutdown(wait=False, cancel_futures=True)
+
+    async def warm_up(self) -> None:
+        """
+        Starts the extraction processes and has each import the extraction
+        libraries, so the first real pages are not parsed by cold workers.
+        """
+        if self.extraction_pool is None:
+            await asyncio.to_thread(extract_document, WARMUP_DOCUMENT)
+            return
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(
+            loop.run_in_executor(self.extraction_pool, extract_document, WARMUP_DOCUMENT)
+            for _ in range(settings.EXTRACTION_POOL_SIZE)
+        ))
 
-    async def fetch_content(self, url: str) -> Dict[str, str]:
+    async def fetch_content(self, url: str, include_links: bool = False) -> Dict[str, str]:
         """
-        Fetches and processes webpage content, returning both raw HTML and cleaned text.
-        Also extracts meta information and important page sections.
+        Fetches and processes webpage content, returning its cleaned text
+        along with the page's meta information.
+        
+        With include_links, the absolute URLs of the page's links are returned
+        under "links", resolved against the final URL after redirects.
         """
         try:
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            html = response.text
-            
-            # Extract clean text using trafilatura
-            cleaned_text = trafilatura.extract(html)
-            
-            # Parse HTML for structured content
-            soup = BeautifulSoup(html, 'html.parser')
-            
-            output = {
-                "clean_text": cleaned_text,
-                "meta_info": self._extract_meta_info(soup)
-            }
-            
-            return output
+            with track_stage("fetch"):
+                # httpx's timeout applies to each read separately; this bounds the whole download
+                try:
+                    raw, final_url = await asyncio.wait_for(self._download(url), settings.REQUEST_TIMEOUT)
+                except asyncio.TimeoutError:
+                    raise TimeoutError(f"Download did not finish within {settings.REQUEST_TIMEOUT} seconds")
+            with track_stage("extract"):
+                return await self._extract(raw, final_url if include_links else None)
         except Exception as e:
             raise Exception(f"Failed to fetch content: {str(e)}")
 
-    def _extract_meta_info(self, soup: BeautifulSoup) -> Dict[str, str]:
+    async def _extract(self, raw: bytes, base_url: Optional[str] = None) -> Dict[str, str]:
         """
-        Extracts metadata from the webpage.
+        Runs the CPU-bound extraction in the process pool, off the event loop.
+        
+        Only the raw bytes are sent to the child and only the small extraction
+        result comes back.
         """
-        return {
-            "title": soup.title.string if soup.title else "",
-            "meta_description": soup.find("meta", {"name": "description"})["content"] if soup.find("meta", {"name": "description"}) else "",
-            "og_title": soup.find("meta", {"property": "og:title"})["content"] if soup.find("meta", {"property": "og:title"}) else ""
-        }
+        pool = self.extraction_pool
+        if pool is None:
+            return extract_document(raw, base_url)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, extract_document, raw, base_url)
+        except BrokenProcessPool:
+            # A child died (e.g. killed on memory): replace the pool so later fetches recover.
+            # Every extraction in flight on it fails at once, and only the first replaces it,
+            # so the others do not shut down the fresh pool and cancel its queued work.
+            if self.extraction_pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.extraction_pool = create_extraction_pool()
+            raise
+
+    async def _download(self, url: str) -> Tuple[bytes, str]:
+        """
+        Streams the response body, aborting as soon as it grows past MAX_CONTENT_SIZE.
+        
+        Returns the body together with the final URL after redirects.
+        """
+        async with self.client.stream("GET", url, headers=self.headers) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get("Content-Length")
+            if content_length and content_length.isdigit() and int(content_length) > self.max_content_bytes:
+                raise ValueError(f"Content exceeds {settings.MAX_CONTENT_SIZE} MB limit")
+
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body.extend(chunk)
+                if len(body) > self.max_content_bytes:
+                    raise ValueError(f"Content exceeds {settings.MAX_CONTENT_SIZE} MB limit")
+
+            # Decoding is left to the parser, which sniffs the document's charset
+            return bytes(body), str(response.url)
+
+
+def extract_document(raw: bytes, base_url: Optional[str] = None) -> Dict[str, str]:
+    """
+    Parses a document once with lxml and derives everything we need from that tree.
+    
+    When base_url is given, the page's links are also returned, made absolute.
+    """
+    # Imported here so the API process, which hands extraction to the pool, never loads trafilatura
+    import trafilatura
+    from trafilatura.utils import load_html
+
+    tree = load_html(raw)
+    # Drop our reference to the raw bytes as soon as the tree exists
+    del raw
+    if tree is None:
+        raise ValueError("Could not parse document as HTML")
+
+    # Read metadata and links first: trafilatura prunes the tree it is given
+    output = {"meta_info": _extract_meta_info(tree)}
+    if base_url:
+        output["links"] = _extract_links(tree, base_url)
+    output["clean_text"] = trafilatura.extract(tree)
+    return output
+
+
+def _extract_links(tree: "HtmlElement", base_url: str) -> List[str]:
+    """
+    Returns the distinct absolute http(s) URLs of the page's anchors, without fragments.
+    """
+    links = {}
+    for anchor in tree.iter("a"):
+        href = (anchor.get("href") or "").strip()
+        if not href:
+            continue
+        link = urldefrag(urljoin(base_url, href)).url
+        if link.startswith(("http://", "https://")):
+            links[link] = None
+    return list(links)
+
+
+def _extract_meta_info(tree: "HtmlElement") -> Dict[str, str]:
+    """
+    Extracts metadata from the parsed page in a single pass over its meta tags.
+    """
+    title = tree.find(".//title")
+    meta_info = {
+        "title": (title.text or "").strip() if title is not None else "",
+        "meta_description": "",
+        "og_title": ""
+    }
+    for meta in tree.iter("meta"):
+        key = meta.get("name") or meta.get("property")
+        if key == "description" and not meta_info["meta_description"]:
+            meta_info["meta_description"] = meta.get("content", "")
+        elif key == "og:title" and not meta_info["og_title"]:
+            meta_info["og_title"] = meta.get("content", "")
+    return meta_info
+
+
+def create_extraction_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Builds the process pool for HTML extraction, or None when EXTRACTION_POOL_SIZE is 0.
+    """
+    if settings.EXTRACTION_POOL_SIZE <= 0:
+        return None
+    if sys.version_info >= (3, 11):
+        return ProcessPoolExecutor(
+            max_workers=settings.EXTRACTION_POOL_SIZE,
+            max_tasks_per_child=settings.EXTRACTION_MAX_TASKS_PER_CHILD
+        )
+    return ProcessPoolExecutor(max_workers=settings.EXTRACTION_POOL_SIZE)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Builds the pooled async HTTP client shared by every fetch in the process.
+    """
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.REQUEST_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.MAX_CONCURRENT_REQUESTS,
+            max_keepalive_connections=settings.MAX_CONCURRENT_REQUESTS // 2 or 1
+        ),
+        follow_redirects=True
+    )
@@ -0,0 +1,81 @@
+# app/utils/chunking.py
+import re
+from typing import List
+
+# Llama-family tokenizers average roughly four characters of English text per token
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token count estimate used for chunk sizing and rate budgeting.
+    """
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """
+    Splits extracted text into its non-empty paragraphs (one per line in trafilatura output).
+    """
+    return [paragraph.strip() for paragraph in (text or "").splitlines() if paragraph.strip()]
+
+
+def chunk_text(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Packs paragraphs into chunks of at most max_tokens estimated tokens.
+    
+    Chunks break on paragraph boundaries. A paragraph that is too large on its
+    own is split on sentence boundaries, and as a last resort at a fixed width.
+    When overlap_tokens is set, trailing paragraphs of one chunk that fit in
+    that budget are repeated at the start of the next chunk, so a violation
+    spanning a boundary is seen whole by at least one chunk.
+    """
+    pieces: List[str] = []
+    for paragraph in split_paragraphs(text):
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_BOUNDARY.split(paragraph):
+            max_chars = max_tokens * CHARS_PER_TOKEN
+            pieces.extend(sentence[start:start + max_chars] for start in range(0, len(sentence), max_chars))
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in pieces:
+        piece_tokens = estimate_tokens(piece)
+        if current and current_tokens + piece_tokens > max_tokens:
+            chunks.append("\n".join(current))
+            # Carry trailing paragraphs over as overlap, keeping room for the new piece
+            overlap: List[str] = []
+            overlap_size = 0
+            for previous in reversed(current):
+                previous_tokens = estimate_tokens(previous)
+                if overlap_size + previous_tokens > min(overlap_tokens, max_tokens - piece_tokens):
+                    break
+                overlap.insert(0, previous)
+                overlap_size += previous_tokens
+            current, current_tokens = overlap, overlap_size
+        current.append(piece)
+        current_tokens += piece_tokens
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def chunk_overlaps(chunks: List[str]) -> List[str]:
+    """
+    The text each chunk shares with the next: the trailing paragraphs chunk_text repeated at the start of the next chunk.
+    """
+    overlaps = []
+    for current, following in zip(chunks, chunks[1:]):
+        pieces, next_pieces = current.split("\n"), following.split("\n")
+        size = next(
+            (size for size in range(min(len(pieces), len(next_pieces)), 0, -1) if pieces[-size:] == next_pieces[:size]),
+            0
+        )
+        overlaps.append("\n".join(next_pieces[:size]))
+    return overlaps
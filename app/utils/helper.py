@@ -0,0 +1,136 @@
+# app/utils/helper.py
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def content_hash(*parts: str) -> str:
+    """
+    Returns a stable SHA-256 hex digest over the given text parts.
+
+    Parts are NUL-separated so that ("ab", "c") and ("a", "bc") hash differently.
+    """
+    digest = hashlib.sha256()
+    for index, part in enumerate(parts):
+        if index:
+            digest.update(b"\0")
+        digest.update((part or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Formats one Server-Sent Events message with a JSON payload.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def gather_bounded(coroutines: Iterable[Awaitable[T]], limit: int) -> List[T]:
+    """
+    Like asyncio.gather, but with at most `limit` coroutines running at once.
+    """
+    semaphore = asyncio.Semaphore(max(limit, 1))
+
+    async def run(coroutine: Awaitable[T]) -> T:
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines))
+
+
+def _normalize_context(context: Any) -> str:
+    return " ".join(str(context or "").lower().split()).strip(" \"'`.,;:")
+
+
+class ViolationMerger:
+    """
+    Accumulates violations while dropping duplicates.
+    
+    Each violation is added with the index of the chunk it was found in.
+    Two violations are duplicates when they break the same rule of the same
+    policy, one's context contains the other's, and both can be quoting the
+    same passage: they come from one chunk, or from adjacent chunks and the
+    shorter context lies in the text those chunks share (overlaps[i] is the
+    text common to chunks i and i + 1). This happens when overlapping chunks
+    both report a passage, or a repair call reports it again. The longer
+    context is kept. The same quote found in two separate parts of the page
+    stays two violations, except without a context, which marks a finding
+    about the page as a whole. The rule is the rule_id when both violations
+    cite one, and otherwise their type, so one passage breaking two rules
+    stays two violations.
+    """
+
+    def __init__(self, overlaps: Sequence[str] = ()):
+        self.violations: List[Dict] = []
+        self._keys: List[Tuple[str, str, str, str, int]] = []
+        self._overlaps = [" ".join(overlap.lower().split()) for overlap in overlaps]
+
+    def add(self, violation: Dict, chunk: int = 0) -> bool:
+        """
+        Adds a violation found in the given chunk, returning False if it duplicated one already seen.
+        """
+        key = (
+            str(violation.get("type", "")).strip().lower(),
+            str(violation.get("rule_id") or "").strip(),
+            str(violation.get("policy_url") or ""),
+            _normalize_context(violation.get("context")),
+            chunk
+        )
+        for index, (seen_type, seen_rule, seen_policy, seen_context, seen_chunk) in enumerate(self._keys):
+            if seen_policy != key[2]:
+                continue
+            if (seen_rule != key[1]) if (seen_rule and key[1]) else (seen_type != key[0]):
+                continue
+            if key[3] == seen_context or (key[3] and key[3] in seen_context):
+                if self._same_passage(seen_chunk, chunk, key[3]):
+                    return False
+            elif seen_context and seen_context in key[3] and self._same_passage(seen_chunk, chunk, seen_context):
+                self.violations[index] = violation
+                self._keys[index] = key
+                return False
+        self.violations.append(violation)
+        self._keys.append(key)
+        return True
+
+    def _same_passage(self, first_chunk: int, second_chunk: int, context: str) -> bool:
+        if first_chunk == second_chunk or not context:
+            return True
+        if abs(first_chunk - second_chunk) != 1:
+            return False
+        shared = min(first_chunk, second_chunk)
+        return shared < len(self._overlaps) and context in self._overlaps[shared]
+
+
+def merge_violations(violation_lists: Iterable[List[Dict]], overlaps: Sequence[str] = ()) -> List[Dict]:
+    """
+    Flattens per-chunk violation lists into one deduplicated list.
+    """
+    merger = ViolationMerger(overlaps)
+    for chunk, violations in enumerate(violation_lists):
+        for violation in violations:
+            merger.add(violation, chunk)
+    return merger.violations
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one in-flight computation.
+    
+    The first caller for a key starts the work. Callers that arrive while it
+    runs await the same result, or exception, instead of starting their own.
+    The work keeps running if one of its waiters is cancelled.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> T:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(work())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
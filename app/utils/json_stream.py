@@ -0,0 +1,94 @@
+# app/utils/json_stream.py
+import json
+from typing import Dict, List
+
+
+class JSONObjectStream:
+    """
+    Incremental scanner that pulls JSON objects out of an array as text arrives.
+
+    Text is fed in arbitrary fragments (for example, LLM stream tokens). Every
+    object that sits directly inside a JSON array is returned as soon as its
+    closing brace is seen. Both {"violations": [{...}, ...]} and a bare [{...}]
+    work, and prose around the JSON is ignored. Each character is scanned once,
+    so the cost is linear in the length of the stream.
+    """
+
+    def __init__(self):
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escaped = False
+        self._capture: List[str] = []
+        self._capture_depth = 0
+        self._seen_array = False
+        self._seen_json = False
+        # Objects that closed but were not valid JSON
+        self.malformed = 0
+
+    @property
+    def pending(self) -> str:
+        """
+        Text of the object currently being captured, if it has not closed yet.
+        """
+        return "".join(self._capture)
+
+    @property
+    def started(self) -> bool:
+        """
+        True once any JSON object or array has opened.
+        """
+        return self._seen_json
+
+    @property
+    def unfinished(self) -> bool:
+        """
+        True when the text so far stops where more objects could follow: inside
+        an array, or inside an object before any array opened. A response that
+        ends this way was cut off.
+        """
+        return "[" in self._stack or (bool(self._stack) and not self._seen_array)
+
+    def feed(self, text: str) -> List[Dict]:
+        """
+        Consumes the next fragment and returns the objects it completed.
+        """
+        completed = []
+        for char in text:
+            capturing = self._capture_depth > 0
+            if capturing:
+                self._capture.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if not capturing and char == "{" and self._stack and self._stack[-1] == "[":
+                    self._capture = [char]
+                    self._capture_depth = len(self._stack) + 1
+                self._seen_json = True
+                if char == "[":
+                    self._seen_array = True
+                self._stack.append(char)
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if capturing and char == "}" and len(self._stack) + 1 == self._capture_depth:
+                    self._capture_depth = 0
+                    try:
+                        obj = json.loads("".join(self._capture))
+                    except json.JSONDecodeError:
+                        obj = None
+                        self.malformed += 1
+                    self._capture = []
+                    if isinstance(obj, dict):
+                        completed.append(obj)
+        return completed
@@ -0,0 +1,239 @@
+# benchmarks/bench_e2e.py
+"""
+End-to-end load benchmark of the API that runs fully offline.
+
+Pages and the policy come from the saved corpus, served by a local fixture
+server. TextAnalyzer's Groq client is replaced by FakeGroq, which answers
+deterministically with a configurable time to first token and token
+throughput. The FastAPI app runs in-process under uvicorn on a local socket
+(its lifespan included) and is driven at each concurrency level over real
+HTTP. A real server matters for the stream endpoint: httpx's ASGI transport
+buffers a whole response, which would make time to first violation equal
+the full stream time.
+
+By default every request checks a distinct revision of a corpus page, so
+in-flight coalescing and incremental re-checks do not short-cut the pipeline;
+pass --same-pages to measure those paths instead. Incremental checks keep the
+app's default (a first check of a page costs what a regular check does);
+--no-incremental turns them off. The policy is the same for every request, so
+its rules are extracted once and then served from the rules cache, as in
+production.
+
+Peak RSS is the process high-water mark (it never goes down, so later levels
+include earlier ones); extraction worker processes are reported separately.
+
+Usage:
+    python benchmarks/bench_e2e.py [--concurrency 1,4,16] [--requests 40]
+        [--endpoint check|stream] [--mode llm|fast|hybrid]
+        [--latency 0.3] [--tokens-per-second 250] [--same-pages] [--no-incremental]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "corpus"
+
+
+def configure_environment(data_dir: str, incremental: bool = True) -> None:
+    """
+    Settings are read when app.config is imported, so this runs before any app import.
+    
+    Incremental checks are left at the app's setting unless incremental is False.
+    """
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["ENABLE_RATE_LIMIT"] = "false"
+    if not incremental:
+        os.environ["ENABLE_INCREMENTAL_CHECKS"] = "false"
+    os.environ["CACHE_DB_PATH"] = os.path.join(data_dir, "rules_cache.db")
+    os.environ["SECTION_STORE_PATH"] = os.path.join(data_dir, "sections.db")
+    os.environ["JOB_DB_PATH"] = os.path.join(data_dir, "jobs.db")
+    os.environ["SCAN_HISTORY_PATH"] = os.path.join(data_dir, "scans.db")
+    os.environ["METRICS_DB_PATH"] = os.path.join(data_dir, "metrics.db")
+
+
+def percentile(values: List[float], pct: int) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def peak_rss_mb(pid: Optional[int] = None) -> float:
+    """
+    High-water RSS of this process, or of another process via /proc (Linux only; 0 if unavailable).
+    """
+    if pid is None:
+        # ru_maxrss is kilobytes on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def worker_peak_rss_mb(app) -> float:
+    pool = app.state.checker.web_scraper.extraction_pool
+    processes = getattr(pool, "_processes", None) or {}
+    return sum(peak_rss_mb(pid) for pid in list(processes))
+
+
+async def run_request(client, endpoint: str, payload: Dict) -> Dict[str, float]:
+    """
+    Sends one check and returns its latency, plus time to first violation for streams.
+    """
+    started = time.perf_counter()
+    if endpoint == "check":
+        response = await client.post("/check-compliance", json=payload)
+        response.raise_for_status()
+        return {"latency": time.perf_counter() - started}
+
+    first_violation = None
+    async with client.stream("POST", "/check-compliance/stream", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line == "event: error":
+                raise RuntimeError("stream reported an error event")
+            if first_violation is None and line == "event: violation":
+                first_violation = time.perf_counter() - started
+    result = {"latency": time.perf_counter() - started}
+    if first_violation is not None:
+        result["first_violation"] = first_violation
+    return result
+
+
+async def run_level(client, endpoint: str, payloads: List[Dict], concurrency: int) -> Dict:
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    results: List[Dict[str, float]] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        while not queue.empty():
+            payload = queue.get_nowait()
+            try:
+                results.append(await run_request(client, endpoint, payload))
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"results": results, "errors": errors, "elapsed": elapsed}
+
+
+async def start_server(app):
+    """
+    Serves app with uvicorn on an ephemeral localhost port, returning the server, its task and base URL.
+    """
+    import uvicorn
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    return server, task, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+def build_payloads(fixtures, pages: List[str], policy: str, count: int, mode: str, same_pages: bool, offset: int) -> List[Dict]:
+    payloads = []
+    for index in range(count):
+        page = pages[index % len(pages)]
+        webpage_url = fixtures.url(page) if same_pages else f"{fixtures.url(page)}?rev={offset + index}"
+        payloads.append({"webpage_url": webpage_url, "policy_url": fixtures.url(policy), "mode": mode})
+    return payloads
+
+
+async def benchmark(args) -> None:
+    import httpx
+    from app.main import app
+    from fixtures import FakeGroq, FixtureServer
+
+    corpus = Path(args.corpus)
+    pages = sorted(str(path.relative_to(corpus)) for path in (corpus / "pages").glob("*.html"))
+    policies = sorted(str(path.relative_to(corpus)) for path in (corpus / "policies").glob("*.html"))
+    if not pages or not policies:
+        sys.exit(f"Expected pages/*.html and policies/*.html under {corpus}")
+
+    fake_llm = FakeGroq(latency=args.latency, tokens_per_second=args.tokens_per_second)
+    with FixtureServer(corpus) as fixtures:
+        server, server_task, base_url = await start_server(app)
+        try:
+            app.state.checker.text_analyzer.client = fake_llm
+            limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+            async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+                # Warm up extraction workers, imports and the policy's rules cache entry
+                for payload in build_payloads(fixtures, pages, policies[0], len(pages), args.mode, args.same_pages, offset=10 ** 6):
+                    await run_request(client, args.endpoint, payload)
+
+                print(
+                    f"endpoint={args.endpoint} mode={args.mode} requests/level={args.requests} "
+                    f"llm latency={args.latency}s throughput={args.tokens_per_second} tok/s "
+                    f"pages={'same' if args.same_pages else 'distinct'}"
+                )
+                header = f"{'conc':>5} {'ok':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>8} {'first viol p50':>15} {'peak RSS MB':>12} {'workers MB':>11}"
+                print(header)
+                print("-" * len(header))
+                offset = 0
+                for concurrency in args.concurrency:
+                    payloads = build_payloads(fixtures, pages, policies[0], args.requests, args.mode, args.same_pages, offset)
+                    offset += args.requests
+                    level = await run_level(client, args.endpoint, payloads, concurrency)
+                    latencies = [result["latency"] for result in level["results"]]
+                    first_violations = [result["first_violation"] for result in level["results"] if "first_violation" in result]
+                    if not latencies:
+                        print(f"{concurrency:>5} {0:>5} {level['errors']:>4}   every request failed")
+                        continue
+                    first_violation = f"{percentile(first_violations, 50) * 1000:.1f}" if first_violations else "-"
+                    print(
+                        f"{concurrency:>5} {len(latencies):>5} {level['errors']:>4} "
+                        f"{percentile(latencies, 50) * 1000:>9.1f} {percentile(latencies, 95) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f} "
+                        f"{len(latencies) / level['elapsed']:>8.1f} {first_violation:>15} "
+                        f"{peak_rss_mb():>12.1f} {worker_peak_rss_mb(app):>11.1f}"
+                    )
+        finally:
+            server.should_exit = True
+            await server_task
+    by_model = ", ".join(f"{model}: {calls}" for model, calls in sorted(fake_llm.calls_by_model.items()))
+    print(f"fake LLM: {fake_llm.calls} calls ({by_model}), {fake_llm.prompt_tokens} prompt tokens, {fake_llm.completion_tokens} completion tokens")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS), help="directory with pages/ and policies/ of saved .html files")
+    parser.add_argument("--concurrency", type=lambda value: [int(level) for level in value.split(",")], default=[1, 4, 16], help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=40, help="requests per concurrency level")
+    parser.add_argument("--endpoint", choices=["check", "stream"], default="check")
+    parser.add_argument("--mode", choices=["llm", "fast", "hybrid"], default="llm")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake LLM time to first token, seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0, help="fake LLM output throughput; 0 for instant")
+    parser.add_argument("--same-pages", action="store_true", help="reuse identical page URLs, letting coalescing and incremental checks kick in")
+    parser.add_argument("--no-incremental", action="store_true", help="turn incremental re-checks off (ENABLE_INCREMENTAL_CHECKS=false)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="compliance-bench-") as data_dir:
+        configure_environment(data_dir, incremental=not args.no_incremental)
+        asyncio.run(benchmark(args))
+
+
+if __name__ == "__main__":
+    main()
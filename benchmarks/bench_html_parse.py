@@ -0,0 +1,110 @@
+# benchmarks/bench_html_parse.py
+"""
+Micro-benchmark of HTML extraction over a corpus of saved pages.
+
+Compares the previous pipeline, which ran trafilatura on the raw string and then
+parsed the document again with BeautifulSoup's html.parser for metadata, against
+the single lxml parse used by app.services.web_scraper.extract_document.
+
+Peak memory is the Python heap peak reported by tracemalloc for one extraction.
+libxml2's own allocations are not tracked, but both pipelines build the same
+lxml tree, so the difference is the BeautifulSoup tree and the decoded string.
+
+Usage:
+    python benchmarks/bench_html_parse.py [corpus_dir] [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+import trafilatura
+from bs4 import BeautifulSoup
+from app.services.web_scraper import extract_document
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "corpus"
+
+
+def extract_two_parses(raw: bytes) -> dict:
+    """
+    The pre-refactor pipeline: trafilatura on the decoded string plus a BeautifulSoup parse.
+    """
+    html = raw.decode("utf-8", errors="replace")
+    cleaned_text = trafilatura.extract(html)
+    soup = BeautifulSoup(html, 'html.parser')
+    return {
+        "clean_text": cleaned_text,
+        "meta_info": {
+            "title": soup.title.string if soup.title else "",
+            "meta_description": soup.find("meta", {"name": "description"})["content"] if soup.find("meta", {"name": "description"}) else "",
+            "og_title": soup.find("meta", {"property": "og:title"})["content"] if soup.find("meta", {"property": "og:title"}) else ""
+        }
+    }
+
+
+def measure(extract, raw: bytes, repeat: int):
+    """
+    Returns (median seconds, peak traced bytes) for one extraction function on one page.
+    """
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        extract(raw)
+        durations.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    extract(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(durations), peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", nargs="?", default=str(DEFAULT_CORPUS), help="directory of saved .html files")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per page and pipeline")
+    args = parser.parse_args()
+
+    pages = sorted(Path(args.corpus).rglob("*.html"))
+    if not pages:
+        sys.exit(f"No .html files found under {args.corpus}")
+
+    header = f"{'page':<40} {'KB':>7} {'before ms':>10} {'after ms':>9} {'saved ms':>9} {'before KB':>10} {'after KB':>9} {'saved KB':>9}"
+    print(header)
+    print("-" * len(header))
+    totals = [0.0, 0.0, 0, 0]
+    for page in pages:
+        raw = page.read_bytes()
+        # Warm up imports and trafilatura's lazily built state
+        extract_document(raw)
+        extract_two_parses(raw)
+
+        before_time, before_peak = measure(extract_two_parses, raw, args.repeat)
+        after_time, after_peak = measure(extract_document, raw, args.repeat)
+        totals[0] += before_time
+        totals[1] += after_time
+        totals[2] += before_peak
+        totals[3] += after_peak
+        print(
+            f"{str(page.relative_to(args.corpus)):<40} {len(raw) / 1024:>7.1f} "
+            f"{before_time * 1000:>10.2f} {after_time * 1000:>9.2f} {(before_time - after_time) * 1000:>9.2f} "
+            f"{before_peak / 1024:>10.0f} {after_peak / 1024:>9.0f} {(before_peak - after_peak) / 1024:>9.0f}"
+        )
+
+    count = len(pages)
+    print("-" * len(header))
+    print(
+        f"{'mean per page':<40} {'':>7} "
+        f"{totals[0] / count * 1000:>10.2f} {totals[1] / count * 1000:>9.2f} {(totals[0] - totals[1]) / count * 1000:>9.2f} "
+        f"{totals[2] / count / 1024:>10.0f} {totals[3] / count / 1024:>9.0f} {(totals[2] - totals[3]) / count / 1024:>9.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
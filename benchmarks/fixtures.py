@@ -0,0 +1,213 @@
+# benchmarks/fixtures.py
+"""
+Offline stand-ins for the two things a compliance check talks to: the websites
+being checked and the Groq API.
+
+FixtureServer serves the saved corpus over local HTTP. FakeGroq has the shape of
+groq.AsyncGroq as TextAnalyzer uses it, answers deterministically from the
+prompt, and takes as long as a real model would for the same output: a fixed
+time to first token plus the completion tokens at a configurable throughput.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+from urllib.parse import parse_qs, urlsplit
+
+from app.utils.chunking import estimate_tokens
+
+# Phrases the fake model "finds"; each hit becomes one violation with its sentence as context
+TRIGGER_PHRASES = {
+    "bank account": ("terminology", "high", "Call it an account or a money account; the company is not a bank."),
+    "guarantee": ("marketing", "high", "Remove the guarantee or state the conditions and risks that apply."),
+    "fdic": ("disclosure", "high", "Say that FDIC insurance is provided through partner banks and covers only covered failures."),
+    "savings account": ("terminology", "medium", "Describe the product without implying it is a bank savings account."),
+    "deposit": ("terminology", "low", "Say that funds are held at partner banks instead of deposited with the company.")
+}
+
+FAKE_RULES = json.dumps({"rules": [
+    {"category": "required_terminology", "requirement": "Refer to the product as an account or money account, never a bank account or savings account.", "keywords": ["bank account", "savings account", "checking"], "examples": "", "universal": False},
+    {"category": "prohibited_language", "requirement": "Do not guarantee returns, yields or outcomes.", "keywords": ["guarantee", "returns", "yield", "risk-free"], "examples": "", "universal": False},
+    {"category": "prohibited_language", "requirement": "Do not describe customer funds as deposits held by the company.", "keywords": ["deposit", "funds"], "examples": "", "universal": False},
+    {"category": "mandatory_disclosure", "requirement": "State that banking services are provided by partner banks, Members FDIC.", "keywords": ["disclaimer", "partner bank"], "examples": "", "universal": True},
+    {"category": "marketing_guideline", "requirement": "FDIC insurance claims must name the partner bank and the conditions of coverage.", "keywords": ["fdic", "insured", "insurance"], "examples": "", "universal": False}
+]})
+
+
+class _CorpusHandler(SimpleHTTPRequestHandler):
+    """
+    Serves corpus files. A ?rev=N query adds a paragraph naming that revision
+    to the page's article, so every request can get distinct page text (and a
+    distinct content hash) from the same saved file.
+    """
+
+    def send_head(self):
+        revision = parse_qs(urlsplit(self.path).query).get("rev", [None])[0]
+        path = Path(self.translate_path(self.path))
+        if revision is None or not path.is_file():
+            return super().send_head()
+        body = path.read_bytes().replace(
+            b"</article>",
+            f"<p>Revision {revision} of this page, reviewed for publication.</p></article>".encode(),
+            1
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return None
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """
+    Threaded HTTP server for a corpus directory on an ephemeral localhost port.
+    """
+
+    def __init__(self, root: Path):
+        handler = lambda *args, **kwargs: _CorpusHandler(*args, directory=str(root), **kwargs)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FixtureServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+
+class FakeGroq:
+    """
+    Deterministic replacement for groq.AsyncGroq.
+
+    Each call waits `latency` seconds before its first token, then emits the
+    completion at `tokens_per_second` (0 means instantly). Streaming calls
+    spread that time over their chunks, so time to first violation behaves
+    like the real API.
+    """
+
+    def __init__(self, latency: float = 0.3, tokens_per_second: float = 250.0, description_tokens: int = 120):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.description_tokens = description_tokens
+        self.calls = 0
+        self.calls_by_model: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def close(self) -> None:
+        pass
+
+    def respond(self, system_prompt: str, user_prompt: str) -> str:
+        """
+        The completion text the fake model returns for a prompt.
+        """
+        if "POLICY DOCUMENT:" in user_prompt:
+            return FAKE_RULES
+        if "WEBPAGE CONTENT TO SCREEN:" in user_prompt:
+            flagged = bool(self._violations(_section(user_prompt, "WEBPAGE CONTENT TO SCREEN:", "Answer with only")))
+            return json.dumps({"likely_violation": flagged})
+        rules_text = _section(user_prompt, "EXTRACTED COMPLIANCE RULES:", "WEBPAGE CONTENT TO ANALYZE:")
+        webpage_text = _section(user_prompt, "WEBPAGE CONTENT TO ANALYZE:", "For each violation found")
+        return json.dumps({"violations": self._violations(webpage_text, rules_text)})
+
+    def _violations(self, webpage_text: str, rules_text: str = "") -> List[Dict]:
+        # Cite the first rule line that mentions the phrase, as "[R2] (category) ..."
+        rule_ids = {
+            phrase: next((line.split("]")[0].strip().lstrip("[") for line in rules_text.splitlines() if phrase in line.lower() and "]" in line), None)
+            for phrase in TRIGGER_PHRASES
+        }
+        violations = []
+        for sentence in re.split(r"(?<=[.!?])\s+", webpage_text):
+            lowered = sentence.lower()
+            for phrase, (violation_type, severity, suggestion) in TRIGGER_PHRASES.items():
+                if phrase in lowered:
+                    violations.append({
+                        "rule_id": rule_ids[phrase],
+                        "type": violation_type,
+                        "description": _filler(f"The content uses '{phrase}', which the policy restricts.", self.description_tokens),
+                        "context": sentence.strip()[:300],
+                        "severity": severity,
+                        "suggestion": suggestion
+                    })
+        return violations
+
+    async def _create(self, messages: List[Dict], model: str, stream: bool = False, **kwargs):
+        system_prompt = messages[0]["content"]
+        user_prompt = messages[-1]["content"]
+        text = self.respond(system_prompt, user_prompt)
+        usage = SimpleNamespace(
+            prompt_tokens=estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+            completion_tokens=estimate_tokens(text)
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+        self.calls += 1
+        self.calls_by_model[model] = self.calls_by_model.get(model, 0) + 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.completion_tokens += usage.completion_tokens
+
+        await asyncio.sleep(self.latency)
+        if stream:
+            return self._stream(text, usage)
+        await asyncio.sleep(self._generation_time(usage.completion_tokens))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text), finish_reason="stop")],
+            usage=usage
+        )
+
+    async def _stream(self, text: str, usage: SimpleNamespace):
+        # About four tokens per chunk, paced to the configured throughput
+        chunk_size = 16
+        started = time.perf_counter()
+        total_time = self._generation_time(usage.completion_tokens)
+        for start in range(0, len(text), chunk_size):
+            due = started + total_time * (start + chunk_size) / len(text)
+            await asyncio.sleep(max(due - time.perf_counter(), 0))
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=text[start:start + chunk_size]), finish_reason=None)],
+                x_groq=None,
+                usage=None
+            )
+        yield SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason="stop")],
+            x_groq=SimpleNamespace(usage=usage),
+            usage=None
+        )
+
+    def _generation_time(self, completion_tokens: int) -> float:
+        return completion_tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+
+def _section(prompt: str, start_marker: str, end_marker: str) -> str:
+    start = prompt.find(start_marker)
+    if start == -1:
+        return prompt
+    start += len(start_marker)
+    end = prompt.find(end_marker, start)
+    return prompt[start:end if end != -1 else None]
+
+
+def _filler(sentence: str, tokens: int) -> str:
+    """
+    Pads a description to roughly `tokens` tokens, like the long explanations the analysis prompt asks for.
+    """
+    text = sentence
+    while estimate_tokens(text) < tokens:
+        text += " This may mislead customers about who holds their funds and what protections apply."
+    return text
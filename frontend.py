@@ -1,5 +1,89 @@
-import streamlit as st
+import json
+import os
+import time
+from datetime import datetime
+
 import requests
+import sseclient
+import streamlit as st
+
+# Base URL of the Compliance Checker API
+API_BASE_URL = os.environ.get("COMPLIANCE_API_URL", "http://localhost:8050").rstrip("/")
+# Seconds a finished check is reused for the same webpage and policy
+RESULT_CACHE_TTL = int(os.environ.get("COMPLIANCE_RESULT_CACHE_TTL", "900"))
+# (connect, read) seconds; the read timeout applies between streamed events, not to the whole check
+REQUEST_TIMEOUT = (10, 300)
+
+STAGE_LABELS = {
+    "fetch": "Fetching the webpage and policy",
+    "rules_extraction": "Extracting the policy's rules",
+    "analysis": "Analyzing the webpage",
+}
+
+
+def escape_markdown(text) -> str:
+    # Streamlit renders $...$ as LaTeX
+    return str(text or "").replace("$", "\\$")
+
+
+def render_violation(number: int, violation: dict) -> None:
+    title = f"Violation {number}: {escape_markdown(violation.get('type'))} ({str(violation.get('severity', '')).title()} Severity)"
+    with st.expander(title, expanded=True):
+        st.markdown(f"**Description:** {escape_markdown(violation.get('description'))}")
+        st.markdown(f"**Context:** `{escape_markdown(violation.get('context'))}`")
+        st.markdown(f"**Suggestion:** {escape_markdown(violation.get('suggestion'))}")
+
+
+def cached_result(key):
+    """
+    Returns the cached result for (webpage_url, policy_url), or None when missing or older than RESULT_CACHE_TTL.
+    """
+    entry = st.session_state.setdefault("results", {}).get(key)
+    if entry is None or time.time() - entry["stored_at"] > RESULT_CACHE_TTL:
+        return None
+    return entry
+
+
+def stream_check(payload: dict, violations_container, progress):
+    """
+    Runs a check through the streaming endpoint, rendering each violation as it arrives.
+
+    Returns the list of violations, or None if the check failed.
+    """
+    violations = []
+    response = requests.post(
+        f"{API_BASE_URL}/check-compliance/stream",
+        json=payload,
+        stream=True,
+        timeout=REQUEST_TIMEOUT,
+        headers={"Accept": "text/event-stream"}
+    )
+    try:
+        if response.status_code != 200:
+            progress.error(f"API request failed with status code {response.status_code}: {response.text[:500]}")
+            return None
+
+        for event in sseclient.SSEClient(response).events():
+            data = json.loads(event.data) if event.data else {}
+            if event.event == "progress":
+                label = STAGE_LABELS.get(data.get("stage"), data.get("stage", "Working"))
+                progress.info(f"{label}..." if data.get("status") == "started" else f"{label}: done")
+            elif event.event == "violation":
+                violations.append(data)
+                with violations_container:
+                    render_violation(len(violations), data)
+            elif event.event == "error":
+                progress.error(f"The check failed: {data.get('detail', 'unknown error')}")
+                return None
+            elif event.event == "done":
+                progress.success(f"Check complete: {len(violations)} violation(s) found")
+                return violations
+    finally:
+        response.close()
+
+    progress.error("The connection closed before the check completed")
+    return None
+
 
 st.set_page_config(page_title="Compliance Checker", layout="wide")
 st.title("Compliance Checker")
@@ -7,45 +91,42 @@ st.title("Compliance Checker")
 # Input fields
 webpage_url = st.text_input("Webpage URL", placeholder="Enter webpage URL")
 policy_url = st.text_input("Policy URL", placeholder="Enter policy URL")
+refresh = st.checkbox("Ignore cached results", value=False)
 
 if st.button("Check Compliance"):
     if not webpage_url or not policy_url:
         st.warning("Please fill both URL fields")
     else:
-        payload = {
-            "webpage_url": webpage_url,
-            "policy_url": policy_url
-        }
-        
-        try:
-            response = requests.post(
-                "http://api.insituate.ai:8050/check-compliance",
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                
-                # Display results
-                st.subheader("Compliance Check Results")
-                st.write(f"**Webpage URL:** {result['webpage_url']}")
-                st.write(f"**Policy URL:** {result['policy_url']}")
-                st.write(f"**Scan Timestamp:** {result['scan_timestamp']}")
-                
-                # Display violations
-                st.subheader("Violations Found", divider="red")
-                for i, violation in enumerate(result.get('violations', []), 1):
-                    # Modified suggestion display in the expander section
-                    with st.expander(f"Violation {i}: {violation['type'].replace('$', '\\$')} ({violation['severity'].title()} Severity)", expanded=True):
-                        st.markdown(f"**Description:** {violation['description'].replace('$', '\\$')}")
-                        st.markdown(f"**Context:** `{violation['context'].replace('$', '\\$')}`")
-                        
-                        # Fix: Add .replace() to handle dollar signs
-                        fixed_suggestion = violation['suggestion'].replace('$', '\\$')
-                        st.markdown(f"**Suggestion:** {fixed_suggestion}")
-                        
-            else:
-                st.error(f"API request failed with status code {response.status_code}")
-                
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
\ No newline at end of file
+        key = (webpage_url.strip(), policy_url.strip())
+        entry = None if refresh else cached_result(key)
+
+        st.subheader("Compliance Check Results")
+        st.write(f"**Webpage URL:** {key[0]}")
+        st.write(f"**Policy URL:** {key[1]}")
+        timestamp = st.empty()
+        progress = st.empty()
+        st.subheader("Violations Found", divider="red")
+        violations_container = st.container()
+
+        if entry is not None:
+            timestamp.write(f"**Scan Timestamp:** {entry['scan_timestamp']} (cached)")
+            with violations_container:
+                for i, violation in enumerate(entry["violations"], 1):
+                    render_violation(i, violation)
+        else:
+            scan_timestamp = datetime.utcnow().isoformat()
+            timestamp.write(f"**Scan Timestamp:** {scan_timestamp}")
+            try:
+                violations = stream_check(
+                    {"webpage_url": key[0], "policy_url": key[1]},
+                    violations_container,
+                    progress
+                )
+                if violations is not None:
+                    st.session_state.setdefault("results", {})[key] = {
+                        "stored_at": time.time(),
+                        "scan_timestamp": scan_timestamp,
+                        "violations": violations
+                    }
+            except Exception as e:
+                progress.error(f"An error occurred: {str(e)}")
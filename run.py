@@ -1,30 +1,100 @@
 # run.py
-import uvicorn
-from app.config import settings
+import argparse
+import importlib
 import sys
+from app.config import settings
+
+# Settings whose names contain any of these are never printed
+SECRET_MARKERS = ("KEY", "SECRET", "TOKEN", "PASSWORD")
+
+# Imported once in the gunicorn master so forked workers share them instead of each importing them
+PRELOAD_MODULES = ("groq",)
+
+def masked(key: str, value) -> str:
+    if value and any(marker in key.upper() for marker in SECRET_MARKERS):
+        return "****" + str(value)[-4:] if len(str(value)) > 8 else "****"
+    return str(value)
 
 def debug_settings():
-    """Print current settings for verification"""
+    """Print current settings for verification, with secrets masked"""
     print("\nCurrent settings:")
     for key, value in settings.__dict__.items():
         if not key.startswith('_'):
-            print(f"{key}={value}")
+            print(f"{key}={masked(key, value)}")
     print("\n")
 
+def run_development():
+    """
+    Single uvicorn process, reloading on code changes when RELOAD is set.
+
+    uvicorn cannot reload and run several workers at once, so WORKERS is
+    only used when RELOAD is off.
+    """
+    import uvicorn
+
+    debug_settings()  # Add this to verify settings are loaded correctly
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        reload=settings.RELOAD,
+        workers=1 if settings.RELOAD else settings.WORKERS,
+        log_level=settings.LOG_LEVEL.lower(),
+    )
+
+def run_production():
+    """
+    gunicorn master with WORKERS uvicorn workers and the app preloaded.
+
+    The master imports the app (and PRELOAD_MODULES) once before forking, so
+    workers start without re-importing it and share those pages. Clients,
+    pools and database connections are only created in each worker's
+    lifespan, after the fork, and the worker warms them up before accepting
+    traffic.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class ProductionServer(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{settings.HOST}:{settings.PORT}",
+                "workers": settings.WORKERS,
+                "worker_class": "uvicorn_worker.UvicornWorker",
+                "preload_app": True,
+                "graceful_timeout": settings.GRACEFUL_TIMEOUT,
+                "loglevel": settings.LOG_LEVEL.lower(),
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            for module in PRELOAD_MODULES:
+                importlib.import_module(module)
+            from app.main import app
+            return app
+
+    ProductionServer().run()
+
 def main():
+    parser = argparse.ArgumentParser(description="Run the Compliance Checker API")
+    parser.add_argument(
+        "--profile",
+        choices=["development", "production"],
+        default=settings.SERVER_PROFILE,
+        help="development: uvicorn with reload; production: preloaded gunicorn workers (default: SERVER_PROFILE)"
+    )
+    args = parser.parse_args()
     try:
-        debug_settings()  # Add this to verify settings are loaded correctly
-        uvicorn.run(
-            "app.main:app",
-            host=settings.HOST,
-            port=settings.PORT,
-            reload=settings.RELOAD,
-            workers=settings.WORKERS,
-            log_level=settings.LOG_LEVEL.lower(),
-        )
+        # Workers of this run publish their metrics afresh; earlier runs' totals are dropped
+        from app.services.metrics import clear_shared_metrics
+        clear_shared_metrics()
+        if args.profile == "production":
+            run_production()
+        else:
+            run_development()
     except Exception as e:
         print(f"Error starting the server: {str(e)}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,87 @@
+# tests/conftest.py
+import os
+
+# Settings require an API key; no test calls the Groq API
+os.environ.setdefault("GROQ_API_KEY", "test-key")
+
+import httpx
+import pytest
+import pytest_asyncio
+from app.config import settings
+from app.main import app
+from app.services.compliance import ComplianceChecker
+from app.services.job_queue import JobQueue, JobWorkerPool
+from app.services.rate_governor import RateGovernor
+from app.services.rules_cache import RulesCache
+from app.services.scan_history import ScanHistory
+from app.services.section_store import SectionStore
+from app.services.text_analyzer import TextAnalyzer
+from benchmarks.fixtures import FakeGroq
+
+
+def html(*paragraphs: str) -> bytes:
+    body = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    return f"<html><head><title>Test page</title></head><body><article>{body}</article></body></html>".encode()
+
+
+PAGES = {
+    "https://example.com/": html(
+        "Open a bank account with us today and manage your money in one place.",
+        "Banking services provided by Partner Bank, Member FDIC."
+    ),
+    "https://example.com/clean": html("Our app helps small teams send invoices and track spending."),
+    "https://policy.example/": html(
+        "Never refer to the product as a bank account or savings account.",
+        "Every page must state that banking services are provided by partner banks."
+    )
+}
+
+
+@pytest.fixture
+def pages():
+    """
+    The sites the checker can fetch, by URL; tests may add or change pages.
+    """
+    return dict(PAGES)
+
+
+@pytest.fixture
+def fake_llm():
+    return FakeGroq(latency=0, tokens_per_second=0, description_tokens=10)
+
+
+@pytest.fixture
+def checker(tmp_path, monkeypatch, pages, fake_llm):
+    """
+    A ComplianceChecker that fetches from pages and calls the fake LLM, with every store in tmp_path.
+    """
+    async def handler(request):
+        body = pages.get(str(request.url))
+        return httpx.Response(200, content=body) if body is not None else httpx.Response(404)
+
+    monkeypatch.setattr(settings, "EXTRACTION_POOL_SIZE", 0)
+    for flag in ("ENABLE_CACHE", "ENABLE_INCREMENTAL_CHECKS", "ENABLE_SCAN_HISTORY"):
+        monkeypatch.setattr(settings, flag, False)
+    checker = ComplianceChecker(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    checker.text_analyzer = TextAnalyzer(
+        rules_cache=RulesCache(db_path=str(tmp_path / "rules.db")),
+        section_store=SectionStore(str(tmp_path / "sections.db")),
+        governor=RateGovernor(enabled=False)
+    )
+    checker.text_analyzer.client = fake_llm
+    checker.scan_history = ScanHistory(str(tmp_path / "scans.db"))
+    return checker
+
+
+@pytest_asyncio.fixture
+async def api(checker, tmp_path):
+    """
+    HTTP client for the app, with the lifespan's state replaced by the test
+    checker and a job queue whose workers are not started.
+    """
+    app.state.checker = checker
+    app.state.job_queue = JobQueue(str(tmp_path / "jobs.db"))
+    app.state.job_workers = JobWorkerPool(app.state.job_queue, checker.run_job)
+    app.state.ready = True
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
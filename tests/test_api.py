@@ -0,0 +1,80 @@
+# tests/test_api.py
+import json
+import pytest
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_check_compliance(api):
+    response = await api.post("/check-compliance", json={"webpage_url": "https://example.com/", "policy_url": "https://policy.example/"})
+    assert response.status_code == 200
+    assert any("bank account" in violation["context"].lower() for violation in response.json()["violations"])
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_a_failing_page_on_its_own_line(api):
+    response = await api.post("/check-compliance/batch", json={
+        "policy_url": "https://policy.example/",
+        "webpage_urls": ["https://example.com/", "https://example.com/missing", "https://example.com/clean"]
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    results = {result["webpage_url"]: result for result in ndjson(response)}
+    assert set(results) == {"https://example.com/", "https://example.com/missing", "https://example.com/clean"}
+    assert "404" in results["https://example.com/missing"]["error"]
+    assert results["https://example.com/"]["error"] is None and results["https://example.com/"]["violations"]
+    assert results["https://example.com/clean"]["violations"] == []
+
+
+@pytest.mark.asyncio
+async def test_batch_fails_whole_when_the_policy_cannot_be_read(api):
+    response = await api.post("/check-compliance/batch", json={
+        "policy_url": "https://policy.example/missing",
+        "webpage_urls": ["https://example.com/"]
+    })
+    assert response.status_code == 500
+
+
+@pytest.mark.asyncio
+async def test_failed_check_is_recorded_with_its_error(api):
+    response = await api.post("/check-compliance", json={"webpage_url": "https://example.com/missing", "policy_url": "https://policy.example/"})
+    assert response.status_code == 500
+    scans = (await api.get("/scans")).json()["scans"]
+    assert [(scan["webpage_url"], scan["violation_count"]) for scan in scans] == [("https://example.com/missing", 0)]
+    assert "404" in scans[0]["error"]
+
+
+@pytest.mark.asyncio
+async def test_analysis_errors_are_recorded_as_the_scan_error(api, checker, monkeypatch):
+    async def analyze_compliance(**kwargs):
+        return [
+            {"type": "prohibited_phrase", "description": "d", "context": "bank account", "severity": "high", "suggestion": "s"},
+            {"type": "analysis_error", "description": "Error during analysis: boom", "context": "", "severity": "high", "suggestion": ""}
+        ]
+
+    monkeypatch.setattr(checker.text_analyzer, "analyze_compliance", analyze_compliance)
+    response = await api.post("/check-compliance", json={"webpage_url": "https://example.com/", "policy_url": "https://policy.example/"})
+    scan = (await api.get(f"/scans/{response.json()['scan_id']}")).json()
+    assert scan["error"] == "Error during analysis: boom"
+    assert scan["violation_count"] == 1
+    assert [violation["type"] for violation in scan["violations"]] == ["prohibited_phrase"]
+
+
+@pytest.mark.asyncio
+async def test_scan_reports_answer_304_until_something_changes(api):
+    check = {"webpage_url": "https://example.com/", "policy_url": "https://policy.example/"}
+    scan_id = (await api.post("/check-compliance", json=check)).json()["scan_id"]
+
+    scan = await api.get(f"/scans/{scan_id}")
+    assert scan.status_code == 200
+    assert (await api.get(f"/scans/{scan_id}", headers={"If-None-Match": scan.headers["ETag"]})).status_code == 304
+    # The fixed per-scan ETag must not hide that a scan does not exist
+    assert (await api.get(f"/scans/{scan_id + 1}", headers={"If-None-Match": f'"scan-{scan_id + 1}"'})).status_code == 404
+
+    listing = await api.get("/scans")
+    assert (await api.get("/scans", headers={"If-None-Match": listing.headers["ETag"]})).status_code == 304
+    await api.post("/check-compliance", json=check)
+    assert (await api.get("/scans", headers={"If-None-Match": listing.headers["ETag"]})).status_code == 200
@@ -0,0 +1,49 @@
+# tests/test_chunking.py
+from app.utils.chunking import chunk_overlaps, chunk_text, estimate_tokens, split_paragraphs
+
+
+def test_estimate_tokens_rounds_up():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(None) == 0
+    assert estimate_tokens("abcde") == 2
+
+
+def test_split_paragraphs_drops_blank_lines():
+    assert split_paragraphs("  One.\n\n\nTwo.  \n ") == ["One.", "Two."]
+    assert split_paragraphs(None) == []
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("One.\nTwo.", max_tokens=100) == ["One.\nTwo."]
+    assert chunk_text("", max_tokens=100) == []
+
+
+def test_chunks_break_on_paragraphs_within_budget():
+    paragraphs = [f"Paragraph {index} " + "x" * 30 for index in range(10)]
+    chunks = chunk_text("\n".join(paragraphs), max_tokens=25)
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 25 for chunk in chunks)
+    assert [paragraph for chunk in chunks for paragraph in chunk.split("\n")] == paragraphs
+
+
+def test_overlap_repeats_trailing_paragraphs():
+    paragraphs = [f"Paragraph {index} " + "x" * 30 for index in range(6)]
+    chunks = chunk_text("\n".join(paragraphs), max_tokens=25, overlap_tokens=12)
+    for previous, following, overlap in zip(chunks, chunks[1:], chunk_overlaps(chunks)):
+        assert following.split("\n")[0] == previous.split("\n")[-1]
+        assert overlap and previous.endswith(overlap) and following.startswith(overlap)
+    assert all(estimate_tokens(chunk) <= 25 for chunk in chunks)
+
+
+def test_long_paragraph_is_split_on_sentences_then_width():
+    sentences = ["First sentence here.", "Second sentence here.", "y" * 100]
+    chunks = chunk_text(" ".join(sentences), max_tokens=10)
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert "".join(chunks).replace("\n", "") == "".join(sentences)
+
+
+def test_chunks_without_overlap_share_nothing():
+    paragraphs = [f"Paragraph {index} " + "x" * 30 for index in range(6)]
+    chunks = chunk_text("\n".join(paragraphs), max_tokens=25)
+    assert chunk_overlaps(chunks) == [""] * (len(chunks) - 1)
+    assert chunk_overlaps(chunks[:1]) == []
@@ -0,0 +1,74 @@
+# tests/test_crawler.py
+import httpx
+import pytest
+from app.config import settings
+from app.services.crawler import SiteCrawler
+from app.services.web_scraper import WebScraper
+
+
+def site_page(*links):
+    anchors = "".join(f'<a href="{link}">link</a>' for link in links)
+    return f"<html><body><article><p>Open an account with us today.</p>{anchors}</article></body></html>".encode()
+
+
+SITE = {
+    "/": site_page("/about", "/private/report", "https://www.example.com/pricing", "https://other.example/", "/brochure.pdf"),
+    "/about": site_page("/", "/team"),
+    "/pricing": site_page(),
+    "/team": site_page(),
+    "/private/report": site_page(),
+}
+
+
+def crawler_for(monkeypatch, robots="User-agent: *\nDisallow: /private/\n", robots_status=200, **options):
+    requested = []
+
+    async def handler(request):
+        requested.append(str(request.url))
+        if request.url.path == "/robots.txt":
+            return httpx.Response(robots_status, text=robots)
+        if request.url.host.endswith("example.com") and request.url.path in SITE:
+            return httpx.Response(200, content=SITE[request.url.path])
+        return httpx.Response(404)
+
+    monkeypatch.setattr(settings, "EXTRACTION_POOL_SIZE", 0)
+    scraper = WebScraper(client=httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True))
+    crawler = SiteCrawler(scraper, delay=0, **{"max_pages": 10, "per_host_concurrency": 2, **options})
+    crawler.requested = requested
+    return crawler
+
+
+async def crawled(crawler, seed="https://example.com/"):
+    return {url: error for url, _, error in [page async for page in crawler.crawl(seed)]}
+
+
+@pytest.mark.asyncio
+async def test_crawl_stays_on_the_site_and_honors_robots(monkeypatch):
+    crawler = crawler_for(monkeypatch)
+    pages = await crawled(crawler)
+    # www. is the same site; other hosts, robots-disallowed paths and documents are not crawled
+    assert sorted(pages) == [
+        "https://example.com/", "https://example.com/about", "https://example.com/team", "https://www.example.com/pricing"
+    ]
+    assert all(error is None for error in pages.values())
+    assert not any("other.example" in url or "private" in url or url.endswith(".pdf") for url in crawler.requested)
+
+
+@pytest.mark.asyncio
+async def test_crawl_stops_at_max_pages(monkeypatch):
+    crawler = crawler_for(monkeypatch, max_pages=2)
+    pages = await crawled(crawler)
+    assert len(pages) == 2 and "https://example.com/" in pages
+
+
+@pytest.mark.asyncio
+async def test_robots_server_error_keeps_the_crawler_off_the_site(monkeypatch):
+    crawler = crawler_for(monkeypatch, robots_status=503)
+    assert await crawled(crawler) == {}
+    assert all(url.endswith("/robots.txt") for url in crawler.requested)
+
+
+@pytest.mark.asyncio
+async def test_missing_robots_allows_everything(monkeypatch):
+    crawler = crawler_for(monkeypatch, robots_status=404)
+    assert "https://example.com/private/report" in await crawled(crawler)
@@ -0,0 +1,88 @@
+# tests/test_helper.py
+import asyncio
+import pytest
+from app.utils.helper import SingleFlight, ViolationMerger, merge_violations
+
+
+def violation(context, type="prohibited_phrase", rule_id=None, policy_url=None):
+    return {"type": type, "context": context, "rule_id": rule_id, "policy_url": policy_url}
+
+
+def test_merge_drops_exact_duplicates_ignoring_case_and_spacing():
+    merged = merge_violations([[violation("Open a bank account."), violation("open a  BANK account")]])
+    assert merged == [violation("Open a bank account.")]
+
+
+def test_merge_keeps_the_longer_context():
+    merged = merge_violations([[violation("bank account"), violation("Open a bank account today")]])
+    assert merged == [violation("Open a bank account today")]
+
+
+def test_overlapping_chunks_reporting_one_passage_merge():
+    overlaps = ["", "Open a bank account today."]
+    merged = merge_violations([
+        [],
+        [violation("bank account")],
+        [violation("Open a bank account today")]
+    ], overlaps)
+    assert merged == [violation("Open a bank account today")]
+
+
+def test_separate_occurrences_of_one_quote_stay_apart():
+    # Same quote in two chunks, but not in the text they share
+    merged = merge_violations([[violation("bank account")], [violation("bank account")]], ["Unrelated shared paragraph."])
+    assert len(merged) == 2
+    # Chunks that are not adjacent never share text
+    merged = merge_violations([[violation("bank account")], [], [violation("bank account")]], ["bank account", "bank account"])
+    assert len(merged) == 2
+
+
+def test_page_wide_findings_merge_across_chunks():
+    merged = merge_violations([[violation("", type="missing_disclaimer")], [], [violation("", type="missing_disclaimer")]])
+    assert merged == [violation("", type="missing_disclaimer")]
+
+
+def test_different_types_stay_separate():
+    merged = merge_violations([[violation("bank account"), violation("bank account", type="misleading_claim")]])
+    assert len(merged) == 2
+
+
+def test_different_rules_of_the_same_type_stay_separate():
+    merger = ViolationMerger()
+    assert merger.add(violation("bank account", rule_id="R1"))
+    assert merger.add(violation("bank account", rule_id="R2"))
+    assert not merger.add(violation("Open a bank account", rule_id="R2"))
+    assert [(item["rule_id"], item["context"]) for item in merger.violations] == [("R1", "bank account"), ("R2", "Open a bank account")]
+
+
+def test_rule_ids_win_over_types():
+    merger = ViolationMerger()
+    assert merger.add(violation("bank account", type="terminology", rule_id="R1"))
+    assert not merger.add(violation("bank account", type="prohibited_phrase", rule_id="R1"))
+
+
+def test_type_is_compared_when_a_rule_id_is_missing():
+    merger = ViolationMerger()
+    assert merger.add(violation("bank account", rule_id="R1"))
+    assert not merger.add(violation("bank account"))
+    assert merger.add(violation("bank account", type="misleading_claim"))
+
+
+def test_different_policies_stay_separate():
+    merged = merge_violations([[violation("bank account", policy_url="a"), violation("bank account", policy_url="b")]])
+    assert len(merged) == 2
+
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_one_call():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    flight = SingleFlight()
+    assert await asyncio.gather(flight.do("key", work), flight.do("key", work)) == [1, 1]
+    assert await flight.do("key", work) == 2
@@ -0,0 +1,168 @@
+# tests/test_incremental.py
+import sqlite3
+import pytest
+from app.services.section_store import SectionStore
+from app.services.text_analyzer import PAGE_SECTION
+
+URL = "https://example.com/"
+POLICIES = {"https://policy.example/": {"clean_text": "Never call the product a bank account. Every page needs the partner bank disclaimer."}}
+DISCLAIMER = "Banking services are provided by our partner bank."
+FILLER = [f"Paragraph {index} explains how teams send invoices, approve bills and review monthly spending." for index in range(30)]
+
+
+@pytest.fixture
+def analyzer(checker, fake_llm):
+    """
+    The checker's analyzer, with the fake LLM recording every user prompt.
+    """
+    prompts = []
+    respond = fake_llm.respond
+
+    def recording(system_prompt, user_prompt):
+        prompts.append(user_prompt)
+        return respond(system_prompt, user_prompt)
+
+    fake_llm.respond = recording
+    checker.text_analyzer.prompts = prompts
+    return checker.text_analyzer
+
+
+def page(*paragraphs):
+    return {"clean_text": "\n".join(paragraphs)}
+
+
+async def measured(fake_llm, check):
+    """
+    Runs check() and returns its result with the LLM calls and prompt tokens it cost.
+    """
+    calls, tokens = fake_llm.calls, fake_llm.prompt_tokens
+    result = await check()
+    return result, fake_llm.calls - calls, fake_llm.prompt_tokens - tokens
+
+
+def contexts(violations):
+    return sorted(violation["context"] for violation in violations)
+
+
+@pytest.mark.asyncio
+async def test_first_check_costs_what_a_full_check_costs(analyzer, fake_llm):
+    content = page("Open a bank account in minutes.", *FILLER, DISCLAIMER)
+    await analyzer.extract_policy_rules(POLICIES)
+
+    full, full_calls, full_tokens = await measured(fake_llm, lambda: analyzer.analyze_compliance(content, POLICIES))
+    first, first_calls, first_tokens = await measured(fake_llm, lambda: analyzer.analyze_compliance(content, POLICIES, webpage_url=URL))
+    assert contexts(first) == contexts(full) == ["Open a bank account in minutes."]
+    assert (first_calls, first_tokens) == (full_calls, full_tokens)
+
+
+@pytest.mark.asyncio
+async def test_added_paragraph_sends_only_that_paragraph(analyzer, fake_llm):
+    paragraphs = ["Open a bank account in minutes.", *FILLER, DISCLAIMER]
+    await analyzer.extract_policy_rules(POLICIES)
+    _, first_calls, first_tokens = await measured(fake_llm, lambda: analyzer.analyze_compliance(page(*paragraphs), POLICIES, webpage_url=URL))
+
+    _, calls, tokens = await measured(fake_llm, lambda: analyzer.analyze_compliance(page(*paragraphs), POLICIES, webpage_url=URL))
+    assert (calls, tokens) == (0, 0)
+
+    analyzer.prompts.clear()
+    paragraphs.insert(5, "Move money into your savings account.")
+    violations, calls, tokens = await measured(fake_llm, lambda: analyzer.analyze_compliance(page(*paragraphs), POLICIES, webpage_url=URL))
+    assert contexts(violations) == ["Move money into your savings account.", "Open a bank account in minutes."]
+    # One triage and one analysis call over the new paragraph, with the universal rules included
+    assert calls == first_calls == 2
+    # What remains is the prompt template and rules
+    assert tokens < first_tokens / 2
+    assert all(FILLER[0] not in prompt for prompt in analyzer.prompts)
+    assert "[R4]" in analyzer.prompts[-1] and "excerpt" in analyzer.prompts[-1]
+
+
+@pytest.mark.asyncio
+async def test_removing_a_rules_evidence_rechecks_only_that_rule(analyzer, fake_llm):
+    await analyzer.extract_policy_rules(POLICIES)
+    await analyzer.analyze_compliance(page("Open a bank account in minutes.", *FILLER[:3], DISCLAIMER), POLICIES, webpage_url=URL)
+
+    # A removed paragraph that mentions no universal rule's keywords costs nothing
+    analyzer.prompts.clear()
+    violations = await analyzer.analyze_compliance(page("Open a bank account in minutes.", *FILLER[:2], DISCLAIMER), POLICIES, webpage_url=URL)
+    assert contexts(violations) == ["Open a bank account in minutes."]
+    assert analyzer.prompts == []
+
+    # Removing the disclaimer re-checks the disclaimer rule, alone, against the whole page
+    violations = await analyzer.analyze_compliance(page("Open a bank account in minutes.", *FILLER[:2]), POLICIES, webpage_url=URL)
+    assert contexts(violations) == ["Open a bank account in minutes."]
+    analysis = [prompt for prompt in analyzer.prompts if "WEBPAGE CONTENT TO ANALYZE" in prompt]
+    assert len(analysis) == 1
+    assert "[R4]" in analysis[0] and "[R1]" not in analysis[0] and FILLER[1] in analysis[0]
+
+
+@pytest.mark.asyncio
+async def test_violated_universal_rule_is_rechecked_on_the_whole_page(analyzer, fake_llm):
+    await analyzer.extract_policy_rules(POLICIES)
+    # The fake model cites the universal disclosure rule [R4] for "FDIC"
+    paragraphs = ["Your money is FDIC insured.", *FILLER[:3], DISCLAIMER]
+    first = await analyzer.analyze_compliance(page(*paragraphs), POLICIES, webpage_url=URL)
+    assert [violation["rule_id"] for violation in first] == ["R4"]
+    stored = await analyzer.section_store.load(URL, analyzer._section_store_key(POLICIES))
+    assert [violation["rule_id"] for violation in stored[PAGE_SECTION]["violations"]] == ["R4"]
+
+    # A new paragraph that does not mention the rule leaves its violation as it was
+    analyzer.prompts.clear()
+    paragraphs.append("Open a bank account in minutes.")
+    violations = await analyzer.analyze_compliance(page(*paragraphs), POLICIES, webpage_url=URL)
+    assert contexts(violations) == ["Open a bank account in minutes.", "Your money is FDIC insured."]
+    analysis = [prompt for prompt in analyzer.prompts if "WEBPAGE CONTENT TO ANALYZE" in prompt]
+    assert len(analysis) == 1 and "excerpt" in analysis[0] and "Your money is FDIC insured." not in analysis[0]
+
+    # One that mentions it could fix the violation, so the rule is re-checked against the whole page
+    analyzer.prompts.clear()
+    paragraphs.append("Your partner bank holds every balance.")
+    violations = await analyzer.analyze_compliance(page(*paragraphs), POLICIES, webpage_url=URL)
+    assert contexts(violations) == ["Open a bank account in minutes.", "Your money is FDIC insured."]
+    analysis = [prompt for prompt in analyzer.prompts if "WEBPAGE CONTENT TO ANALYZE" in prompt]
+    page_prompt, = [prompt for prompt in analysis if "excerpt" not in prompt]
+    assert "[R4]" in page_prompt and "[R1]" not in page_prompt and "Your money is FDIC insured." in page_prompt
+
+    # Removing the quoted paragraph re-checks the rule too, which drops the violation
+    violations = await analyzer.analyze_compliance(page(*paragraphs[1:]), POLICIES, webpage_url=URL)
+    assert contexts(violations) == ["Open a bank account in minutes."]
+
+
+@pytest.mark.asyncio
+async def test_edited_paragraph_drops_its_old_violations(analyzer):
+    await analyzer.extract_policy_rules(POLICIES)
+    await analyzer.analyze_compliance(page("Open a bank account in minutes.", *FILLER[:3]), POLICIES, webpage_url=URL)
+    violations = await analyzer.analyze_compliance(page("Open an account in minutes.", *FILLER[:3]), POLICIES, webpage_url=URL)
+    assert violations == []
+
+
+@pytest.mark.asyncio
+async def test_section_store_key_covers_analysis_settings(analyzer, monkeypatch):
+    key = analyzer._section_store_key(POLICIES)
+    monkeypatch.setattr(analyzer, "triage_model", None)
+    assert analyzer._section_store_key(POLICIES) != key
+    monkeypatch.setattr(analyzer, "analysis_model", "other-model")
+    assert analyzer._section_store_key(POLICIES) != key
+
+
+@pytest.mark.asyncio
+async def test_section_store_replaces_a_page(tmp_path):
+    store = SectionStore(str(tmp_path / "sections.db"))
+    assert await store.load(URL, "policy") is None
+    await store.save(URL, "policy", {"h1": {"violations": [{"type": "x"}], "evidence": ["R4"]}, "h2": {"violations": [], "evidence": []}})
+    await store.save(URL, "policy", {"h2": {"violations": [], "evidence": ["R4"]}, "h3": {"violations": []}})
+    assert await store.load(URL, "policy") == {"h2": {"violations": [], "evidence": ["R4"]}, "h3": {"violations": [], "evidence": []}}
+    assert await store.load(URL, "other") is None
+
+
+def test_section_store_migrates_files_without_evidence(tmp_path):
+    db_path = str(tmp_path / "sections.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE page_sections (webpage_url TEXT NOT NULL, policy_hash TEXT NOT NULL, section_hash TEXT NOT NULL, "
+        "violations TEXT NOT NULL, checked_at REAL NOT NULL, PRIMARY KEY (webpage_url, policy_hash, section_hash))"
+    )
+    conn.close()
+    SectionStore(db_path)
+    conn = sqlite3.connect(db_path)
+    assert "evidence" in [column[1] for column in conn.execute("PRAGMA table_info(page_sections)")]
+    conn.close()
@@ -0,0 +1,141 @@
+# tests/test_job_queue.py
+import asyncio
+import sqlite3
+import pytest
+from app.main import app
+from app.services.job_queue import JobQueue, JobWorkerPool, QueueFullError
+
+
+@pytest.mark.asyncio
+async def test_job_queue_runs_jobs_in_order(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), max_size=2)
+    first = await queue.submit({"n": 1})
+    await queue.submit({"n": 2})
+    with pytest.raises(QueueFullError):
+        await queue.submit({"n": 3})
+
+    job_id, request, lease = await queue.claim()
+    assert (job_id, request) == (first, {"n": 1})
+    assert await queue.complete(job_id, lease, {"ok": True})
+    job = await queue.get(job_id)
+    assert (job["status"], job["result"], job["attempts"]) == ("completed", {"ok": True}, 1)
+    assert await queue.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_job_queue_stale_lease_cannot_finish_the_job(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease_seconds=-1)
+    job_id = await queue.submit({})
+    _, _, stale = await queue.claim()
+    # The lease has already run out, so another worker takes the job over
+    _, _, current = await queue.claim()
+
+    assert not await queue.renew(job_id, stale)
+    assert not await queue.complete(job_id, stale, {"stale": True})
+    assert await queue.fail(job_id, current, "boom")
+    assert not await queue.complete(job_id, current, {})
+    job = await queue.get(job_id)
+    assert (job["status"], job["error"], job["result"]) == ("failed", "boom", None)
+
+
+@pytest.mark.asyncio
+async def test_job_queue_abandons_after_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), lease_seconds=-1, max_attempts=2)
+    job_id = await queue.submit({})
+    assert (await queue.claim())[0] == job_id
+    assert (await queue.claim())[0] == job_id
+    assert await queue.claim() is None
+    job = await queue.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"].startswith("Abandoned after 2 attempts")
+
+
+def test_job_queue_migrates_files_without_leases(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, request TEXT NOT NULL, "
+        "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+        "created_at REAL NOT NULL, started_at REAL, finished_at REAL, lease_expires_at REAL)"
+    )
+    conn.close()
+    JobQueue(db_path)
+    conn = sqlite3.connect(db_path)
+    assert "lease" in [column[1] for column in conn.execute("PRAGMA table_info(jobs)")]
+    conn.close()
+
+
+class LockedQueue(JobQueue):
+    """
+    Queue whose first complete() and renew() calls fail as a busy database would.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.locked = {"complete": 1, "renew": 1}
+
+    def _locked(self, operation):
+        if self.locked[operation]:
+            self.locked[operation] -= 1
+            raise sqlite3.OperationalError("database is locked")
+
+    async def complete(self, job_id, lease, result):
+        self._locked("complete")
+        return await super().complete(job_id, lease, result)
+
+    async def renew(self, job_id, lease):
+        self._locked("renew")
+        return await super().renew(job_id, lease)
+
+
+async def wait_for_status(queue, job_id, status, timeout=5.0):
+    async def poll():
+        while (await queue.get(job_id))["status"] != status:
+            await asyncio.sleep(0.02)
+    await asyncio.wait_for(poll(), timeout)
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_a_failing_complete(tmp_path):
+    queue = LockedQueue(str(tmp_path / "jobs.db"))
+    workers = JobWorkerPool(queue, lambda request: asyncio.sleep(0, result={"n": request["n"]}), workers=1, poll_interval=0.05)
+    first = await queue.submit({"n": 1})
+    second = await queue.submit({"n": 2})
+    workers.start()
+    try:
+        await wait_for_status(queue, second, "completed")
+        assert workers.running
+        # The first job's outcome was lost, so it stays leased until the lease runs out
+        assert (await queue.get(first))["status"] == "running"
+    finally:
+        await workers.stop()
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_survives_a_failing_renewal(tmp_path):
+    # Beats every 0.2s; without the renewals after the failed one the lease ends
+    # before the handler does and the idle worker runs the job a second time
+    queue = LockedQueue(str(tmp_path / "jobs.db"), lease_seconds=0.6)
+    queue.locked["complete"] = 0
+    workers = JobWorkerPool(queue, lambda request: asyncio.sleep(0.7, result={}), workers=2, poll_interval=0.05)
+    job_id = await queue.submit({})
+    workers.start()
+    try:
+        await wait_for_status(queue, job_id, "completed")
+        assert (await queue.get(job_id))["attempts"] == 1
+    finally:
+        await workers.stop()
+
+
+@pytest.mark.asyncio
+async def test_submit_returns_429_when_the_queue_is_full(api, monkeypatch):
+    monkeypatch.setattr(app.state.job_queue, "max_size", 1)
+    body = {"webpage_url": "https://example.com/", "policy_url": "https://policy.example/"}
+    accepted = await api.post("/jobs", json=body)
+    assert accepted.status_code == 202
+    job = await api.get(f"/jobs/{accepted.json()['job_id']}")
+    assert job.json()["status"] == "queued"
+
+    refused = await api.post("/jobs", json=body)
+    assert refused.status_code == 429
+    assert refused.headers["Retry-After"] == "30"
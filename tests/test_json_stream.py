@@ -0,0 +1,64 @@
+# tests/test_json_stream.py
+from app.utils.json_stream import JSONObjectStream
+
+
+def test_objects_in_wrapped_array():
+    scanner = JSONObjectStream()
+    objects = scanner.feed('{"violations": [{"type": "a"}, {"type": "b"}]}')
+    assert objects == [{"type": "a"}, {"type": "b"}]
+    assert scanner.started and not scanner.unfinished and not scanner.malformed
+
+
+def test_bare_array_with_prose_around_it():
+    scanner = JSONObjectStream()
+    assert scanner.feed('Here you go: [{"type": "a"}] Hope that helps.') == [{"type": "a"}]
+
+
+def test_objects_complete_across_fragments():
+    scanner = JSONObjectStream()
+    text = '{"violations": [{"type": "a", "context": "x"}, {"type": "b"}]}'
+    objects = []
+    for index, char in enumerate(text):
+        completed = scanner.feed(char)
+        if completed:
+            objects.append((index, completed))
+    # The first object is returned as soon as its brace closes, not at the end
+    assert objects[0] == (text.index("}"), [{"type": "a", "context": "x"}])
+    assert [obj for _, completed in objects for obj in completed] == [{"type": "a", "context": "x"}, {"type": "b"}]
+
+
+def test_braces_and_quotes_inside_strings():
+    scanner = JSONObjectStream()
+    objects = scanner.feed(r'[{"context": "a } b ] c { \"quoted\" \\"}]')
+    assert objects == [{"context": 'a } b ] c { "quoted" \\'}]
+
+
+def test_nested_objects_are_kept_whole():
+    scanner = JSONObjectStream()
+    assert scanner.feed('[{"type": "a", "meta": {"k": [1, {"n": 2}]}}]') == [{"type": "a", "meta": {"k": [1, {"n": 2}]}}]
+
+
+def test_cut_off_response_is_unfinished():
+    scanner = JSONObjectStream()
+    objects = scanner.feed('{"violations": [{"type": "a"}, {"type": "b", "desc')
+    assert objects == [{"type": "a"}]
+    assert scanner.unfinished
+    assert scanner.pending == '{"type": "b", "desc'
+
+
+def test_object_cut_off_before_its_array_is_unfinished():
+    scanner = JSONObjectStream()
+    assert scanner.feed('{"violat') == []
+    assert scanner.started and scanner.unfinished
+
+
+def test_malformed_object_is_counted_and_skipped():
+    scanner = JSONObjectStream()
+    assert scanner.feed('[{"type": "a",}, {"type": "b"}]') == [{"type": "b"}]
+    assert scanner.malformed == 1
+
+
+def test_prose_only_never_starts():
+    scanner = JSONObjectStream()
+    assert scanner.feed("No violations were found on this page.") == []
+    assert not scanner.started and not scanner.unfinished
@@ -0,0 +1,41 @@
+# tests/test_metrics.py
+from app.config import settings
+from app.services import metrics
+from app.services.metrics import Counter, Histogram, MetricsStore
+
+
+def test_store_sums_processes(tmp_path):
+    store = MetricsStore(str(tmp_path / "metrics.db"))
+    counter = Counter("calls_total", "Calls.", ("model",))
+    histogram = Histogram("stage_seconds", "Stage time.", ("stage",), buckets=(1.0,))
+    counter.inc(model="a")
+    histogram.observe(0.5, stage="fetch")
+    store.publish("worker-1", {counter.name: counter.snapshot(), histogram.name: histogram.snapshot()})
+    counter.inc(2, model="a")
+    counter.inc(model="b")
+    histogram.observe(2.0, stage="fetch")
+    # Publishing again replaces the process's row instead of adding to it
+    store.publish("worker-1", {counter.name: counter.snapshot(), histogram.name: histogram.snapshot()})
+    store.publish("worker-2", {counter.name: {("a",): 4.0}, histogram.name: {("fetch",): [1.0, 1.0, 0.25]}})
+
+    totals = store.collect()
+    assert totals[counter.name] == {("a",): 7.0, ("b",): 1.0}
+    # Bucket counts, +Inf count and sum add up
+    assert totals[histogram.name] == {("fetch",): [2.0, 3.0, 2.75]}
+    assert 'calls_total{model="a"} 7' in counter.render(totals[counter.name])
+
+    store.clear()
+    assert store.collect() == {}
+
+
+def test_render_includes_other_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_DB_PATH", str(tmp_path / "metrics.db"))
+    own = metrics.RULES_CACHE.value(result="hit")
+    metrics.MetricsStore(settings.METRICS_DB_PATH).publish("other-worker", {metrics.RULES_CACHE.name: {("hit",): 5.0}})
+    assert f'compliance_rules_cache_requests_total{{result="hit"}} {own + 5:g}' in metrics.render_metrics()
+
+
+def test_render_without_a_store_is_per_process(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_DB_PATH", "")
+    metrics.RULES_CACHE.inc(result="miss")
+    assert f'compliance_rules_cache_requests_total{{result="miss"}} {metrics.RULES_CACHE.value(result="miss"):g}' in metrics.render_metrics()
@@ -0,0 +1,126 @@
+# tests/test_rate_governor.py
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from types import SimpleNamespace
+import httpx
+import pytest
+from app.services import rate_governor
+from app.services.rate_governor import RateGovernor, RateLimitExceeded, _retry_after
+
+
+class ProviderError(Exception):
+    def __init__(self, status_code=429, **headers):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=httpx.Headers(headers))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Fake clock for the governor: sleeping advances it at once and is recorded.
+    """
+    clock = SimpleNamespace(now=1000.0, sleeps=[])
+    clock.monotonic = lambda: clock.now
+    clock.time = lambda: clock.now
+
+    async def sleep(seconds):
+        clock.sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(rate_governor, "time", clock)
+    monkeypatch.setattr(rate_governor, "asyncio", SimpleNamespace(Lock=asyncio.Lock, sleep=sleep))
+    return clock
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after": "7"}, 7.0),
+    ({"retry-after": "-3"}, 0.0),
+    ({"retry-after-ms": "1500", "retry-after": "7"}, 1.5),
+    ({"retry-after": "soon"}, None),
+    ({}, None),
+])
+def test_retry_after_seconds_and_milliseconds(headers, expected):
+    assert _retry_after(ProviderError(**headers)) == expected
+
+
+def test_retry_after_http_date():
+    when = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert _retry_after(ProviderError(**{"retry-after": format_datetime(when, usegmt=True)})) == pytest.approx(30, abs=2)
+    assert _retry_after(ValueError("no response")) is None
+
+
+@pytest.mark.asyncio
+async def test_request_budget_waits_for_the_window(clock):
+    governor = RateGovernor(requests_per_minute=2, tokens_per_minute=10_000, enabled=True)
+    for _ in range(3):
+        await governor.acquire(10)
+    assert clock.sleeps == [60.0]
+
+
+@pytest.mark.asyncio
+async def test_token_budget_waits_for_the_window_but_admits_an_oversized_call(clock):
+    governor = RateGovernor(requests_per_minute=100, tokens_per_minute=100, enabled=True)
+    await governor.acquire(60)
+    clock.now += 10
+    await governor.acquire(60)
+    assert clock.sleeps == [50.0]
+    # Once the window is empty, a call over the whole budget still goes through
+    clock.now += 60
+    await governor.acquire(500)
+    assert clock.sleeps == [50.0]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_exceeded_after_max_retries(clock):
+    attempts = []
+
+    async def request():
+        attempts.append(clock.now)
+        raise ProviderError(**{"retry-after": "2"})
+
+    governor = RateGovernor(max_retries=2, enabled=False)
+    with pytest.raises(RateLimitExceeded) as raised:
+        await governor.call(request, 10)
+    assert len(attempts) == 3
+    assert raised.value.retry_after == 2.0
+    # Each retry waited the provider's Retry-After plus up to 20% jitter
+    assert all(2.0 <= wait <= 2.4 for wait in clock.sleeps) and len(clock.sleeps) == 2
+
+
+@pytest.mark.asyncio
+async def test_other_errors_are_not_retried(clock):
+    async def request():
+        raise ProviderError(status_code=400)
+
+    with pytest.raises(ProviderError):
+        await RateGovernor(max_retries=3, enabled=False).call(request, 10)
+    assert clock.sleeps == []
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_pauses_every_caller():
+    governor = RateGovernor(max_retries=1, enabled=False)
+    limited = asyncio.Event()
+    times = {}
+
+    async def first():
+        if "limited" not in times:
+            times["limited"] = time.monotonic()
+            limited.set()
+            raise ProviderError(**{"retry-after": "0.2"})
+        return "first"
+
+    async def second():
+        times["second"] = time.monotonic()
+        return "second"
+
+    async def after_limit():
+        await limited.wait()
+        return await governor.call(second, 10)
+
+    assert await asyncio.gather(governor.call(first, 10), after_limit()) == ["first", "second"]
+    # The second caller was never limited itself, but waited out the shared pause
+    assert times["second"] - times["limited"] >= 0.2
@@ -0,0 +1,60 @@
+# tests/test_rule_engine.py
+import json
+import pytest
+from app.services.rule_engine import RuleEngine
+
+RULES = {
+    "treasury_terms": ["deposit account", "FDIC"],
+    "prohibited_phrases": ["bank account", "savings account"],
+    "disclaimer_required": True,
+    "disclaimer_text": "Banking services provided by Partner Bank"
+}
+
+
+def test_prohibited_phrases_with_offsets():
+    text = "Open a Bank  Account today. Our savings account is great."
+    violations = RuleEngine(RULES).scan(text)
+    prohibited = [violation for violation in violations if violation.type == "prohibited_phrase"]
+    assert [text[violation.start:violation.end] for violation in prohibited] == ["Bank  Account", "savings account"]
+    assert prohibited[0].context == "Open a Bank  Account today."
+
+
+def test_word_boundaries():
+    violations = RuleEngine(RULES).scan("Our FDICinsured bankaccount")
+    assert [violation.type for violation in violations] == ["missing_disclaimer"]
+
+
+def test_treasury_terms_need_the_disclaimer():
+    violations = RuleEngine(RULES).scan("Your deposit account is FDIC insured.")
+    assert [violation.type for violation in violations] == ["treasury_term", "treasury_term", "missing_disclaimer"]
+
+
+def test_disclaimer_allows_treasury_terms():
+    text = "Your deposit account is FDIC insured. Banking services provided by Partner Bank."
+    assert RuleEngine(RULES).scan(text) == []
+
+
+def test_no_rules():
+    assert RuleEngine({}).scan("Open a bank account") == []
+
+
+def sse_events(text):
+    events = []
+    for message in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in message.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["fast", "llm", "hybrid"])
+async def test_stream_done_counts_every_violation_sent(api, mode):
+    response = await api.post("/check-compliance/stream", json={
+        "webpage_url": "https://example.com/", "policy_url": "https://policy.example/", "mode": mode
+    })
+    events = sse_events(response.text)
+    sent = [data for event, data in events if event == "violation"]
+    assert events[-1] == ("done", {"violation_count": len(sent)})
+    assert sent
+    if mode == "hybrid":
+        assert {violation.get("start") is not None for violation in sent} == {True, False}
@@ -0,0 +1,62 @@
+# tests/test_rule_index.py
+from app.services.rule_index import RuleIndex, format_rules, tokenize
+
+
+def rule(id, requirement, policy_url="https://policy.example/a", universal=False, keywords=()):
+    return {
+        "id": id,
+        "category": "general",
+        "requirement": requirement,
+        "keywords": list(keywords),
+        "examples": "",
+        "universal": universal,
+        "policy_url": policy_url
+    }
+
+
+RULES = [
+    rule("R1", "Do not call the product a bank account", keywords=["bank account"]),
+    rule("R2", "Do not guarantee investment returns", keywords=["guarantee", "returns"]),
+    rule("R3", "Do not promise interest rates", keywords=["interest rate"]),
+    rule("R4", "Every page must carry the partner bank disclaimer", universal=True)
+]
+
+
+def test_tokenize_stems_and_pairs():
+    guaranteed, guarantees, pair = tokenize("Guaranteed guarantees")
+    assert guaranteed == guarantees and pair == f"{guaranteed} {guarantees}"
+    assert tokenize("the bank account") == ["bank", "account", "bank account"]
+
+
+def test_select_keeps_universal_and_best_matches():
+    index = RuleIndex(RULES)
+    selected = [selected_rule["id"] for selected_rule in index.select("We guarantee high returns", top_k=1)]
+    assert selected == ["R2", "R4"]
+
+
+def test_select_returns_everything_within_top_k():
+    assert RuleIndex(RULES).select("anything", top_k=3) == RULES
+    assert RuleIndex(RULES).select("anything", top_k=0) == RULES
+
+
+def test_select_takes_top_k_per_policy():
+    other = [rule(f"P{number}", f"Second policy requirement {number}", policy_url="https://policy.example/b") for number in range(3)]
+    selected = RuleIndex(RULES + other).select("bank account", top_k=1)
+    assert [selected_rule["policy_url"] for selected_rule in selected].count("https://policy.example/b") == 1
+    assert selected[0]["id"] == "R1"
+
+
+def test_attribute_fills_the_policy_of_the_cited_rule():
+    other = rule("P1", "Second policy requirement", policy_url="https://policy.example/b")
+    index = RuleIndex(RULES + [other])
+    assert index.attribute({"type": "x", "rule_id": "[P1]"}) == {"type": "x", "rule_id": "P1", "policy_url": "https://policy.example/b"}
+    # An unknown rule cannot be attributed when several policies are indexed
+    assert index.attribute({"type": "x", "rule_id": "R99"}) == {"type": "x", "rule_id": None, "policy_url": None}
+
+
+def test_attribute_single_policy():
+    assert RuleIndex(RULES).attribute({"type": "x"})["policy_url"] == "https://policy.example/a"
+
+
+def test_format_rules():
+    assert format_rules(RULES[:1]) == "[R1] (general) Do not call the product a bank account"
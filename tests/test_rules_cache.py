@@ -0,0 +1,76 @@
+# tests/test_rules_cache.py
+import sqlite3
+import time
+import pytest
+from app.services.rules_cache import RulesCache
+from app.services.section_store import SectionStore
+from app.services.text_analyzer import TextAnalyzer
+from app.utils.helper import content_hash
+
+
+def test_content_hash_separates_parts():
+    assert content_hash("ab", "c") != content_hash("a", "bc")
+    assert content_hash("a") == content_hash("a")
+
+
+@pytest.mark.asyncio
+async def test_rules_cache_survives_restart(tmp_path):
+    db_path = str(tmp_path / "rules.db")
+    await RulesCache(db_path=db_path).set("policy", [{"id": "R1"}])
+    assert await RulesCache(db_path=db_path).get("policy") == [{"id": "R1"}]
+    assert await RulesCache(db_path=db_path).get("other") is None
+
+
+@pytest.mark.asyncio
+async def test_rules_cache_memory_is_lru(tmp_path):
+    cache = RulesCache(max_entries=2, db_path=None)
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1
+    await cache.set("c", 3)
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1
+
+
+@pytest.mark.asyncio
+async def test_rules_cache_expires(tmp_path):
+    cache = RulesCache(ttl=60, db_path=str(tmp_path / "rules.db"))
+    await cache.set("policy", [])
+    cache._memory["policy"] = (time.time() - 120, [])
+    conn = sqlite3.connect(cache.db_path)
+    with conn:
+        conn.execute("UPDATE rules_cache SET created_at = ?", (time.time() - 120,))
+    conn.close()
+    assert await cache.get("policy") is None
+
+
+@pytest.mark.asyncio
+async def test_rules_cache_preload_newest(tmp_path):
+    db_path = str(tmp_path / "rules.db")
+    writer = RulesCache(db_path=db_path)
+    for key in ("a", "b", "c"):
+        await writer.set(key, key.upper())
+        time.sleep(0.01)
+
+    cache = RulesCache(db_path=db_path)
+    assert await cache.preload(limit=2) == 2
+    assert list(cache._memory) == ["b", "c"]
+    assert await RulesCache(db_path=None).preload() == 0
+
+
+@pytest.mark.asyncio
+async def test_rules_are_extracted_once_per_policy_content(tmp_path, monkeypatch):
+    calls = []
+
+    async def complete(*args, **kwargs):
+        calls.append(args)
+        return '{"rules": [{"category": "terminology", "requirement": "Do not call the product a bank account"}]}'
+
+    analyzer = TextAnalyzer(rules_cache=RulesCache(db_path=str(tmp_path / "rules.db")), section_store=SectionStore(str(tmp_path / "sections.db")))
+    monkeypatch.setattr(analyzer, "_complete", complete)
+    policy = {"clean_text": "Never call the product a bank account."}
+    first = await analyzer.extract_rules(policy)
+    assert await analyzer.extract_rules(dict(policy)) == first
+    assert len(calls) == 1
+    await analyzer.extract_rules({"clean_text": "Never promise returns."})
+    assert len(calls) == 2
@@ -0,0 +1,67 @@
+# tests/test_scan_history.py
+import time
+import pytest
+from app.services.scan_history import ScanHistory
+
+
+@pytest.mark.asyncio
+async def test_scan_history_records_and_reads_back(tmp_path):
+    history = ScanHistory(str(tmp_path / "scans.db"))
+    assert await history.version() == 0
+    scan_id = await history.record(
+        "https://example.com", ["https://policy.example/a", "https://policy.example/b"], "hash", "llm", "check",
+        [{"type": "prohibited_phrase", "severity": "high", "rule_id": "R1", "context": "bank account", "extra": "dropped"}, "not a dict"]
+    )
+    assert await history.version() == scan_id
+
+    scan = await history.get_scan(scan_id)
+    assert scan["policy_urls"] == ["https://policy.example/a", "https://policy.example/b"]
+    assert scan["violation_count"] == 1
+    assert scan["violations"][0]["rule_id"] == "R1"
+    assert "extra" not in scan["violations"][0]
+    assert await history.get_scan(scan_id + 1) is None
+
+
+@pytest.mark.asyncio
+async def test_scan_history_pages_newest_first(tmp_path):
+    history = ScanHistory(str(tmp_path / "scans.db"))
+    ids = [
+        await history.record(f"https://example.com/{number}", ["https://policy.example/a"], "hash", "llm", "check",
+                             [{"type": "misleading_claim", "severity": "HIGH" if number % 2 else "low"}] if number % 3 else [])
+        for number in range(7)
+    ]
+
+    seen, cursor = [], None
+    while True:
+        scans, cursor = await history.list_scans(cursor=cursor, limit=3)
+        seen.extend(scan["id"] for scan in scans)
+        if cursor is None:
+            break
+    assert seen == ids[::-1]
+
+    clean, _ = await history.list_scans(has_violations=False)
+    assert [scan["id"] for scan in clean] == [ids[6], ids[3], ids[0]]
+    by_page, _ = await history.list_scans(webpage_url="https://example.com/4", policy_url="https://policy.example/a")
+    assert [scan["id"] for scan in by_page] == [ids[4]]
+    assert (await history.list_scans(policy_url="https://policy.example/b"))[0] == []
+
+
+@pytest.mark.asyncio
+async def test_scan_history_violation_reports(tmp_path):
+    history = ScanHistory(str(tmp_path / "scans.db"))
+    for number in range(5):
+        await history.record("https://example.com", [], None, "fast", "check", [
+            {"type": "prohibited_phrase", "severity": "high", "context": f"phrase {number}"},
+            {"type": "missing_disclaimer", "severity": "High", "context": ""}
+        ])
+
+    # Severities are matched case-insensitively
+    high, cursor = await history.list_violations(severity="HIGH", limit=4)
+    assert len(high) == 4 and cursor == high[-1]["id"]
+    rest, cursor = await history.list_violations(severity="high", cursor=cursor, limit=10)
+    assert len(rest) == 6 and cursor is None
+
+    phrases, _ = await history.list_violations(violation_type="prohibited_phrase")
+    assert [violation["context"] for violation in phrases] == [f"phrase {number}" for number in reversed(range(5))]
+    assert phrases[0]["webpage_url"] == "https://example.com"
+    assert (await history.list_violations(since=time.time() + 60))[0] == []
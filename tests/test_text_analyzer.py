@@ -0,0 +1,244 @@
+# tests/test_text_analyzer.py
+import asyncio
+import json
+from types import SimpleNamespace
+import httpx
+import pytest
+from groq import BadRequestError
+from app.config import settings
+from app.services.rate_governor import RateGovernor
+from app.services.rule_index import RuleIndex
+from app.services.rules_cache import RulesCache
+from app.services.section_store import SectionStore
+from app.services.text_analyzer import TextAnalyzer
+
+POLICIES = {"https://policy.example/a": {"clean_text": "Do not call the product a bank account."}}
+
+RULES = [
+    {"id": "R1", "category": "terminology", "requirement": "Do not say bank account", "keywords": [], "examples": "", "universal": False},
+    {"id": "R2", "category": "disclosure", "requirement": "Carry the partner bank disclaimer", "keywords": [], "examples": "", "universal": True}
+]
+
+
+def violation_json(context, type="prohibited_phrase"):
+    return json.dumps({"type": type, "description": "d", "context": context, "severity": "high", "suggestion": "s"})
+
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+def json_validate_failed(failed_generation):
+    request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+    body = {"error": {"message": "Failed to generate JSON", "code": "json_validate_failed", "failed_generation": failed_generation}}
+    return BadRequestError("Error code: 400", response=httpx.Response(400, request=request, json=body), body=body)
+
+
+@pytest.fixture
+def analyzer(tmp_path, monkeypatch):
+    analyzer = TextAnalyzer(
+        rules_cache=RulesCache(db_path=str(tmp_path / "rules.db")),
+        section_store=SectionStore(str(tmp_path / "sections.db")),
+        governor=RateGovernor(enabled=False)
+    )
+    monkeypatch.setattr(analyzer, "triage_model", None)
+    return analyzer
+
+
+@pytest.fixture
+def llm(analyzer, monkeypatch):
+    """
+    Replaces the Groq client with one that answers from a list of responses
+    (strings, or exceptions to raise) and records each call's options.
+    """
+    calls = []
+    responses = []
+
+    async def create(**options):
+        calls.append(options)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return completion(response)
+
+    monkeypatch.setattr(analyzer, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    return responses, calls
+
+
+def test_parse_violations_salvages_a_cut_off_response(analyzer):
+    response = 'Sure! {"violations": [' + violation_json("bank account") + ', {"type": "x", "desc'
+    violations, incomplete = analyzer._parse_violations(response)
+    assert [violation["context"] for violation in violations] == ["bank account"]
+    assert incomplete
+
+
+def test_parse_violations_counts_invalid_objects(analyzer):
+    violations, incomplete = analyzer._parse_violations('{"violations": [' + violation_json("a") + ', {"type": "x"}]}')
+    assert len(violations) == 1 and incomplete
+    violations, incomplete = analyzer._parse_violations('{"violations": [' + violation_json("a") + "]}")
+    assert len(violations) == 1 and not incomplete
+
+
+def test_parse_violations_without_json(analyzer):
+    violations, incomplete = analyzer._parse_violations("No violations found.")
+    assert [violation["type"] for violation in violations] == ["parsing_error"]
+    assert not incomplete
+
+
+def test_parse_rules(analyzer):
+    rules, complete = analyzer._parse_rules(
+        '{"rules": [{"category": "claims", "requirement": " Do not  guarantee returns ", "keywords": ["guarantee"], '
+        '"examples": ["We guarantee 5%"], "universal": "yes"}, {"category": "empty"}]}'
+    )
+    assert rules == [{
+        "category": "claims",
+        "requirement": "Do not guarantee returns",
+        "keywords": ["guarantee"],
+        "examples": "We guarantee 5%",
+        "universal": False
+    }]
+    assert complete
+
+
+def test_parse_rules_from_prose_is_not_complete(analyzer):
+    rules, complete = analyzer._parse_rules("Rules:\n- Never call the product a bank account.\n- Short one")
+    assert [rule["requirement"] for rule in rules] == ["Never call the product a bank account."]
+    assert not complete
+    assert not analyzer._parse_rules('{"rules": [{"requirement": "Do not guarantee returns"}, {"requ')[1]
+
+
+@pytest.mark.asyncio
+async def test_prose_rules_are_not_cached(analyzer, monkeypatch):
+    async def complete(*args, **kwargs):
+        return "- Never call the product a bank account."
+
+    monkeypatch.setattr(analyzer, "_complete", complete)
+    assert len(await analyzer.extract_policy_rules(POLICIES)) == 1
+    assert await analyzer.rules_cache.get(analyzer.policy_hash(POLICIES["https://policy.example/a"])) is None
+
+
+def test_failed_generation_is_read_from_the_error_body():
+    assert TextAnalyzer._failed_generation(json_validate_failed('{"violations": [')) == '{"violations": ['
+    assert TextAnalyzer._failed_generation(ValueError("no body")) is None
+
+
+@pytest.mark.asyncio
+async def test_complete_requests_json_mode(analyzer, llm):
+    responses, calls = llm
+    responses.append('{"violations": []}')
+    assert await analyzer._complete("system", "user", "model", json_mode=True) == '{"violations": []}'
+    assert calls[0]["response_format"] == {"type": "json_object"}
+
+
+@pytest.mark.asyncio
+async def test_complete_returns_the_rejected_json(analyzer, llm):
+    responses, _ = llm
+    responses.append(json_validate_failed('{"violations": [' + violation_json("bank account") + ', {"ty'))
+    response = await analyzer._complete("system", "user", "model", json_mode=True)
+    assert response.startswith('{"violations": [')
+
+
+@pytest.mark.asyncio
+async def test_other_errors_are_not_salvaged(analyzer, llm):
+    responses, _ = llm
+    responses.append(json_validate_failed("{}"))
+    with pytest.raises(BadRequestError):
+        # Without JSON mode a 400 is a real error
+        await analyzer._complete("system", "user", "model")
+
+
+@pytest.mark.asyncio
+async def test_rejected_json_is_salvaged_and_repaired(analyzer, llm):
+    responses, calls = llm
+    responses.append(json_validate_failed('{"violations": [' + violation_json("bank account") + ', {"type": "x", "desc'))
+    responses.append('{"violations": [' + violation_json("savings account") + "]}")
+
+    violations = await analyzer.analyze_against_rules({"clean_text": "Open a bank account or a savings account."}, RULES)
+    assert sorted(violation["context"] for violation in violations) == ["bank account", "savings account"]
+    # The repair call lists what was already found and is capped
+    assert calls[1]["max_tokens"] == settings.VIOLATION_REPAIR_MAX_TOKENS
+    assert "bank account" in calls[1]["messages"][1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_failed_repair_marks_the_result_incomplete(analyzer, llm):
+    responses, _ = llm
+    responses.append('{"violations": [' + violation_json("bank account") + ', {"ty')
+    responses.append(json_validate_failed("not json"))
+
+    violations = await analyzer.analyze_against_rules({"clean_text": "Open a bank account."}, RULES)
+    assert [violation["type"] for violation in violations] == ["prohibited_phrase", "parsing_error"]
+
+
+@pytest.mark.asyncio
+async def test_repair_can_be_disabled(analyzer, llm, monkeypatch):
+    monkeypatch.setattr(settings, "ENABLE_VIOLATION_REPAIR", False)
+    responses, calls = llm
+    responses.append('{"violations": [' + violation_json("bank account") + ', {"ty')
+
+    violations = await analyzer.analyze_against_rules({"clean_text": "Open a bank account."}, RULES)
+    assert [violation["type"] for violation in violations] == ["prohibited_phrase", "parsing_error"]
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_emits_violations_as_they_close(analyzer, monkeypatch):
+    received = asyncio.Event()
+
+    async def complete_stream(*args, **kwargs):
+        yield '{"violations": [' + violation_json("bank account")
+        # The rest of the response only arrives once the first violation has reached the consumer
+        await asyncio.wait_for(received.wait(), timeout=1)
+        yield "]}"
+
+    monkeypatch.setattr(analyzer, "_complete_stream", complete_stream)
+    violations = []
+    async for _, violation in analyzer._stream_chunk_violations(["Open a bank account."], RuleIndex(RULES)):
+        violations.append(violation)
+        received.set()
+    assert [(violation["context"], violation["rule_id"]) for violation in violations] == [("bank account", None)]
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_a_response_without_json(analyzer, monkeypatch):
+    async def complete_stream(*args, **kwargs):
+        for token in ("I could not ", "analyze this page."):
+            yield token
+
+    monkeypatch.setattr(analyzer, "_complete_stream", complete_stream)
+    violations = [violation async for _, violation in analyzer._stream_chunk_violations(["Open a bank account."], RuleIndex(RULES))]
+    assert [violation["type"] for violation in violations] == ["parsing_error"]
+    assert violations[0]["context"] == "I could not analyze this page."
+
+
+@pytest.mark.asyncio
+async def test_stream_repairs_a_cut_off_response(analyzer, monkeypatch):
+    async def complete_stream(*args, **kwargs):
+        yield '{"violations": [' + violation_json("bank account")
+        yield ', {"type": "x", "desc'
+
+    async def complete(*args, **kwargs):
+        return '{"violations": [' + violation_json("savings account") + "]}"
+
+    monkeypatch.setattr(analyzer, "_complete_stream", complete_stream)
+    monkeypatch.setattr(analyzer, "_complete", complete)
+    violations = [violation async for _, violation in analyzer._stream_chunk_violations(["Open a bank account."], RuleIndex(RULES))]
+    assert [violation["context"] for violation in violations] == ["bank account", "savings account"]
+
+
+@pytest.mark.asyncio
+async def test_repeated_quote_in_separate_chunks_is_reported_twice(checker, monkeypatch):
+    monkeypatch.setattr(settings, "CHUNK_MAX_TOKENS", 40)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP_TOKENS", 20)
+    filler = [f"Paragraph {index} is about invoices and spending reports for teams." for index in range(6)]
+    text = "\n".join(["Open a bank account."] + filler + ["Open a bank account."])
+    analyzer = checker.text_analyzer
+    rules = [{**rule, "policy_url": "https://policy.example/"} for rule in RULES]
+
+    violations = await analyzer.analyze_against_rules({"clean_text": text}, rules)
+    assert [violation["context"] for violation in violations] == ["Open a bank account.", "Open a bank account."]
+
+    # A passage in the overlap is seen by two chunks but reported once
+    text = "\n".join(filler[:3] + ["Open a bank account."] + filler[3:])
+    violations = await analyzer.analyze_against_rules({"clean_text": text}, rules)
+    assert [violation["context"] for violation in violations] == ["Open a bank account."]
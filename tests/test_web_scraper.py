@@ -0,0 +1,120 @@
+# tests/test_web_scraper.py
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import httpx
+import pytest
+from app.config import settings
+from app.services import web_scraper
+from app.services.web_scraper import WebScraper
+
+PAGE = b"<html><head><title>Offers</title></head><body><article><p>Open a bank account today with us.</p></article></body></html>"
+
+
+def scraper_for(handler, monkeypatch) -> WebScraper:
+    monkeypatch.setattr(settings, "EXTRACTION_POOL_SIZE", 0)
+    return WebScraper(client=httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True))
+
+
+async def trickle(parts, delay=0.0):
+    for part in parts:
+        await asyncio.sleep(delay)
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_fetch_follows_redirects(monkeypatch):
+    async def handler(request):
+        if request.url.path == "/old":
+            return httpx.Response(301, headers={"Location": "https://example.com/new"})
+        return httpx.Response(200, content=PAGE)
+
+    scraper = scraper_for(handler, monkeypatch)
+    assert await scraper._download("https://example.com/old") == (PAGE, "https://example.com/new")
+    assert "bank account" in (await scraper.fetch_content("https://example.com/old"))["clean_text"]
+
+
+@pytest.mark.asyncio
+async def test_declared_size_over_the_cap_is_refused(monkeypatch):
+    async def handler(request):
+        return httpx.Response(200, headers={"Content-Length": "2048"}, content=trickle([b"x" * 2048]))
+
+    scraper = scraper_for(handler, monkeypatch)
+    scraper.max_content_bytes = 1024
+    with pytest.raises(ValueError, match="limit"):
+        await scraper._download("https://example.com/")
+
+
+@pytest.mark.asyncio
+async def test_streamed_body_over_the_cap_is_cut_off(monkeypatch):
+    sent = []
+
+    async def body():
+        for _ in range(100):
+            sent.append(1)
+            yield b"x" * 512
+
+    async def handler(request):
+        return httpx.Response(200, content=body())
+
+    scraper = scraper_for(handler, monkeypatch)
+    scraper.max_content_bytes = 1024
+    with pytest.raises(ValueError, match="limit"):
+        await scraper._download("https://example.com/")
+    # Reading stopped at the first chunk past the cap
+    assert len(sent) == 3
+
+
+@pytest.mark.asyncio
+async def test_slow_body_is_bounded_by_the_total_deadline(monkeypatch):
+    async def handler(request):
+        # Every read arrives quickly, but the whole body would take seconds
+        return httpx.Response(200, content=trickle([b"x"] * 100, delay=0.05))
+
+    monkeypatch.setattr(settings, "REQUEST_TIMEOUT", 0.3)
+    scraper = scraper_for(handler, monkeypatch)
+    started = asyncio.get_running_loop().time()
+    with pytest.raises(Exception, match="did not finish within 0.3 seconds"):
+        await scraper.fetch_content("https://example.com/")
+    assert asyncio.get_running_loop().time() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_http_errors_are_raised(monkeypatch):
+    async def handler(request):
+        return httpx.Response(404)
+
+    scraper = scraper_for(handler, monkeypatch)
+    with pytest.raises(Exception, match="Failed to fetch content"):
+        await scraper.fetch_content("https://example.com/missing")
+
+
+class BrokenPool:
+    """
+    Stands in for a ProcessPoolExecutor whose child process just died.
+    """
+
+    def __init__(self):
+        self.shutdowns = 0
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("A child process terminated abruptly"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns += 1
+
+
+@pytest.mark.asyncio
+async def test_broken_pool_is_replaced_once(monkeypatch):
+    scraper = scraper_for(lambda request: httpx.Response(200), monkeypatch)
+    replacements = []
+    monkeypatch.setattr(web_scraper, "create_extraction_pool", lambda: replacements.append(object()) or replacements[-1])
+    broken = scraper.extraction_pool = BrokenPool()
+
+    results = await asyncio.gather(*(scraper._extract(PAGE) for _ in range(6)), return_exceptions=True)
+    assert all(isinstance(result, BrokenProcessPool) for result in results)
+    # Every extraction in flight failed, but only the first replaced the pool
+    assert broken.shutdowns == 1
+    assert len(replacements) == 1 and scraper.extraction_pool is replacements[0]